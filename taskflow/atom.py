@@ -141,8 +141,24 @@ class Atom(object):
                   the atoms scope before the atom execution commences (this
                   allows for providing atom *local* values that do not need to
                   be provided by other atoms).
+    :ivar priority: An integer that engines use to decide which of the atoms
+                    that are ready to run should be scheduled first (atoms
+                    with a higher priority are scheduled before atoms with a
+                    lower priority). Atoms with the same priority are
+                    scheduled so that the atoms on the longest chain of
+                    dependent atoms (the critical path) start first.
+    :ivar max_in_flight: The maximum number of atoms of this atoms class that
+                         engines will have running at the same time (or none
+                         if engines may run as many of them at the same time
+                         as they can).
     """
 
+    #: Default scheduling priority of atoms (see above).
+    priority = 0
+
+    #: Default maximum number of atoms of a class running at once (unbounded).
+    max_in_flight = None
+
     def __init__(self, name=None, provides=None, inject=None):
         self._name = name
         self.save_as = _save_as_to_mapping(provides)
@@ -14,13 +14,20 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from networkx.algorithms import traversal
-import six
-
-from taskflow import retry as retry_atom
+from taskflow.engines.action_engine import compiler
 from taskflow import states as st
 
 
+def _is_executed(atom_state):
+    state, intention = atom_state
+    return state == st.SUCCESS and intention == st.EXECUTE
+
+
+def _is_reverted(atom_state):
+    state, _intention = atom_state
+    return state in (st.PENDING, st.REVERTED)
+
+
 class Analyzer(object):
     """Analyzes a compilation and aids in execution processes.
 
@@ -29,11 +36,138 @@ class Analyzer(object):
     edge relations...) and using this information along with the atom
     state/states stored in storage to provide other useful functionality to
     the rest of the runtime system.
+
+    To avoid rescanning the whole graph (and hitting storage for each atoms
+    predecessors and successors) every time the next atoms are requested it
+    keeps a cache of atom states and intentions, per atom counts of the
+    neighbors that are blocking it from executing or reverting and the sets
+    of atoms that are currently ready for execution or reversion. These are
+    built (by a full scan) when :py:meth:`.refresh` is called and are then
+    incrementally maintained by calling :py:meth:`.refresh_atom` whenever an
+    atoms state or intention changes (which costs only the degree of that
+    atom). All of these are kept by atom index (using the compilations
+    integer indexed graph); atoms given to this analyzer are still hashed
+    once (to look up their index) but their neighbors are then found using
+    integer indexes only.
+
+    The atoms whose readiness was updated and that are not ready are also
+    remembered (until :py:meth:`.pop_unready_nodes` is called) so that
+    users that hold on to ready atoms (for example atoms that were deferred
+    by the scheduler) can drop the ones that are no longer ready without
+    having to rescan all the ready atoms.
     """
 
     def __init__(self, compilation, storage):
         self._storage = storage
-        self._graph = compilation.execution_graph
+        self._graph = compilation.indexed_graph
+        self._atoms = self._graph.atoms
+        self._atom_states = None
+        self._execute_blockers = None
+        self._revert_blockers = None
+        self._execute_ready = None
+        self._revert_ready = None
+        self._unready = set()
+        self._success_count = 0
+
+    def refresh(self):
+        """Rebuilds the cached states, blocker counts and ready sets.
+
+        This performs a full scan of the graph (and a single read of all the
+        atom states from storage) and should be called before the cached
+        information is relied upon (for example when an engine starts or
+        resumes running) since storage may have been altered externally.
+        """
+        atom_states = self._storage.get_atoms_states(
+            [atom.name for atom in self._atoms])
+        self._atom_states = [atom_states[atom.name] for atom in self._atoms]
+        self._execute_blockers = []
+        self._revert_blockers = []
+        self._execute_ready = set()
+        self._revert_ready = set()
+        self._unready = set()
+        self._success_count = 0
+        for (index, atom_state) in enumerate(self._atom_states):
+            self._execute_blockers.append(sum(
+                1 for prev_index in self._graph.predecessors(index)
+                if not _is_executed(self._atom_states[prev_index])))
+            self._revert_blockers.append(sum(
+                1 for next_index in self._graph.successors(index)
+                if not _is_reverted(self._atom_states[next_index])))
+            if atom_state[0] == st.SUCCESS:
+                self._success_count += 1
+        for index in range(0, len(self._atoms)):
+            self._update_readiness(index)
+
+    def refresh_atom(self, atom):
+        """Updates the cached information after an atoms state changed.
+
+        This should be called after an atoms state or intention has been
+        altered in storage; it adjusts the blocker counts of the atoms
+        neighbors and the ready sets of the atom and of those neighbors.
+        """
+        if self._atom_states is None:
+            # Nothing cached yet, so nothing to update; the next refresh
+            # will read the new state directly from storage.
+            return
+        index = self._graph.index_of(atom)
+        old_atom_state = self._atom_states[index]
+        new_atom_state = (self._storage.get_atom_state(atom.name),
+                          self._storage.get_atom_intention(atom.name))
+        if old_atom_state == new_atom_state:
+            return
+        self._atom_states[index] = new_atom_state
+        if old_atom_state[0] == st.SUCCESS:
+            self._success_count -= 1
+        if new_atom_state[0] == st.SUCCESS:
+            self._success_count += 1
+        affected_indexes = [index]
+        was_executed = _is_executed(old_atom_state)
+        now_executed = _is_executed(new_atom_state)
+        if was_executed != now_executed:
+            delta = -1 if now_executed else 1
+            for next_index in self._graph.successors(index):
+                self._execute_blockers[next_index] += delta
+                affected_indexes.append(next_index)
+        was_reverted = _is_reverted(old_atom_state)
+        now_reverted = _is_reverted(new_atom_state)
+        if was_reverted != now_reverted:
+            delta = -1 if now_reverted else 1
+            for prev_index in self._graph.predecessors(index):
+                self._revert_blockers[prev_index] += delta
+                affected_indexes.append(prev_index)
+        for affected_index in affected_indexes:
+            self._update_readiness(affected_index)
+
+    def _ensure_refreshed(self):
+        if self._atom_states is None:
+            self.refresh()
+
+    def _update_readiness(self, index):
+        ready = False
+        if self._is_ready_for_execute(index):
+            self._execute_ready.add(index)
+            ready = True
+        else:
+            self._execute_ready.discard(index)
+        if self._is_ready_for_revert(index):
+            self._revert_ready.add(index)
+            ready = True
+        else:
+            self._revert_ready.discard(index)
+        if ready:
+            self._unready.discard(index)
+        else:
+            self._unready.add(index)
+
+    def pop_unready_nodes(self):
+        """Returns (and forgets) the atoms that stopped being ready.
+
+        These are the atoms whose readiness was updated (since this was last
+        called) and that are currently not ready to be executed or reverted.
+        """
+        unready = self._unready
+        self._unready = set()
+        return [self._atoms[index] for index in unready]
 
     def get_next_nodes(self, node=None):
         if node is None:
@@ -41,8 +175,7 @@ class Analyzer(object):
             revert = self.browse_nodes_for_revert()
             return execute + revert
 
-        state = self.get_state(node)
-        intention = self._storage.get_atom_intention(node.name)
+        state, intention = self._get_atom_state(node)
         if state == st.SUCCESS:
             if intention == st.REVERT:
                 return [node]
@@ -62,96 +195,81 @@ class Analyzer(object):
 
         This returns a collection of nodes that are ready to be executed, if
         given a specific node it will only examine the successors of that node,
-        otherwise it will examine the whole graph.
+        otherwise it will return all nodes that are currently ready.
         """
+        self._ensure_refreshed()
         if node:
-            nodes = self._graph.successors(node)
+            indexes = self._graph.successors(self._graph.index_of(node))
+            return [self._atoms[index] for index in indexes
+                    if index in self._execute_ready]
         else:
-            nodes = self._graph.nodes_iter()
-
-        available_nodes = []
-        for node in nodes:
-            if self._is_ready_for_execute(node):
-                available_nodes.append(node)
-        return available_nodes
+            return [self._atoms[index] for index in self._execute_ready]
 
     def browse_nodes_for_revert(self, node=None):
         """Browse next nodes to revert.
 
         This returns a collection of nodes that are ready to be be reverted, if
         given a specific node it will only examine the predecessors of that
-        node, otherwise it will examine the whole graph.
+        node, otherwise it will return all nodes that are currently ready.
         """
+        self._ensure_refreshed()
         if node:
-            nodes = self._graph.predecessors(node)
+            indexes = self._graph.predecessors(self._graph.index_of(node))
+            return [self._atoms[index] for index in indexes
+                    if index in self._revert_ready]
         else:
-            nodes = self._graph.nodes_iter()
-
-        available_nodes = []
-        for node in nodes:
-            if self._is_ready_for_revert(node):
-                available_nodes.append(node)
-        return available_nodes
-
-    def _is_ready_for_execute(self, task):
-        """Checks if task is ready to be executed."""
-        state = self.get_state(task)
-        intention = self._storage.get_atom_intention(task.name)
-        transition = st.check_task_transition(state, st.RUNNING)
-        if not transition or intention != st.EXECUTE:
-            return False
+            return [self._atoms[index] for index in self._revert_ready]
 
-        task_names = []
-        for prev_task in self._graph.predecessors(task):
-            task_names.append(prev_task.name)
-
-        task_states = self._storage.get_atoms_states(task_names)
-        return all(state == st.SUCCESS and intention == st.EXECUTE
-                   for state, intention in six.itervalues(task_states))
-
-    def _is_ready_for_revert(self, task):
-        """Checks if task is ready to be reverted."""
-        state = self.get_state(task)
-        intention = self._storage.get_atom_intention(task.name)
-        transition = st.check_task_transition(state, st.REVERTING)
-        if not transition or intention not in (st.REVERT, st.RETRY):
+    def _is_ready_for_execute(self, index):
+        """Checks if the atom at index is ready to be executed."""
+        if self._execute_blockers[index]:
             return False
+        state, intention = self._atom_states[index]
+        transition = st.check_task_transition(state, st.RUNNING)
+        return transition and intention == st.EXECUTE
 
-        task_names = []
-        for prev_task in self._graph.successors(task):
-            task_names.append(prev_task.name)
-
-        task_states = self._storage.get_atoms_states(task_names)
-        return all(state in (st.PENDING, st.REVERTED)
-                   for state, intention in six.itervalues(task_states))
+    def _is_ready_for_revert(self, index):
+        """Checks if the atom at index is ready to be reverted."""
+        if self._revert_blockers[index]:
+            return False
+        state, intention = self._atom_states[index]
+        transition = st.check_task_transition(state, st.REVERTING)
+        return transition and intention in (st.REVERT, st.RETRY)
 
     def iterate_subgraph(self, retry):
         """Iterates a subgraph connected to given retry controller."""
-        for _src, dst in traversal.dfs_edges(self._graph, retry):
-            yield dst
+        for index in self._graph.subgraph_of(self._graph.index_of(retry)):
+            yield self._atoms[index]
 
     def iterate_retries(self, state=None):
         """Iterates retry controllers that match the provided state.
 
         If no state is provided it will yield back all retry controllers.
         """
-        for node in self._graph.nodes_iter():
-            if isinstance(node, retry_atom.Retry):
-                if not state or self.get_state(node) == state:
-                    yield node
+        for index in self._graph.retries:
+            node = self._atoms[index]
+            if not state or self.get_state(node) == state:
+                yield node
 
     def iterate_all_nodes(self):
-        for node in self._graph.nodes_iter():
+        for node in self._atoms:
             yield node
 
     def find_atom_retry(self, atom):
-        return self._graph.node[atom].get('retry')
+        index = self._graph.retry_of(self._graph.index_of(atom))
+        if index == compiler.NO_INDEX:
+            return None
+        return self._atoms[index]
 
     def is_success(self):
-        for node in self._graph.nodes_iter():
-            if self.get_state(node) != st.SUCCESS:
-                return False
-        return True
+        self._ensure_refreshed()
+        return self._success_count == len(self._atoms)
+
+    def _get_atom_state(self, node):
+        if self._atom_states is None:
+            return (self._storage.get_atom_state(node.name),
+                    self._storage.get_atom_intention(node.name))
+        return self._atom_states[self._graph.index_of(node)]
 
     def get_state(self, node):
-        return self._storage.get_atom_state(node.name)
+        return self._get_atom_state(node)[0]
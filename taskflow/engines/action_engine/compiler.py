@@ -14,14 +14,23 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import array
+import collections
+import copy
 import logging
 
+from networkx.algorithms import traversal
+import six
+from six.moves import range as compat_range
+
 from taskflow import exceptions as exc
 from taskflow import flow
 from taskflow import retry
 from taskflow import task
+from taskflow.types import cache
 from taskflow.types import graph as gr
 from taskflow.utils import misc
+from taskflow.utils import reflection
 
 LOG = logging.getLogger(__name__)
 
@@ -29,17 +38,149 @@ LOG = logging.getLogger(__name__)
 class Compilation(object):
     """The result of a compilers compile() is this *immutable* object.
 
-    For now it is just a execution graph but in the future it will grow to
-    include more methods & properties that help the various runtime units
-    execute in a more optimal & featureful manner.
+    For now it is just a execution graph (and a compact integer indexed form
+    of that same graph) but in the future it will grow to include more methods
+    & properties that help the various runtime units execute in a more
+    optimal & featureful manner.
     """
-    def __init__(self, execution_graph):
+    def __init__(self, execution_graph, indexed_graph=None):
         self._execution_graph = execution_graph
+        if indexed_graph is None:
+            indexed_graph = IndexedGraph(execution_graph)
+        self._indexed_graph = indexed_graph
 
     @property
     def execution_graph(self):
         return self._execution_graph
 
+    @property
+    def indexed_graph(self):
+        return self._indexed_graph
+
+
+# Index used (in the integer arrays below) to denote the lack of an atom.
+NO_INDEX = -1
+
+
+class IndexedGraph(object):
+    """A compact, frozen and integer indexed form of an execution graph.
+
+    Each atom in the execution graph is assigned an integer index (in the
+    graphs node iteration order) and the edges are stored in compressed
+    sparse row form (an offsets array and a flat array of neighbor indexes,
+    for both the successor and predecessor directions). The retry controller
+    that owns each atom and the atoms reachable from each retry controller
+    (its subgraph) are precomputed so that the runtime units never have to
+    consult the (much heavier) networkx graph while running.
+
+    Atoms are still hashed to find their index (see :py:meth:`.index_of`),
+    after which only integer indexes and arrays are used.
+    """
+
+    def __init__(self, graph):
+        atoms = list(graph.nodes_iter())
+        self._atoms = tuple(atoms)
+        self._atom_index = dict((atom, i) for (i, atom) in enumerate(atoms))
+        self._name_index = dict((atom.name, i)
+                                for (i, atom) in enumerate(atoms))
+        self._succ_offsets, self._succ_indexes = self._build_adjacency(
+            atoms, graph.successors_iter)
+        self._pred_offsets, self._pred_indexes = self._build_adjacency(
+            atoms, graph.predecessors_iter)
+        self._retry_owners = array.array('l')
+        retries = []
+        self._subgraphs = {}
+        for (i, atom) in enumerate(atoms):
+            owner = graph.node[atom].get('retry')
+            if owner is None:
+                self._retry_owners.append(NO_INDEX)
+            else:
+                self._retry_owners.append(self._atom_index[owner])
+            if isinstance(atom, retry.Retry):
+                retries.append(i)
+                self._subgraphs[i] = array.array(
+                    'l', (self._atom_index[dst]
+                          for (_src, dst) in traversal.dfs_edges(graph,
+                                                                 atom)))
+        self._retries = tuple(retries)
+        self._flow_limits = tuple(graph.graph.get('flow_limits', ()))
+        self._flow_limits_of = tuple(
+            tuple(graph.node[atom].get('flow_limits', ())) for atom in atoms)
+
+    def rebind(self, atoms):
+        """Returns a copy that uses the given atoms (in index order).
+
+        The (immutable) index arrays are shared with the copy, so the given
+        atoms must be structurally the same as (and named the same as) the
+        atoms this indexed graph was created with.
+        """
+        atoms = tuple(atoms)
+        if len(atoms) != len(self._atoms):
+            raise ValueError("Expected %s atoms to rebind to, %s atoms were"
+                             " provided" % (len(self._atoms), len(atoms)))
+        indexed_graph = copy.copy(self)
+        indexed_graph._atoms = atoms
+        indexed_graph._atom_index = dict((atom, i)
+                                         for (i, atom) in enumerate(atoms))
+        return indexed_graph
+
+    def _build_adjacency(self, atoms, neighbors_iter):
+        offsets = array.array('l', [0])
+        indexes = array.array('l')
+        for atom in atoms:
+            indexes.extend(self._atom_index[neighbor]
+                           for neighbor in neighbors_iter(atom))
+            offsets.append(len(indexes))
+        return (offsets, indexes)
+
+    def __len__(self):
+        return len(self._atoms)
+
+    @property
+    def atoms(self):
+        """Tuple of all atoms (the position of an atom is its index)."""
+        return self._atoms
+
+    @property
+    def retries(self):
+        """Tuple of the indexes of all retry controllers."""
+        return self._retries
+
+    def index_of(self, atom):
+        """Returns the index of the given atom."""
+        return self._atom_index[atom]
+
+    def index_of_name(self, atom_name):
+        """Returns the index of the atom with the given name."""
+        return self._name_index[atom_name]
+
+    def successors(self, index):
+        """Returns the indexes of the successors of the given atom index."""
+        return self._succ_indexes[self._succ_offsets[index]:
+                                  self._succ_offsets[index + 1]]
+
+    def predecessors(self, index):
+        """Returns the indexes of the predecessors of the given atom index."""
+        return self._pred_indexes[self._pred_offsets[index]:
+                                  self._pred_offsets[index + 1]]
+
+    @property
+    def flow_limits(self):
+        """Tuple of the in flight limits of the flows that have one."""
+        return self._flow_limits
+
+    def flow_limits_of(self, index):
+        """Returns the ``flow_limits`` indexes that apply to an atom index."""
+        return self._flow_limits_of[index]
+
+    def retry_of(self, index):
+        """Returns the index of the retry owning an atom (or ``NO_INDEX``)."""
+        return self._retry_owners[index]
+
+    def subgraph_of(self, index):
+        """Returns the indexes of the atoms reachable from a retry index."""
+        return self._subgraphs[index]
+
 
 class PatternCompiler(object):
     """Compiles patterns & atoms into a compilation unit.
@@ -52,8 +193,25 @@ class PatternCompiler(object):
     contained flow mandated. In the future this may be changed so that this
     association is not lost via the compilation process (since it can be
     useful to retain this relationship).
+
+    If a cache is provided then the structure of each compilation is stored
+    in it (keyed by the structural fingerprint of the compiled item) so that
+    compiling a structurally identical item later (for example a new flow
+    made by the same flow factory) can skip flattening and just rebind the
+    cached structure to the new items atoms.
     """
+    def __init__(self, cache=None):
+        self._cache = cache
+
     def compile(self, root):
+        if self._cache is not None:
+            fingerprint, atoms = _fingerprint(root)
+        else:
+            fingerprint, atoms = (None, None)
+        if fingerprint is not None:
+            template = self._cache.get(fingerprint)
+            if template is not None:
+                return template.instantiate(atoms)
         graph = _Flattener(root).flatten()
         if graph.number_of_nodes() == 0:
             # Try to get a name attribute, otherwise just use the object
@@ -61,7 +219,132 @@ class PatternCompiler(object):
             name = getattr(root, 'name', root)
             raise exc.Empty("Root container '%s' (%s) is empty."
                             % (name, type(root)))
-        return Compilation(graph)
+        compilation = Compilation(graph)
+        if fingerprint is not None:
+            self._cache[fingerprint] = _CompilationTemplate(compilation)
+        return compilation
+
+
+# Default maximum number of compilation structures the process wide
+# compilation cache will retain.
+COMPILATION_CACHE_SIZE = 64
+
+# Process wide cache of compilation structures, shared by all engines that
+# have compilation caching enabled.
+COMPILATION_CACHE = cache.LRUCache(COMPILATION_CACHE_SIZE)
+
+
+class _CompilationTemplate(object):
+    """The atom independent structure of a compilation.
+
+    This retains the atom names (in index order), the edges (and their
+    attributes) and the indexed graph of a compilation, so that a new
+    compilation can be created for a structurally identical item by
+    rebinding this structure to that items atoms.
+    """
+
+    def __init__(self, compilation):
+        graph = compilation.execution_graph
+        indexed_graph = compilation.indexed_graph
+        self._name = graph.name
+        self._names = tuple(atom.name for atom in indexed_graph.atoms)
+        self._edges = tuple((indexed_graph.index_of(u),
+                             indexed_graph.index_of(v), attrs)
+                            for (u, v, attrs) in graph.edges_iter(data=True))
+        # The names are used as atom placeholders so that this
+        # template does not keep the original atoms alive.
+        self._indexed_graph = indexed_graph.rebind(self._names)
+
+    def instantiate(self, atoms):
+        """Creates a compilation for the given (name -> atom) mapping."""
+        atoms = [atoms[name] for name in self._names]
+        graph = gr.DiGraph(name=self._name)
+        for (i, atom) in enumerate(atoms):
+            owner = self._indexed_graph.retry_of(i)
+            if owner == NO_INDEX:
+                graph.add_node(atom)
+            else:
+                graph.add_node(atom, retry=atoms[owner])
+        for (u, v, attrs) in self._edges:
+            graph.add_edge(atoms[u], atoms[v], attr_dict=attrs.copy())
+        graph.freeze()
+        return Compilation(graph, self._indexed_graph.rebind(atoms))
+
+
+def _freeze_link_metadata(metadata):
+    frozen = []
+    for (k, v) in six.iteritems(metadata):
+        if isinstance(v, (set, frozenset)):
+            v = tuple(sorted(v))
+        frozen.append((k, v))
+    return tuple(sorted(frozen))
+
+
+def _fingerprint(root):
+    """Computes the structural fingerprint of a item (a task or flow).
+
+    The fingerprint captures everything the flattening process depends on
+    (atom classes, names, provides & requires, flow classes, in flight
+    limits, children, links and retry controllers). Returns a tuple of the
+    fingerprint and a dict of the items atoms (keyed by name) or
+    ``(None, None)`` if the item can not be fingerprinted (in which case it
+    should not be cached).
+    """
+    atoms = {}
+    history = set()
+
+    def fingerprint_atom(atom):
+        atoms[atom.name] = atom
+        return (reflection.get_class_name(atom), atom.name,
+                tuple(sorted(atom.provides)), tuple(sorted(atom.requires)))
+
+    def fingerprint_flow(flow):
+        if id(flow) in history:
+            return None
+        history.add(id(flow))
+        children = []
+        for item in flow:
+            child = fingerprint_item(item)
+            if child is None:
+                return None
+            children.append((repr(child), id(item), child))
+        # The children of unordered flows are kept in a set, so put them in
+        # a canonical order (by their fingerprints) for the links to refer to.
+        children.sort(key=lambda child: child[0])
+        positions = dict((item_id, i)
+                         for (i, (_key, item_id, _child))
+                         in enumerate(children))
+        links = []
+        for (u, v, metadata) in flow.iter_links():
+            links.append((positions[id(u)], positions[id(v)],
+                          _freeze_link_metadata(metadata)))
+        links.sort()
+        if flow.retry is not None:
+            retry_fingerprint = fingerprint_atom(flow.retry)
+        else:
+            retry_fingerprint = None
+        history.discard(id(flow))
+        return (reflection.get_class_name(flow), flow.name,
+                flow.max_in_flight, retry_fingerprint,
+                tuple(child for (_key, _item_id, child) in children),
+                tuple(links))
+
+    def fingerprint_item(item):
+        if isinstance(item, flow.Flow):
+            return fingerprint_flow(item)
+        elif isinstance(item, task.BaseTask):
+            return fingerprint_atom(item)
+        else:
+            return None
+
+    fingerprint = fingerprint_item(root)
+    if fingerprint is None:
+        return (None, None)
+    try:
+        hash(fingerprint)
+    except TypeError:
+        return (None, None)
+    return (fingerprint, atoms)
 
 
 _RETRY_EDGE_DATA = {
@@ -69,23 +352,49 @@ _RETRY_EDGE_DATA = {
 }
 
 
+class _Subgraph(object):
+    """The portion of the execution graph that a flattened item created.
+
+    Since the atoms of an item are added to the execution graph one after the
+    other (and before any other items atoms are added) they are tracked as a
+    ``[start, stop)`` range of the flatteners added atoms list (instead of
+    being copied around); the atoms with no predecessors (sources) and no
+    successors (sinks) in this portion are retained so that the item can be
+    connected to other items without searching for them.
+    """
+
+    def __init__(self, start, stop, sources, sinks):
+        self.start = start
+        self.stop = stop
+        self.sources = sources
+        self.sinks = sinks
+
+
 class _Flattener(object):
-    """Flattens a root item (task/flow) into a execution graph."""
+    """Flattens a root item (task/flow) into a execution graph.
+
+    All items are flattened (in a single pass) into one mutable graph which is
+    only frozen once flattening has finished.
+    """
 
     def __init__(self, root, freeze=True):
         self._root = root
         self._graph = None
         self._history = set()
         self._freeze = bool(freeze)
+        # The graph being built (and the atoms in the order they were added
+        # to it) while flattening is underway.
+        self._building = None
+        self._atoms = []
 
-    def _add_new_edges(self, graph, nodes_from, nodes_to, edge_attrs):
-        """Adds new edges from nodes to other nodes in the specified graph.
+    def _add_new_edges(self, nodes_from, nodes_to, edge_attrs):
+        """Adds new edges from nodes to other nodes in the graph being built.
 
         It will connect the nodes_from to the nodes_to if an edge currently
         does *not* exist. When an edge is created the provided edge attributes
         will be applied to the new edge between these two nodes.
         """
-        nodes_to = list(nodes_to)
+        graph = self._building
         for u in nodes_from:
             for v in nodes_to:
                 if not graph.has_edge(u, v):
@@ -93,15 +402,45 @@ class _Flattener(object):
                     # if it's later modified that the same copy isn't modified.
                     graph.add_edge(u, v, attr_dict=edge_attrs.copy())
 
+    def _add_dependency_edges(self, u_g, v_g):
+        """Connects the providers in one subgraph to consumers in another.
+
+        Instead of intersecting what each provider provides with what each
+        consumer requires this creates an index of which providers provide a
+        given name (in the order the providers were added) and then looks up
+        each consumers requirements in that index.
+        """
+        providers = collections.defaultdict(list)
+        for position in compat_range(u_g.start, u_g.stop):
+            provider = self._atoms[position]
+            for name in provider.provides:
+                providers[name].append(position)
+        if not providers:
+            return
+        graph = self._building
+        for position in compat_range(v_g.start, v_g.stop):
+            consumer = self._atoms[position]
+            reasons = collections.defaultdict(set)
+            for name in consumer.requires:
+                for provider_position in providers.get(name, []):
+                    reasons[provider_position].add(name)
+            for provider_position in sorted(reasons):
+                graph.add_edge(self._atoms[provider_position], consumer,
+                               reasons=reasons[provider_position])
+
+    def _add_atom(self, atom):
+        self._building.add_node(atom)
+        self._atoms.append(atom)
+
     def _flatten(self, item):
         functor = self._find_flattener(item)
         if not functor:
             raise TypeError("Unknown type requested to flatten: %s (%s)"
                             % (item, type(item)))
         self._pre_item_flatten(item)
-        graph = functor(item)
-        self._post_item_flatten(item, graph)
-        return graph
+        subgraph = functor(item)
+        self._post_item_flatten(item, subgraph)
+        return subgraph
 
     def _find_flattener(self, item):
         """Locates the flattening function to use to flatten the given item."""
@@ -125,35 +464,45 @@ class _Flattener(object):
         else:
             return None
 
-    def _connect_retry(self, retry, graph):
-        graph.add_node(retry)
+    def _connect_retry(self, retry, subgraph):
+        self._add_atom(retry)
 
-        # All graph nodes that have no predecessors should depend on its retry
-        nodes_to = [n for n in graph.no_predecessors_iter() if n != retry]
-        self._add_new_edges(graph, [retry], nodes_to, _RETRY_EDGE_DATA)
+        # All subgraph nodes that have no predecessors should depend on its
+        # retry (which then becomes the only node with no predecessors).
+        self._add_new_edges([retry], subgraph.sources, _RETRY_EDGE_DATA)
+        sinks = list(subgraph.sinks)
+        if not subgraph.sources:
+            sinks.append(retry)
 
         # Add link to retry for each node of subgraph that hasn't
         # a parent retry
-        for n in graph.nodes_iter():
-            if n != retry and 'retry' not in graph.node[n]:
-                graph.node[n]['retry'] = retry
+        node_data = self._building.node
+        for position in compat_range(subgraph.start, subgraph.stop):
+            n = self._atoms[position]
+            if 'retry' not in node_data[n]:
+                node_data[n]['retry'] = retry
+        return _Subgraph(subgraph.start, subgraph.stop + 1, [retry], sinks)
 
     def _flatten_task(self, task):
         """Flattens a individual task."""
-        graph = gr.DiGraph(name=task.name)
-        graph.add_node(task)
-        return graph
+        start = len(self._atoms)
+        self._add_atom(task)
+        return _Subgraph(start, start + 1, [task], [task])
 
     def _flatten_flow(self, flow):
         """Flattens a graph flow."""
-        graph = gr.DiGraph(name=flow.name)
+        start = len(self._atoms)
 
-        # Flatten all nodes into a single subgraph per node.
+        # Flatten all nodes into the graph (keeping track of the subgraph
+        # each node was flattened into).
         subgraph_map = {}
+        sources = []
+        sinks = []
         for item in flow:
             subgraph = self._flatten(item)
             subgraph_map[item] = subgraph
-            graph = gr.merge_graphs([graph, subgraph])
+            sources.extend(subgraph.sources)
+            sinks.extend(subgraph.sinks)
 
         # Reconnect all node edges to their corresponding subgraphs.
         for (u, v, attrs) in flow.iter_links():
@@ -162,22 +511,33 @@ class _Flattener(object):
             if any(attrs.get(k) for k in ('invariant', 'manual', 'retry')):
                 # Connect nodes with no predecessors in v to nodes with
                 # no successors in u (thus maintaining the edge dependency).
-                self._add_new_edges(graph,
-                                    u_g.no_successors_iter(),
-                                    v_g.no_predecessors_iter(),
-                                    edge_attrs=attrs)
+                self._add_new_edges(u_g.sinks, v_g.sources, attrs)
             else:
                 # This is dependency-only edge, connect corresponding
                 # providers and consumers.
-                for provider in u_g:
-                    for consumer in v_g:
-                        reasons = provider.provides & consumer.requires
-                        if reasons:
-                            graph.add_edge(provider, consumer, reasons=reasons)
-
+                self._add_dependency_edges(u_g, v_g)
+
+        # Only the contained subgraphs sources and sinks can be sources and
+        # sinks of this subgraph (since edges are only ever added).
+        graph = self._building
+        sources = [n for n in sources if not graph.pred[n]]
+        sinks = [n for n in sinks if not graph.succ[n]]
+        subgraph = _Subgraph(start, len(self._atoms), sources, sinks)
         if flow.retry is not None:
-            self._connect_retry(flow.retry, graph)
-        return graph
+            subgraph = self._connect_retry(flow.retry, subgraph)
+        if flow.max_in_flight is not None:
+            self._limit_flow(flow, subgraph)
+        return subgraph
+
+    def _limit_flow(self, flow, subgraph):
+        """Records the flows in flight limit on the atoms it contains."""
+        flow_limits = self._building.graph.setdefault('flow_limits', [])
+        limit_index = len(flow_limits)
+        flow_limits.append(flow.max_in_flight)
+        node_data = self._building.node
+        for position in compat_range(subgraph.start, subgraph.stop):
+            n = self._atoms[position]
+            node_data[n].setdefault('flow_limits', []).append(limit_index)
 
     def _pre_item_flatten(self, item):
         """Called before a item is flattened; any pre-flattening actions."""
@@ -186,12 +546,14 @@ class _Flattener(object):
                              " flattening not supported" % (item, id(item)))
         self._history.add(id(item))
 
-    def _post_item_flatten(self, item, graph):
+    def _post_item_flatten(self, item, subgraph):
         """Called before a item is flattened; any post-flattening actions."""
 
     def _pre_flatten(self):
         """Called before the flattening of the item starts."""
         self._history.clear()
+        self._atoms = []
+        self._building = gr.DiGraph(name=getattr(self._root, 'name', ''))
 
     def _post_flatten(self, graph):
         """Called after the flattening of the item finishes successfully."""
@@ -202,6 +564,8 @@ class _Flattener(object):
             raise exc.Duplicate("Atoms with duplicate names "
                                 "found: %s" % (dup_names))
         self._history.clear()
+        self._atoms = []
+        self._building = None
         # NOTE(harlowja): this one can be expensive to calculate (especially
         # the cycle detection), so only do it if we know debugging is enabled
         # and not under all cases.
@@ -216,7 +580,8 @@ class _Flattener(object):
         if self._graph is not None:
             return self._graph
         self._pre_flatten()
-        graph = self._flatten(self._root)
+        self._flatten(self._root)
+        graph = self._building
         self._post_flatten(graph)
         self._graph = graph
         if self._freeze:
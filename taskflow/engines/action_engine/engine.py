@@ -77,6 +77,7 @@ class ActionEngine(base.EngineBase):
             raise exc.InvalidState("Can not suspend an engine"
                                    " which has not been compiled")
         self._change_state(states.SUSPENDING)
+        self._task_executor.cancel()
 
     @property
     def compilation(self):
@@ -129,6 +130,8 @@ class ActionEngine(base.EngineBase):
             try:
                 closed = False
                 for (last_state, failures) in runner.run_iter(timeout=timeout):
+                    if self._flush_per_iteration:
+                        self.storage.flush()
                     if failures:
                         misc.Failure.reraise_if_any(failures)
                     if closed:
@@ -154,6 +157,15 @@ class ActionEngine(base.EngineBase):
                     if last_state not in [states.SUSPENDED, states.SUCCESS]:
                         failures = self.storage.get_failures()
                         misc.Failure.reraise_if_any(failures.values())
+            finally:
+                # Never leave changes that were batched up
+                # (when in write-behind mode) unsaved when stopping, and
+                # release the backend connections storage reused while
+                # running.
+                try:
+                    self.storage.flush()
+                finally:
+                    self.storage.close()
 
     def _change_state(self, state):
         with self._state_lock:
@@ -177,7 +189,8 @@ class ActionEngine(base.EngineBase):
         for node in self._compilation.execution_graph.nodes_iter():
             version = misc.get_version_string(node)
             if isinstance(node, retry.Retry):
-                self.storage.ensure_retry(node.name, version, node.save_as)
+                self.storage.ensure_retry(node.name, version, node.save_as,
+                                          history_limit=node.history_limit)
             else:
                 self.storage.ensure_task(node.name, version, node.save_as)
             if node.inject:
@@ -205,13 +218,42 @@ class ActionEngine(base.EngineBase):
             self._runtime.reset_all()
             self._change_state(states.PENDING)
 
+    @property
+    def _flush_per_iteration(self):
+        # When write-behind is on without a flush interval the batched up
+        # changes are saved once per runner iteration.
+        return (self.storage.write_behind and
+                self._conf.get('write_behind_interval') is None)
+
+    @misc.cachedproperty
+    def storage(self):
+        """The storage unit for this flow."""
+        return self._storage_factory(
+            self._flow_detail, self._backend,
+            write_behind=self._conf.get('write_behind', False),
+            flush_interval=self._conf.get('write_behind_interval'))
+
+    @property
+    def executor_statistics(self):
+        """Statistics about the tasks the engines task executor is running.
+
+        Which statistics are provided depends on the task executor the
+        engine uses; an empty dictionary is returned if it tracks none.
+        """
+        return self._task_executor.statistics
+
     @misc.cachedproperty
     def _task_executor(self):
         return self._task_executor_factory()
 
     @misc.cachedproperty
     def _compiler(self):
-        return self._compiler_factory()
+        # Structurally identical flows (typically made by the same flow
+        # factory) do not need to be flattened again.
+        if self._conf.get('compilation_cache', True):
+            return self._compiler_factory(cache=compiler.COMPILATION_CACHE)
+        else:
+            return self._compiler_factory()
 
     @lock_utils.locked
     def compile(self):
@@ -221,7 +263,8 @@ class ActionEngine(base.EngineBase):
         self._runtime = runtime.Runtime(self._compilation,
                                         self.storage,
                                         self.task_notifier,
-                                        self._task_executor)
+                                        self._task_executor,
+                                        options=self._conf)
         self._compiled = True
 
 
@@ -235,12 +278,48 @@ class MultiThreadedActionEngine(ActionEngine):
     _storage_factory = atom_storage.MultiThreadedStorage
 
     def _task_executor_factory(self):
+        max_workers = self._max_workers
+        shared_executor = self._conf.get('shared_executor')
+        if shared_executor is not None and max_workers is None:
+            max_workers = self._conf.get('shared_executor_limit')
         return executor.ParallelTaskExecutor(executor=self._executor,
-                                             max_workers=self._max_workers)
+                                             max_workers=max_workers,
+                                             min_workers=self._min_workers,
+                                             shared_executor=shared_executor)
 
     def __init__(self, flow, flow_detail, backend, conf,
-                 executor=None, max_workers=None):
+                 executor=None, max_workers=None, min_workers=None):
         super(MultiThreadedActionEngine, self).__init__(
             flow, flow_detail, backend, conf)
         self._executor = executor
         self._max_workers = max_workers
+        self._min_workers = min_workers
+
+
+class ParallelProcessActionEngine(MultiThreadedActionEngine):
+    """Engine that runs tasks in parallel using child processes."""
+
+    def _task_executor_factory(self):
+        return executor.ProcessPoolTaskExecutor(executor=self._executor,
+                                                max_workers=self._max_workers)
+
+
+class AsyncioActionEngine(ActionEngine):
+    """Engine that runs tasks (which may be coroutines) using asyncio."""
+    _storage_factory = atom_storage.MultiThreadedStorage
+
+    def _task_executor_factory(self):
+        return executor.AsyncioTaskExecutor(loop=self._loop,
+                                            executor=self._executor,
+                                            max_workers=self._max_workers,
+                                            min_workers=self._min_workers)
+
+    def __init__(self, flow, flow_detail, backend, conf,
+                 loop=None, executor=None, max_workers=None,
+                 min_workers=None):
+        super(AsyncioActionEngine, self).__init__(
+            flow, flow_detail, backend, conf)
+        self._loop = loop
+        self._executor = executor
+        self._max_workers = max_workers
+        self._min_workers = min_workers
@@ -15,18 +15,30 @@
 #    under the License.
 
 import abc
+import functools
+import itertools
+import logging
+import multiprocessing
+import threading
 
 from concurrent import futures
 import six
 
 from taskflow.utils import async_utils
+from taskflow.utils import asyncio_utils
 from taskflow.utils import misc
 from taskflow.utils import threading_utils
 
+LOG = logging.getLogger(__name__)
+
 # Execution and reversion events.
 EXECUTED = 'executed'
 REVERTED = 'reverted'
 
+# Sent (after any progress updates) by a child process when it has finished
+# running a task.
+_FINISHED = 'finished'
+
 
 def _execute_task(task, arguments, progress_callback):
     with task.autobind('update_progress', progress_callback):
@@ -42,6 +54,48 @@ def _execute_task(task, arguments, progress_callback):
     return (task, EXECUTED, result)
 
 
+def _execute_task_batch(tasks, arguments):
+    started = []
+    try:
+        for task in tasks:
+            task.pre_execute()
+            started.append(task)
+        results = list(tasks[0].execute_batch(arguments))
+        if len(results) != len(tasks):
+            raise ValueError("Batch execution of %s tasks produced %s"
+                             " results" % (len(tasks), len(results)))
+    except Exception:
+        # The batch as a whole failed, so each task that was
+        # in it has failed (with the same failure).
+        results = [misc.Failure()] * len(tasks)
+    finally:
+        for task in started:
+            task.post_execute()
+    return [(task, EXECUTED, result)
+            for (task, result) in zip(tasks, results)]
+
+
+def _fan_out(fut, fs):
+    # Completes the futures of each task in a batch once the future of the
+    # batch (which results in the outcomes of each task) has completed; the
+    # futures of the tasks are cancelled when the batch was cancelled (and
+    # any that were already cancelled by their users are left alone).
+    if fut.cancelled():
+        for f in fs:
+            f.cancel()
+        return
+    try:
+        outcomes = fut.result()
+    except BaseException as e:
+        for f in fs:
+            if not f.done():
+                f.set_exception(e)
+    else:
+        for (f, outcome) in zip(fs, outcomes):
+            if not f.done():
+                f.set_result(outcome)
+
+
 def _revert_task(task, arguments, result, failures, progress_callback):
     kwargs = arguments.copy()
     kwargs['result'] = result
@@ -59,6 +113,31 @@ def _revert_task(task, arguments, result, failures, progress_callback):
     return (task, REVERTED, result)
 
 
+def _process_run_task(functor, task, token, progress_queue, *args):
+    # This runs in a child process, so progress is relayed over the queue
+    # and failures are sent in their dictionary form (tracebacks can not be
+    # pickled).
+    def on_progress(_task, _event_data, progress, **kwargs):
+        progress_queue.put((token, progress, kwargs))
+
+    args = args + (on_progress,)
+    try:
+        (_task, event, result) = functor(task, *args)
+    finally:
+        progress_queue.put((token, _FINISHED, None))
+    if isinstance(result, misc.Failure):
+        return (event, True, result.to_dict())
+    else:
+        return (event, False, result)
+
+
+def _make_picklable_failure(failure):
+    # Drops the (not picklable) traceback of a failure.
+    if isinstance(failure, misc.Failure) and failure.exc_info is not None:
+        return misc.Failure.from_dict(failure.to_dict())
+    return failure
+
+
 @six.add_metaclass(abc.ABCMeta)
 class TaskExecutorBase(object):
     """Executes and reverts tasks.
@@ -72,6 +151,41 @@ class TaskExecutorBase(object):
     def execute_task(self, task, task_uuid, arguments, progress_callback=None):
         """Schedules task execution."""
 
+    def execute_task_inline(self, task, task_uuid, arguments,
+                            progress_callback=None):
+        """Executes a (trivial) task on the calling thread (if possible).
+
+        Returns a future (that will typically already be done). Executors
+        that can not execute tasks on the calling thread (the default) will
+        schedule the tasks execution as usual instead.
+        """
+        return self.execute_task(task, task_uuid, arguments,
+                                 progress_callback=progress_callback)
+
+    def revert_task_inline(self, task, task_uuid, arguments, result,
+                           failures, progress_callback=None):
+        """Reverts a (trivial) task on the calling thread (if possible).
+
+        Returns a future (that will typically already be done). Executors
+        that can not revert tasks on the calling thread (the default) will
+        schedule the tasks reversion as usual instead.
+        """
+        return self.revert_task(task, task_uuid, arguments, result, failures,
+                                progress_callback=progress_callback)
+
+    def execute_task_batch(self, tasks, task_uuids, arguments,
+                           progress_callback=None):
+        """Schedules execution of a batch of tasks (of the same class).
+
+        Returns a list of futures (one for each task, in the same order).
+        Executors that can not execute batches of tasks (the default) will
+        execute each of the tasks on its own instead.
+        """
+        return [self.execute_task(task, task_uuid, task_arguments,
+                                  progress_callback=progress_callback)
+                for (task, task_uuid, task_arguments)
+                in zip(tasks, task_uuids, arguments)]
+
     @abc.abstractmethod
     def revert_task(self, task, task_uuid, arguments, result, failures,
                     progress_callback=None):
@@ -89,17 +203,39 @@ class TaskExecutorBase(object):
         """Finalize task executor."""
         pass
 
+    @property
+    def statistics(self):
+        """Dictionary of statistics about the tasks being executed.
+
+        Executors that do not track any statistics (the default) return an
+        empty dictionary.
+        """
+        return {}
+
+    def cancel(self):
+        """Attempts to cancel the tasks that are currently running.
+
+        Executors that are not able to cancel running tasks (the default) will
+        let those tasks run to completion.
+        """
+        pass
+
 
 class SerialTaskExecutor(TaskExecutorBase):
     """Execute task one after another."""
 
     def execute_task(self, task, task_uuid, arguments, progress_callback=None):
-        return async_utils.make_completed_future(
+        return async_utils.CompletedFuture(
             _execute_task(task, arguments, progress_callback))
 
+    def execute_task_batch(self, tasks, task_uuids, arguments,
+                           progress_callback=None):
+        return [async_utils.CompletedFuture(outcome)
+                for outcome in _execute_task_batch(tasks, arguments)]
+
     def revert_task(self, task, task_uuid, arguments, result, failures,
                     progress_callback=None):
-        return async_utils.make_completed_future(
+        return async_utils.CompletedFuture(
             _revert_task(task, arguments, result,
                          failures, progress_callback))
 
@@ -112,18 +248,51 @@ class ParallelTaskExecutor(TaskExecutorBase):
     """Executes tasks in parallel.
 
     Submits tasks to an executor which should provide an interface similar
-    to concurrent.Futures.Executor.
+    to concurrent.Futures.Executor. If one is not provided an
+    :py:class:`~taskflow.utils.threading_utils.AdaptiveThreadPoolExecutor`
+    will be created that grows and shrinks its amount of threads (between
+    the given min and max workers) as tasks are submitted and completed.
+
+    If the name of a shared executor is provided this executor will instead
+    attach to the process wide
+    :py:class:`~taskflow.utils.threading_utils.SharedThreadPoolExecutor`
+    with that name (and detach from it when stopped); in that case the
+    given max workers limits how many of the submitted tasks the shared
+    executor will run at the same time.
     """
 
-    def __init__(self, executor=None, max_workers=None):
+    def __init__(self, executor=None, max_workers=None, min_workers=None,
+                 shared_executor=None):
         self._executor = executor
         self._max_workers = max_workers
+        self._min_workers = min_workers
+        self._shared_executor = shared_executor
         self._create_executor = executor is None
 
     def execute_task(self, task, task_uuid, arguments, progress_callback=None):
         return self._executor.submit(
             _execute_task, task, arguments, progress_callback)
 
+    def execute_task_inline(self, task, task_uuid, arguments,
+                            progress_callback=None):
+        return async_utils.CompletedFuture(
+            _execute_task(task, arguments, progress_callback))
+
+    def revert_task_inline(self, task, task_uuid, arguments, result,
+                           failures, progress_callback=None):
+        return async_utils.CompletedFuture(
+            _revert_task(task, arguments, result,
+                         failures, progress_callback))
+
+    def execute_task_batch(self, tasks, task_uuids, arguments,
+                           progress_callback=None):
+        fut = self._executor.submit(_execute_task_batch, tasks, arguments)
+        # Green batches must give out green futures (to be waited on using
+        # a green waiter).
+        fs = [type(fut)() for _task in tasks]
+        fut.add_done_callback(functools.partial(_fan_out, fs=fs))
+        return fs
+
     def revert_task(self, task, task_uuid, arguments, result, failures,
                     progress_callback=None):
         return self._executor.submit(
@@ -133,15 +302,327 @@ class ParallelTaskExecutor(TaskExecutorBase):
     def wait_for_any(self, fs, timeout=None):
         return async_utils.wait_for_any(fs, timeout)
 
+    @property
+    def statistics(self):
+        return dict(getattr(self._executor, 'statistics', None) or {})
+
     def start(self):
+        if not self._create_executor:
+            return
+        if self._shared_executor is not None:
+            shared = threading_utils.fetch_shared_executor(
+                self._shared_executor)
+            self._executor = shared.attach(max_workers=self._max_workers)
+        else:
+            kwargs = {'max_workers': self._max_workers}
+            if self._min_workers is not None:
+                kwargs['min_workers'] = self._min_workers
+            self._executor = threading_utils.AdaptiveThreadPoolExecutor(
+                **kwargs)
+
+    def stop(self):
         if self._create_executor:
-            if self._max_workers is not None:
-                max_workers = self._max_workers
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+class _ProcessPending(object):
+    """A task (ran in a child process) that has not yet completed."""
+
+    def __init__(self, task, event, progress_callback):
+        self.task = task
+        self.event = event
+        self.progress_callback = progress_callback
+        self.future = futures.Future()
+        self.outcome = None
+        self.finished = False
+
+
+class ProcessPoolTaskExecutor(TaskExecutorBase):
+    """Executes tasks in parallel using child processes.
+
+    Submits tasks to an executor which should provide an interface similar
+    to concurrent.Futures.ProcessPoolExecutor (a process pool executor will
+    be created if one is not provided). Since tasks (and there arguments and
+    results) are pickled to and from the child processes they (and any
+    progress details they emit) must be picklable. Progress updates are
+    relayed back to this process (over a multiprocessing managed queue) and
+    failures are sent back in their dictionary form (so they can not be
+    reraised with their original traceback).
+    """
+
+    def __init__(self, executor=None, max_workers=None):
+        self._executor = executor
+        self._max_workers = max_workers
+        self._create_executor = executor is None
+        self._manager = None
+        self._progress_queue = None
+        self._relayer = None
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._tokens = itertools.count()
+
+    def _submit_task(self, functor, task, event, progress_callback, *args):
+        token = six.next(self._tokens)
+        pending = _ProcessPending(task, event, progress_callback)
+        with self._pending_lock:
+            self._pending[token] = pending
+        try:
+            fut = self._executor.submit(_process_run_task, functor, task,
+                                        token, self._progress_queue, *args)
+        except Exception:
+            with self._pending_lock:
+                self._pending.pop(token, None)
+            raise
+        fut.add_done_callback(functools.partial(self._on_done, token))
+        return pending.future
+
+    def _on_done(self, token, fut):
+        with self._pending_lock:
+            pending = self._pending.get(token)
+            if pending is None:
+                return
+            try:
+                (event, failed, result) = fut.result()
+            except Exception:
+                # The child process never ran (or never finished running) the
+                # task (so it also will not send that it has finished).
+                pending.outcome = (pending.event, misc.Failure())
+                pending.finished = True
             else:
-                max_workers = threading_utils.get_optimal_thread_count()
-            self._executor = futures.ThreadPoolExecutor(max_workers)
+                if failed:
+                    result = misc.Failure.from_dict(result)
+                pending.outcome = (event, result)
+            self._maybe_complete(token, pending)
+
+    def _maybe_complete(self, token, pending):
+        # Only complete the task once its result is known and
+        # any progress updates it sent have been relayed (so that a late
+        # progress update can not be relayed after the task completed).
+        if pending.outcome is not None and pending.finished:
+            self._pending.pop(token, None)
+            (event, result) = pending.outcome
+            pending.future.set_result((pending.task, event, result))
+
+    def _relay_progress(self):
+        while True:
+            message = self._progress_queue.get()
+            if message is None:
+                break
+            (token, progress, details) = message
+            with self._pending_lock:
+                pending = self._pending.get(token)
+                if pending is None:
+                    continue
+                if progress == _FINISHED:
+                    pending.finished = True
+                    self._maybe_complete(token, pending)
+                    continue
+            if pending.progress_callback is not None:
+                try:
+                    pending.progress_callback(pending.task, {}, progress,
+                                              **details)
+                except Exception:
+                    LOG.warn("Failed relaying progress of %s",
+                             pending.task, exc_info=True)
+
+    def execute_task(self, task, task_uuid, arguments, progress_callback=None):
+        return self._submit_task(_execute_task, task, EXECUTED,
+                                 progress_callback, arguments)
+
+    def revert_task(self, task, task_uuid, arguments, result, failures,
+                    progress_callback=None):
+        result = _make_picklable_failure(result)
+        failures = dict((name, _make_picklable_failure(failure))
+                        for (name, failure) in six.iteritems(failures))
+        return self._submit_task(_revert_task, task, REVERTED,
+                                 progress_callback, arguments, result,
+                                 failures)
+
+    def wait_for_any(self, fs, timeout=None):
+        return async_utils.wait_for_any(fs, timeout)
+
+    def start(self):
+        self._manager = multiprocessing.Manager()
+        self._progress_queue = self._manager.Queue()
+        self._relayer = threading_utils.daemon_thread(self._relay_progress)
+        self._relayer.start()
+        if self._create_executor:
+            self._executor = futures.ProcessPoolExecutor(self._max_workers)
 
     def stop(self):
         if self._create_executor:
             self._executor.shutdown(wait=True)
             self._executor = None
+        self._progress_queue.put(None)
+        self._relayer.join()
+        self._relayer = None
+        self._manager.shutdown()
+        self._manager = None
+        self._progress_queue = None
+
+
+class AsyncioTaskExecutor(TaskExecutorBase):
+    """Executes tasks using an asyncio event loop.
+
+    Tasks whose ``execute`` (or ``revert``) method is a coroutine function are
+    ran as coroutines on the event loop (so that many of them can be in flight
+    at once without requiring a thread for each one); tasks that have plain
+    methods are ran using a :py:class:`.ParallelTaskExecutor` (created using
+    the provided executor and max workers) so that they can not block the
+    event loop.
+
+    If an event loop is not provided one will be created and ran in a
+    dedicated thread; if one is provided it must already be running in a
+    thread other than the one running the engine. Running coroutines will be
+    cancelled when :meth:`cancel` is called (tasks ran using the parallel
+    executor will be allowed to run to completion).
+    """
+
+    def __init__(self, loop=None, executor=None, max_workers=None,
+                 min_workers=None):
+        self._loop = loop
+        self._create_loop = loop is None
+        self._loop_thread = None
+        self._blocking = ParallelTaskExecutor(executor=executor,
+                                              max_workers=max_workers,
+                                              min_workers=min_workers)
+        # Asyncio future -> returned future (only used in the loops thread).
+        self._running = {}
+
+    def _submit_coroutine(self, task, event, progress_callback,
+                          pre_functor, functor, post_functor):
+        fut = futures.Future()
+        self._loop.call_soon_threadsafe(self._start_coroutine, fut, task,
+                                        event, progress_callback,
+                                        pre_functor, functor, post_functor)
+        return fut
+
+    def _start_coroutine(self, fut, task, event, progress_callback,
+                         pre_functor, functor, post_functor):
+        if progress_callback is not None:
+            task.bind('update_progress', progress_callback)
+        finisher = functools.partial(self._finish_coroutine, fut, task,
+                                     event, progress_callback, post_functor)
+        try:
+            pre_functor()
+            coro_fut = self._loop.create_task(functor())
+        except Exception:
+            finisher(misc.Failure())
+        else:
+            self._running[coro_fut] = finisher
+            coro_fut.add_done_callback(self._on_coroutine_done)
+
+    def _on_coroutine_done(self, coro_fut):
+        finisher = self._running.pop(coro_fut)
+        if coro_fut.cancelled():
+            finisher(None, cancelled=True)
+        else:
+            try:
+                result = coro_fut.result()
+            except Exception:
+                # Just like what happens when a non-coroutine task raises.
+                result = misc.Failure()
+            finisher(result)
+
+    def _finish_coroutine(self, fut, task, event, progress_callback,
+                          post_functor, result, cancelled=False):
+        try:
+            post_functor()
+        except Exception as e:
+            fut.set_exception(e)
+            return
+        finally:
+            if progress_callback is not None:
+                task.unbind('update_progress', progress_callback)
+        if cancelled:
+            # The task did not finish (and now will not) so make sure anyone
+            # waiting on its future sees that it was cancelled.
+            fut.cancel()
+            fut.set_running_or_notify_cancel()
+        else:
+            fut.set_result((task, event, result))
+
+    def _cancel_coroutines(self):
+        for coro_fut in list(six.iterkeys(self._running)):
+            coro_fut.cancel()
+
+    def execute_task(self, task, task_uuid, arguments, progress_callback=None):
+        if not asyncio_utils.is_coroutine_function(task.execute):
+            return self._blocking.execute_task(task, task_uuid, arguments,
+                                               progress_callback)
+        return self._submit_coroutine(task, EXECUTED, progress_callback,
+                                      task.pre_execute,
+                                      functools.partial(task.execute,
+                                                        **arguments),
+                                      task.post_execute)
+
+    def execute_task_inline(self, task, task_uuid, arguments,
+                            progress_callback=None):
+        if not asyncio_utils.is_coroutine_function(task.execute):
+            return self._blocking.execute_task_inline(task, task_uuid,
+                                                      arguments,
+                                                      progress_callback)
+        return self.execute_task(task, task_uuid, arguments,
+                                 progress_callback)
+
+    def revert_task_inline(self, task, task_uuid, arguments, result,
+                           failures, progress_callback=None):
+        if not asyncio_utils.is_coroutine_function(task.revert):
+            return self._blocking.revert_task_inline(task, task_uuid,
+                                                     arguments, result,
+                                                     failures,
+                                                     progress_callback)
+        return self.revert_task(task, task_uuid, arguments, result, failures,
+                                progress_callback)
+
+    def execute_task_batch(self, tasks, task_uuids, arguments,
+                           progress_callback=None):
+        if not asyncio_utils.is_coroutine_function(tasks[0].execute_batch):
+            return self._blocking.execute_task_batch(tasks, task_uuids,
+                                                     arguments,
+                                                     progress_callback)
+        return super(AsyncioTaskExecutor, self).execute_task_batch(
+            tasks, task_uuids, arguments, progress_callback)
+
+    def revert_task(self, task, task_uuid, arguments, result, failures,
+                    progress_callback=None):
+        if not asyncio_utils.is_coroutine_function(task.revert):
+            return self._blocking.revert_task(task, task_uuid, arguments,
+                                              result, failures,
+                                              progress_callback)
+        kwargs = arguments.copy()
+        kwargs['result'] = result
+        kwargs['flow_failures'] = failures
+        return self._submit_coroutine(task, REVERTED, progress_callback,
+                                      task.pre_revert,
+                                      functools.partial(task.revert,
+                                                        **kwargs),
+                                      task.post_revert)
+
+    def wait_for_any(self, fs, timeout=None):
+        return async_utils.wait_for_any(fs, timeout)
+
+    @property
+    def statistics(self):
+        statistics = self._blocking.statistics
+        statistics['running_coroutines'] = len(self._running)
+        return statistics
+
+    def cancel(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._cancel_coroutines)
+
+    def start(self):
+        if self._create_loop:
+            self._loop_thread = asyncio_utils.LoopThread()
+            self._loop_thread.start()
+            self._loop = self._loop_thread.loop
+        self._blocking.start()
+
+    def stop(self):
+        self._blocking.stop()
+        if self._create_loop:
+            self._loop_thread.stop()
+            self._loop_thread = None
+            self._loop = None
@@ -27,9 +27,10 @@ SAVE_RESULT_STATES = (states.SUCCESS, states.FAILURE)
 
 
 class RetryAction(object):
-    def __init__(self, storage, notifier):
+    def __init__(self, storage, notifier, state_callback=None):
         self._storage = storage
         self._notifier = notifier
+        self._state_callback = state_callback
 
     def _get_retry_args(self, retry):
         kwargs = self._storage.fetch_mapped_args(retry.rebind,
@@ -49,6 +50,8 @@ class RetryAction(object):
                 # write anything to storage and run notifications
                 return
             self._storage.set_atom_state(retry.name, state)
+        if self._state_callback is not None:
+            self._state_callback(retry)
         retry_uuid = self._storage.get_atom_uuid(retry.name)
         details = dict(retry_name=retry.name,
                        retry_uuid=retry_uuid,
@@ -65,7 +68,7 @@ class RetryAction(object):
             self.change_state(retry, states.FAILURE, result=result)
         else:
             self.change_state(retry, states.SUCCESS, result=result)
-        return async_utils.make_completed_future((retry, ex.EXECUTED, result))
+        return async_utils.CompletedFuture((retry, ex.EXECUTED, result))
 
     def revert(self, retry):
         self.change_state(retry, states.REVERTING)
@@ -78,7 +81,7 @@ class RetryAction(object):
             self.change_state(retry, states.FAILURE)
         else:
             self.change_state(retry, states.REVERTED)
-        return async_utils.make_completed_future((retry, ex.REVERTED, result))
+        return async_utils.CompletedFuture((retry, ex.REVERTED, result))
 
     def on_failure(self, retry, atom, last_failure):
         self._storage.save_retry_failure(retry.name, atom.name, last_failure)
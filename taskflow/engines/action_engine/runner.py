@@ -18,6 +18,7 @@ import logging
 
 from taskflow import states as st
 from taskflow.types import fsm
+from taskflow.utils import async_utils
 from taskflow.utils import misc
 
 # Waiting state timeout (in seconds).
@@ -39,6 +40,18 @@ class _MachineMemory(object):
         self.not_done = set()
         self.failures = []
         self.done = set()
+        # Futures are pushed onto this as they complete (so that waiting does
+        # not need to examine all the not done futures); the not done green
+        # futures are also tracked since those have to be waited on using
+        # the waiter instead.
+        self.completions = async_utils.CompletionQueue()
+        self.green_not_done = set()
+        # Whether any of the futures were cancelled (the atoms those futures
+        # were for were not finished and will need to be resumed).
+        self.cancelled = False
+        # Tasks whose arguments can be fetched (while waiting) before those
+        # tasks are scheduled.
+        self.prefetch = set()
 
 
 class _MachineBuilder(object):
@@ -59,6 +72,7 @@ class _MachineBuilder(object):
        GAME_OVER   | suspended | SUSPENDED  |          |
         RESUMING   | schedule  | SCHEDULING |          |
       REVERTED[$]  |           |            |          |
+       SCHEDULING  |  analyze  | ANALYZING  |          |
        SCHEDULING  |   wait    |  WAITING   |          |
        SUCCESS[$]  |           |            |          |
       SUSPENDED[$] |           |            |          |
@@ -71,6 +85,13 @@ class _MachineBuilder(object):
     non-resolveable task failure or scheduling failure) the machine will stop
     executing new tasks (currently running tasks will be allowed to complete)
     and this machines run loop will be broken.
+
+    When all the atoms that were scheduled have already completed (which is
+    always the case when a serial executor is used) the ``WAITING`` state is
+    skipped and those atoms are analyzed right away. Before blocking in the
+    ``WAITING`` state the arguments of the tasks that are likely to be
+    scheduled next are fetched (so that they are ready once those tasks
+    are).
     """
 
     def __init__(self, runtime, waiter):
@@ -89,6 +110,7 @@ class _MachineBuilder(object):
             timeout = _WAITING_TIMEOUT
 
         def resume(old_state, new_state, event):
+            self._scheduler.refresh()
             memory.next_nodes.update(self._completer.resume())
             memory.next_nodes.update(self._analyzer.get_next_nodes())
             return 'schedule'
@@ -96,7 +118,7 @@ class _MachineBuilder(object):
         def game_over(old_state, new_state, event):
             if memory.failures:
                 return 'failed'
-            if self._analyzer.get_next_nodes():
+            if memory.cancelled or self._analyzer.get_next_nodes():
                 return 'suspended'
             elif self._analyzer.is_success():
                 return 'success'
@@ -104,14 +126,32 @@ class _MachineBuilder(object):
                 return 'reverted'
 
         def schedule(old_state, new_state, event):
-            if self.runnable() and memory.next_nodes:
-                not_done, failures = self._scheduler.schedule(
-                    memory.next_nodes)
-                if not_done:
-                    memory.not_done.update(not_done)
+            if self.runnable() and (memory.next_nodes or
+                                    self._scheduler.deferring):
+                # Only schedule (the most important) nodes that fit in the
+                # in flight limits, the rest are kept by the scheduler and
+                # are scheduled as running nodes complete.
+                nodes, deferred = self._scheduler.admit(memory.next_nodes)
+                not_done, failures = self._scheduler.schedule(nodes)
+                for fut in not_done:
+                    if fut.done():
+                        # Already completed (for example by a
+                        # serial executor) so there is no need to wait on it.
+                        memory.done.add(fut)
+                        continue
+                    memory.not_done.add(fut)
+                    if async_utils.is_green_future(fut):
+                        memory.green_not_done.add(fut)
+                    memory.completions.watch(fut)
                 if failures:
                     memory.failures.extend(failures)
                 memory.next_nodes.clear()
+                if self._scheduler.prefetching:
+                    memory.prefetch.clear()
+                    memory.prefetch.update(deferred)
+                    memory.prefetch.update(self._scheduler.predict(nodes))
+            if memory.done:
+                return 'analyze'
             return 'wait'
 
         def wait(old_state, new_state, event):
@@ -119,18 +159,38 @@ class _MachineBuilder(object):
             # call sometime in the future, or equivalent that will work in
             # py2 and py3.
             if memory.not_done:
-                done, not_done = self._waiter.wait_for_any(memory.not_done,
-                                                           timeout)
+                done = memory.completions.get(block=False)
+                if not done and memory.prefetch:
+                    # Use the time that would be spent blocked waiting.
+                    self._scheduler.prefetch(memory.prefetch)
+                    memory.prefetch.clear()
+                    done = memory.completions.get(block=False)
+                if not done:
+                    if memory.green_not_done:
+                        self._waiter.wait_for_any(memory.green_not_done,
+                                                  timeout)
+                        done = memory.completions.get(block=False)
+                    else:
+                        done = memory.completions.get(timeout=timeout)
+                for fut in done:
+                    memory.not_done.discard(fut)
+                    memory.green_not_done.discard(fut)
                 memory.done.update(done)
-                memory.not_done = not_done
             return 'analyze'
 
         def analyze(old_state, new_state, event):
             next_nodes = set()
             while memory.done:
                 fut = memory.done.pop()
+                if fut.cancelled():
+                    # The node was not finished, leave it in
+                    # its current state so that it will be resumed (and ran
+                    # again) when the engine next runs.
+                    memory.cancelled = True
+                    continue
                 try:
                     node, event, result = fut.result()
+                    self._scheduler.release(node)
                     retain = self._completer.complete(node, event, result)
                     if retain and isinstance(result, misc.Failure):
                         memory.failures.append(result)
@@ -143,8 +203,14 @@ class _MachineBuilder(object):
                         memory.failures.append(misc.Failure())
                     else:
                         next_nodes.update(more_nodes)
-            if self.runnable() and next_nodes and not memory.failures:
-                memory.next_nodes.update(next_nodes)
+            # Deferred nodes may have stopped being ready (for example if a
+            # retry controller reverted their subflow).
+            for node in self._analyzer.pop_unready_nodes():
+                memory.next_nodes.discard(node)
+                self._scheduler.discard(node)
+            memory.next_nodes.update(next_nodes)
+            if (self.runnable() and not memory.failures and
+                    (memory.next_nodes or self._scheduler.deferring)):
                 return 'schedule'
             elif memory.not_done:
                 return 'wait'
@@ -187,6 +253,7 @@ class _MachineBuilder(object):
         m.add_transition(st.ANALYZING, st.SCHEDULING, 'schedule')
         m.add_transition(st.ANALYZING, st.WAITING, 'wait')
         m.add_transition(st.RESUMING, st.SCHEDULING, 'schedule')
+        m.add_transition(st.SCHEDULING, st.ANALYZING, 'analyze')
         m.add_transition(st.SCHEDULING, st.WAITING, 'wait')
         m.add_transition(st.WAITING, st.ANALYZING, 'analyze')
 
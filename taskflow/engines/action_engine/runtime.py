@@ -14,6 +14,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import heapq
+
+import six
+
 from taskflow.engines.action_engine import analyzer as ca
 from taskflow.engines.action_engine import executor as ex
 from taskflow.engines.action_engine import retry_action as ra
@@ -24,6 +29,7 @@ from taskflow import retry as retry_atom
 from taskflow import states as st
 from taskflow import task as task_atom
 from taskflow.utils import misc
+from taskflow.utils import reflection
 
 
 class Runtime(object):
@@ -34,11 +40,16 @@ class Runtime(object):
     action engine to run to completion.
     """
 
-    def __init__(self, compilation, storage, task_notifier, task_executor):
+    def __init__(self, compilation, storage, task_notifier, task_executor,
+                 options=None):
         self._task_notifier = task_notifier
         self._task_executor = task_executor
         self._storage = storage
         self._compilation = compilation
+        if not options:
+            self._options = {}
+        else:
+            self._options = dict(options)
 
     @property
     def compilation(self):
@@ -48,6 +59,10 @@ class Runtime(object):
     def storage(self):
         return self._storage
 
+    @property
+    def options(self):
+        return self._options
+
     @misc.cachedproperty
     def analyzer(self):
         return ca.Analyzer(self._compilation, self._storage)
@@ -66,12 +81,19 @@ class Runtime(object):
 
     @misc.cachedproperty
     def retry_action(self):
-        return ra.RetryAction(self.storage, self._task_notifier)
+        return ra.RetryAction(self.storage, self._task_notifier,
+                              state_callback=self.analyzer.refresh_atom)
 
     @misc.cachedproperty
     def task_action(self):
         return ta.TaskAction(self.storage, self._task_executor,
-                             self._task_notifier)
+                             self._task_notifier,
+                             state_callback=self.analyzer.refresh_atom)
+
+    def set_intention(self, node, intention):
+        """Sets the intention of a node (informing the analyzer of it)."""
+        self.storage.set_atom_intention(node.name, intention)
+        self.analyzer.refresh_atom(node)
 
     def reset_nodes(self, nodes, state=st.PENDING, intention=st.EXECUTE):
         for node in nodes:
@@ -84,7 +106,7 @@ class Runtime(object):
                     raise TypeError("Unknown how to reset node %s, %s"
                                     % (node, type(node)))
             if intention:
-                self.storage.set_atom_intention(node.name, intention)
+                self.set_intention(node, intention)
 
     def reset_all(self, state=st.PENDING, intention=st.EXECUTE):
         self.reset_nodes(self.analyzer.iterate_all_nodes(),
@@ -97,7 +119,7 @@ class Runtime(object):
 
 # Various helper methods used by completer and scheduler.
 def _retry_subflow(retry, runtime):
-    runtime.storage.set_atom_intention(retry.name, st.EXECUTE)
+    runtime.set_intention(retry, st.EXECUTE)
     runtime.reset_subgraph(retry)
 
 
@@ -129,6 +151,9 @@ class Completer(object):
         nodes that were previously not finished (due to a RUNNING or REVERTING
         attempt not previously finishing).
         """
+        # Storage may have been altered since the analyzer last looked at
+        # it, so make sure it starts off with the current atom states.
+        self._analyzer.refresh()
         for node in self._analyzer.iterate_all_nodes():
             if self._analyzer.get_state(node) == st.FAILURE:
                 self._process_atom_failure(node, self._storage.get(node.name))
@@ -170,7 +195,7 @@ class Completer(object):
             action = self._retry_action.on_failure(retry, atom, failure)
             if action == retry_atom.RETRY:
                 # Prepare subflow for revert
-                self._storage.set_atom_intention(retry.name, st.RETRY)
+                self._runtime.set_intention(retry, st.RETRY)
                 self._runtime.reset_subgraph(retry, state=None,
                                              intention=st.REVERT)
             elif action == retry_atom.REVERT:
@@ -190,14 +215,318 @@ class Completer(object):
 
 
 class Scheduler(object):
-    """Schedules atoms using actions to schedule."""
+    """Schedules atoms using actions to schedule.
+
+    When many atoms are ready to be scheduled at the same time they are
+    scheduled in order of their priority and then (for atoms with the same
+    priority) in order of their critical path weight. The weight of an atom
+    is how long it takes to run it and the longest chain of atoms that
+    depend on it (using the durations that the
+    :py:class:`~taskflow.listeners.timing.TimingListener` recorded for the
+    atoms, or a single unit for atoms that have no recorded duration) so
+    that atoms that the completion of the flow depends on the most are
+    started first (and do not wait behind atoms that nothing depends on).
+
+    If the ``max_in_flight`` option is provided then at most that many atoms
+    will be running at the same time (the remaining ready atoms will be
+    scheduled as running atoms complete). The same applies to the atoms of
+    each flow (or atom class) that has a ``max_in_flight`` attribute, and to
+    the atoms of each atom class (or class name) that the
+    ``max_in_flight_per_class`` option maps to a limit (which takes
+    precedence over the attribute of those atom classes). The ready atoms
+    that did not fit in the limits are kept (in priority order) in a heap
+    per group of limits that apply to them, so that admitting atoms as
+    running atoms complete does not need to look at all of them.
+
+    Tasks of a class that can be executed in batches (see
+    :py:class:`~taskflow.task.BaseTask`) that are scheduled at the same time
+    are grouped together and executed as a single batch.
+
+    Tasks that are marked as ``inline`` (and, if the ``inline_threshold``
+    option is provided, tasks that have a recorded duration that is less
+    than that many seconds) are ran directly on the engine thread by task
+    executors that would otherwise run them in another thread; they are
+    scheduled after the other atoms being scheduled at the same time (so
+    that those do not have to wait for the inline tasks to finish before
+    they are started).
+
+    While the engine waits for scheduled atoms to complete the arguments of
+    the tasks that are likely to be scheduled next (ready tasks that did not
+    fit in the in flight limits and the successors of the scheduled atoms
+    that do not depend on the results of those atoms) are fetched ahead of
+    time (unless the ``prefetch_arguments`` option is false) so that those
+    tasks can be started right away once they are ready.
+    """
 
     def __init__(self, runtime):
         self._analyzer = runtime.analyzer
+        self._graph = runtime.compilation.indexed_graph
         self._retry_action = runtime.retry_action
         self._runtime = runtime
         self._storage = runtime.storage
         self._task_action = runtime.task_action
+        self._weights = None
+        self._inline = frozenset()
+        self._inline_threshold = runtime.options.get('inline_threshold')
+        self._window = runtime.options.get('max_in_flight')
+        self._prefetching = bool(
+            runtime.options.get('prefetch_arguments', True))
+        self._limits = {}
+        self._groups = self._build_groups(
+            runtime.options.get('max_in_flight_per_class'))
+        self._in_flight = dict((key, 0) for key in self._limits)
+        # Indexes of the nodes that did not fit in the in flight limits (and
+        # are still waiting to be admitted); they are also kept in a heap (of
+        # their sort keys) per group of limits that applies to them. Entries
+        # of nodes that are no longer deferred are left in those heaps and
+        # are dropped once they reach the top.
+        self._deferred = set()
+        self._queues = {}
+
+    @property
+    def window(self):
+        """Maximum number of atoms to have in flight (or none if unbounded)."""
+        return self._window
+
+    def _add_limit(self, key, limit, what):
+        if limit <= 0:
+            raise ValueError("The maximum number of %s in flight must be"
+                             " greater than zero" % what)
+        if key in self._limits:
+            # The attribute may have been altered on an instance.
+            limit = min(limit, self._limits[key])
+        self._limits[key] = limit
+
+    def _build_groups(self, class_limits):
+        """Determines the limits (and which limits apply to which atoms)."""
+        by_class = {}
+        if class_limits:
+            for (cls, limit) in six.iteritems(class_limits):
+                if not isinstance(cls, six.string_types):
+                    cls = reflection.get_class_name(cls)
+                by_class[cls] = limit
+        graph = self._graph
+        if self._window is not None:
+            self._add_limit(None, self._window, 'atoms')
+        for (i, limit) in enumerate(graph.flow_limits):
+            self._add_limit(('flow', i), limit, 'flow atoms')
+        classes = [reflection.get_class_name(atom) for atom in graph.atoms]
+        for (cls, atom) in zip(classes, graph.atoms):
+            limit = by_class.get(cls, atom.max_in_flight)
+            if limit is not None:
+                self._add_limit(('class', cls), limit, "'%s' atoms" % cls)
+        groups = []
+        for (index, cls) in enumerate(classes):
+            keys = []
+            if self._window is not None:
+                keys.append(None)
+            for i in graph.flow_limits_of(index):
+                keys.append(('flow', i))
+            if ('class', cls) in self._limits:
+                keys.append(('class', cls))
+            groups.append(tuple(keys))
+        return tuple(groups)
+
+    @property
+    def limited(self):
+        """If any in flight limits apply to the atoms being scheduled."""
+        return bool(self._limits)
+
+    @property
+    def deferring(self):
+        """If there are deferred nodes waiting to be admitted."""
+        return bool(self._deferred)
+
+    def _fits(self, group):
+        return all(self._in_flight[k] < self._limits[k] for k in group)
+
+    def _push_head(self, heads, group, queue):
+        while queue and queue[0][-1] not in self._deferred:
+            heapq.heappop(queue)
+        if queue and self._fits(group):
+            heapq.heappush(heads, (queue[0], group))
+
+    def admit(self, nodes):
+        """Selects which nodes can be scheduled right now.
+
+        The given nodes are added to the deferred nodes (the nodes that did
+        not fit in the in flight limits when previously given) and then the
+        most important deferred nodes that fit within the in flight limits
+        are admitted. Returns a list of the admitted nodes (most important
+        first) and a list of the given nodes that did not fit (those are
+        kept and will be admitted by later calls, once some of the admitted
+        nodes have been released, unless they are discarded before that).
+        """
+        if not self._limits:
+            return (list(nodes), [])
+        if self._weights is None:
+            self.refresh()
+        graph = self._graph
+        given = []
+        for node in nodes:
+            index = graph.index_of(node)
+            given.append(index)
+            if index not in self._deferred:
+                self._deferred.add(index)
+                group = self._groups[index]
+                try:
+                    queue = self._queues[group]
+                except KeyError:
+                    queue = self._queues[group] = []
+                heapq.heappush(queue, self._sort_key(index))
+        # Admit the most important node at the top of the queues (of the
+        # groups whose limits have not been reached) until none are left.
+        heads = []
+        for (group, queue) in list(six.iteritems(self._queues)):
+            self._push_head(heads, group, queue)
+            if not queue:
+                del self._queues[group]
+        admitted = []
+        while heads:
+            (_sort_key, group) = heapq.heappop(heads)
+            if not self._fits(group):
+                # A limit shared with another group was reached.
+                continue
+            queue = self._queues[group]
+            index = heapq.heappop(queue)[-1]
+            self._deferred.discard(index)
+            for k in group:
+                self._in_flight[k] += 1
+            admitted.append(graph.atoms[index])
+            self._push_head(heads, group, queue)
+        deferred = [graph.atoms[index] for index in given
+                    if index in self._deferred]
+        return (admitted, deferred)
+
+    def discard(self, node):
+        """Forgets a deferred node (for example if it is no longer ready)."""
+        if self._deferred:
+            self._deferred.discard(self._graph.index_of(node))
+
+    def release(self, node):
+        """Releases the in flight limits a (completed) admitted node held."""
+        if not self._limits:
+            return
+        for k in self._groups[self._graph.index_of(node)]:
+            if self._in_flight[k] > 0:
+                self._in_flight[k] -= 1
+
+    @property
+    def prefetching(self):
+        """Whether the arguments of tasks should be fetched ahead of time."""
+        return self._prefetching
+
+    def predict(self, nodes):
+        """Returns the tasks that are likely to be ready after the given nodes.
+
+        These are the successors of the given nodes that are tasks and that
+        do not require anything the given nodes provide (the arguments of
+        those tasks can likely be fetched before the given nodes complete).
+        """
+        graph = self._graph
+        atoms = graph.atoms
+        predicted = set()
+        for node in nodes:
+            provided = node.save_as
+            for i in graph.successors(graph.index_of(node)):
+                atom = atoms[i]
+                if not isinstance(atom, task_atom.BaseTask):
+                    continue
+                if any(name in provided
+                       for name in six.itervalues(atom.rebind)):
+                    continue
+                predicted.add(atom)
+        return predicted
+
+    def prefetch(self, nodes):
+        """Fetches (ahead of time) the arguments of the given tasks.
+
+        Returns how many of the given tasks had their arguments fetched.
+        """
+        fetched = 0
+        for node in nodes:
+            if not isinstance(node, task_atom.BaseTask):
+                continue
+            if self._task_action.prefetch_arguments(node):
+                fetched += 1
+        return fetched
+
+    def _fetch_durations(self):
+        durations = []
+        for atom in self._graph.atoms:
+            try:
+                meta = self._storage.get_atom_metadata(atom.name)
+                duration = max(0.0, float(meta['duration']))
+            except (KeyError, TypeError, ValueError, excp.NotFound):
+                duration = None
+            durations.append(duration)
+        return durations
+
+    def _find_inline(self, durations):
+        threshold = self._inline_threshold
+        inline = set()
+        for (i, atom) in enumerate(self._graph.atoms):
+            if not isinstance(atom, task_atom.BaseTask):
+                continue
+            if atom.inline:
+                inline.add(i)
+            elif (threshold is not None and durations[i] is not None and
+                    durations[i] < threshold):
+                inline.add(i)
+        return frozenset(inline)
+
+    def _is_inline(self, node):
+        return self._graph.index_of(node) in self._inline
+
+    def refresh(self):
+        """Recomputes the critical path weight of each atom.
+
+        This should be called before scheduling starts (for example when an
+        engine starts or resumes running) since the recorded durations of the
+        atoms may have changed since they were last computed (which tasks
+        are ran inline is also recomputed); since no atoms are in flight at
+        that point the in flight limits (and the deferred nodes) are also
+        reset.
+        """
+        for key in self._in_flight:
+            self._in_flight[key] = 0
+        self._deferred.clear()
+        self._queues.clear()
+        graph = self._graph
+        durations = self._fetch_durations()
+        self._inline = self._find_inline(durations)
+        weights = [0.0] * len(graph)
+        # Compute the weights from the sinks of the (acyclic) graph towards
+        # its sources, each atom is only visited once all of its successors
+        # have been (so that their weights are known).
+        blockers = [len(graph.successors(i)) for i in range(0, len(graph))]
+        visit = [i for (i, count) in enumerate(blockers) if count == 0]
+        while visit:
+            i = visit.pop()
+            longest = 0.0
+            for j in graph.successors(i):
+                if weights[j] > longest:
+                    longest = weights[j]
+            if durations[i] is None:
+                weights[i] = 1.0 + longest
+            else:
+                weights[i] = durations[i] + longest
+            for j in graph.predecessors(i):
+                blockers[j] -= 1
+                if blockers[j] == 0:
+                    visit.append(j)
+        self._weights = weights
+
+    def prioritize(self, nodes):
+        """Returns a list of the given nodes in the order to schedule them."""
+        if self._weights is None:
+            self.refresh()
+        index_of = self._graph.index_of
+        return sorted(nodes, key=lambda node: self._sort_key(index_of(node)))
+
+    def _sort_key(self, index):
+        return (-self._graph.atoms[index].priority, -self._weights[index],
+                index)
 
     def _schedule_node(self, node):
         """Schedule a single node for execution."""
@@ -239,13 +568,31 @@ class Scheduler(object):
         """
         intention = self._storage.get_atom_intention(task.name)
         if intention == st.EXECUTE:
-            return self._task_action.schedule_execution(task)
+            return self._task_action.schedule_execution(
+                task, inline=self._is_inline(task))
         elif intention == st.REVERT:
-            return self._task_action.schedule_reversion(task)
+            return self._task_action.schedule_reversion(
+                task, inline=self._is_inline(task))
         else:
             raise excp.ExecutionFailure("Unknown how to schedule task with"
                                         " intention: %s" % intention)
 
+    def _find_batches(self, nodes):
+        """Groups the tasks that can be executed in batches by their class.
+
+        Only tasks (with a ``execute_batch`` method) that are to be executed
+        (not reverted) are grouped, and only if more than one task of their
+        class is being scheduled.
+        """
+        batches = collections.defaultdict(list)
+        for node in nodes:
+            if (isinstance(node, task_atom.BaseTask) and
+                    node.execute_batch is not None and
+                    self._storage.get_atom_intention(node.name) == st.EXECUTE):
+                batches[type(node)].append(node)
+        return dict((cls, tasks) for (cls, tasks) in six.iteritems(batches)
+                    if len(tasks) > 1)
+
     def schedule(self, nodes):
         """Schedules the provided nodes for *future* completion.
 
@@ -256,9 +603,25 @@ class Scheduler(object):
         process.
         """
         futures = set()
+        nodes = self.prioritize(nodes)
+        if self._inline:
+            # Inline tasks run to completion as they are scheduled, so
+            # schedule them last (so that the others do not wait on them).
+            nodes.sort(key=self._is_inline)
+        batched = {}
+        for tasks in six.itervalues(self._find_batches(nodes)):
+            for task in tasks:
+                batched[id(task)] = tasks
         for node in nodes:
             try:
-                futures.add(self._schedule_node(node))
+                tasks = batched.get(id(node))
+                if tasks is None:
+                    futures.add(self._schedule_node(node))
+                elif node is tasks[0]:
+                    # The other tasks of the batch (which follow this one)
+                    # are scheduled together with this one.
+                    futures.update(
+                        self._task_action.schedule_batch_execution(tasks))
             except Exception:
                 # Immediately stop scheduling future work so that we can
                 # exit execution early (rather than later) if a single task
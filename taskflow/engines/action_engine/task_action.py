@@ -16,6 +16,7 @@
 
 import logging
 
+from taskflow import exceptions as excp
 from taskflow import states
 from taskflow.utils import misc
 
@@ -26,10 +27,12 @@ SAVE_RESULT_STATES = (states.SUCCESS, states.FAILURE)
 
 class TaskAction(object):
 
-    def __init__(self, storage, task_executor, notifier):
+    def __init__(self, storage, task_executor, notifier,
+                 state_callback=None):
         self._storage = storage
         self._task_executor = task_executor
         self._notifier = notifier
+        self._state_callback = state_callback
 
     def _is_identity_transition(self, state, task, progress):
         if state in SAVE_RESULT_STATES:
@@ -61,6 +64,8 @@ class TaskAction(object):
             self._storage.set_atom_state(task.name, state)
         if progress is not None:
             self._storage.set_task_progress(task.name, progress)
+        if self._state_callback is not None:
+            self._state_callback(task)
         task_uuid = self._storage.get_atom_uuid(task.name)
         details = dict(task_name=task.name,
                        task_uuid=task_uuid,
@@ -79,13 +84,42 @@ class TaskAction(object):
             LOG.exception("Failed setting task progress for %s to %0.3f",
                           task, progress)
 
-    def schedule_execution(self, task):
+    def prefetch_arguments(self, task):
+        """Fetches (ahead of time) the arguments the given task will use.
+
+        Returns whether the arguments could be fetched (they may not be
+        available yet, for example when they are produced by atoms that have
+        not finished running); fetched arguments are remembered by storage
+        until the providers of those arguments change.
+        """
+        try:
+            self._storage.fetch_mapped_args(task.rebind, atom_name=task.name)
+        except excp.NotFound:
+            return False
+        else:
+            return True
+
+    def schedule_execution(self, task, inline=False):
         self.change_state(task, states.RUNNING, progress=0.0)
         kwargs = self._storage.fetch_mapped_args(task.rebind,
                                                  atom_name=task.name)
         task_uuid = self._storage.get_atom_uuid(task.name)
-        return self._task_executor.execute_task(task, task_uuid, kwargs,
-                                                self._on_update_progress)
+        if inline:
+            execute = self._task_executor.execute_task_inline
+        else:
+            execute = self._task_executor.execute_task
+        return execute(task, task_uuid, kwargs, self._on_update_progress)
+
+    def schedule_batch_execution(self, tasks):
+        task_uuids = []
+        arguments = []
+        for task in tasks:
+            self.change_state(task, states.RUNNING, progress=0.0)
+            arguments.append(self._storage.fetch_mapped_args(
+                task.rebind, atom_name=task.name))
+            task_uuids.append(self._storage.get_atom_uuid(task.name))
+        return self._task_executor.execute_task_batch(
+            tasks, task_uuids, arguments, self._on_update_progress)
 
     def complete_execution(self, task, result):
         if isinstance(result, misc.Failure):
@@ -94,16 +128,19 @@ class TaskAction(object):
             self.change_state(task, states.SUCCESS,
                               result=result, progress=1.0)
 
-    def schedule_reversion(self, task):
+    def schedule_reversion(self, task, inline=False):
         self.change_state(task, states.REVERTING, progress=0.0)
         kwargs = self._storage.fetch_mapped_args(task.rebind,
                                                  atom_name=task.name)
         task_uuid = self._storage.get_atom_uuid(task.name)
         task_result = self._storage.get(task.name)
         failures = self._storage.get_failures()
-        future = self._task_executor.revert_task(task, task_uuid, kwargs,
-                                                 task_result, failures,
-                                                 self._on_update_progress)
+        if inline:
+            revert = self._task_executor.revert_task_inline
+        else:
+            revert = self._task_executor.revert_task
+        future = revert(task, task_uuid, kwargs, task_result, failures,
+                        self._on_update_progress)
         return future
 
     def complete_reversion(self, task, rev_result):
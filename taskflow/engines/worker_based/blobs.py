@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2014 Yahoo! Inc. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import abc
+import errno
+import hashlib
+import os
+import re
+import tempfile
+
+from oslo.serialization import jsonutils
+import six
+
+from taskflow import exceptions as excp
+from taskflow.utils import misc
+
+# Payloads (once serialized) that are at least this many bytes are put into
+# the blob store (instead of being sent inline in messages) by default.
+DEFAULT_THRESHOLD = 1024 * 1024
+
+# Keys are the (hex) sha256 digest of the data stored under them.
+_KEY_FORMAT = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _check_key(key):
+    # Keys come from received messages (and are used in file paths).
+    if not isinstance(key, six.string_types) or not _KEY_FORMAT.match(key):
+        raise ValueError("Invalid blob key: %r" % (key,))
+    return key
+
+
+@six.add_metaclass(abc.ABCMeta)
+class BlobStore(object):
+    """Stores (and retrieves) data by the hash of its content.
+
+    Since data is stored by the hash of its content the same data is only
+    stored once (no matter how many times it is put) and data stored under a
+    key never changes.
+    """
+
+    @staticmethod
+    def make_key(data):
+        """Returns the key the given (binary) data is stored under."""
+        return hashlib.sha256(data).hexdigest()
+
+    @abc.abstractmethod
+    def put(self, data):
+        """Stores the given (binary) data and returns its key."""
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Returns the (binary) data stored under the given key.
+
+        Raises :py:class:`~taskflow.exceptions.NotFound` if no data is
+        stored under the given key.
+        """
+
+
+class DirectoryBlobStore(BlobStore):
+    """Stores data in files in a (local or shared) directory.
+
+    The directory can be shared (for example using a network filesystem)
+    between executors and workers on different hosts; data is written to a
+    temporary file that is then renamed to the file named by its key, so
+    readers never see partially written data.
+
+    Data is never removed from the directory, it is up to the operator to
+    remove data that is no longer needed.
+    """
+
+    def __init__(self, path):
+        self._path = os.path.abspath(path)
+
+    @property
+    def path(self):
+        return self._path
+
+    def _key_path(self, key):
+        return os.path.join(self._path, key[0:2], key)
+
+    def put(self, data):
+        key = self.make_key(data)
+        path = self._key_path(key)
+        if os.path.exists(path):
+            return key
+        dir_path = os.path.dirname(path)
+        misc.ensure_tree(dir_path)
+        fd, tmp_path = tempfile.mkstemp(dir=dir_path, prefix='.',
+                                        suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(data)
+            os.rename(tmp_path, path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return key
+
+    def get(self, key):
+        path = self._key_path(_check_key(key))
+        try:
+            with open(path, 'rb') as fp:
+                return fp.read()
+        except IOError as e:
+            if e.errno == errno.ENOENT:
+                raise excp.NotFound("No blob stored under key '%s'" % key)
+            raise
+
+
+def fetch_store(store):
+    """Returns a blob store given a blob store (or a directory path)."""
+    if store is None or isinstance(store, BlobStore):
+        return store
+    if isinstance(store, six.string_types):
+        return DirectoryBlobStore(store)
+    raise TypeError("Unknown how to make a blob store from %r" % (store,))
+
+
+def _estimate_size(value, limit):
+    """Returns an upper bound of how big a value is once json encoded.
+
+    Stops (and returns the limit) as soon as the bound reaches the limit, or
+    when the size of a value can not be cheaply bounded (for example values
+    that are not simple json types).
+    """
+    if value is None or isinstance(value, bool):
+        return 5
+    if isinstance(value, six.integer_types + (float,)):
+        return min(limit, len(repr(value)))
+    if isinstance(value, (six.text_type, six.binary_type)):
+        # Each character is at worst escaped as a pair of
+        # '\uXXXX' (surrogate) escapes; plus two quotes.
+        return min(limit, 12 * len(value) + 2)
+    if isinstance(value, dict):
+        size = 2
+        for (k, v) in six.iteritems(value):
+            size += _estimate_size(k, limit) + 2
+            size += _estimate_size(v, limit) + 2
+            if size >= limit:
+                return limit
+        return size
+    if isinstance(value, (list, tuple)):
+        size = 2
+        for v in value:
+            size += _estimate_size(v, limit) + 2
+            if size >= limit:
+                return limit
+        return size
+    return limit
+
+
+def offload(store, value, threshold=DEFAULT_THRESHOLD):
+    """Puts a (json serializable) value into the store if it is big enough.
+
+    Returns the key the value was stored under (or none if the value is
+    smaller than the threshold and should be sent inline instead). Values
+    that (cheaply) can be known to be smaller than the threshold are not
+    json encoded (only values that may be big enough are, and then the
+    encoded data is what is stored).
+    """
+    if _estimate_size(value, threshold) < threshold:
+        return None
+    data = misc.binary_encode(jsonutils.dumps(value))
+    if len(data) < threshold:
+        return None
+    return store.put(data)
+
+
+def load(store, key):
+    """Returns the (json serializable) value stored under the given key."""
+    return jsonutils.loads(misc.binary_decode(store.get(_check_key(key))))
@@ -14,35 +14,181 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import random
 
 import six
 
 from taskflow.engines.worker_based import protocol as pr
 from taskflow.types import cache as base
+from taskflow.types import timing as tt
+
+# Weight of the newest sample in the (exponentially weighted) moving average
+# of how long the workers of a topic take to acknowledge requests.
+LATENCY_WEIGHT = 0.2
+
+# Workers whose average acknowledgement latency is more than this many times
+# the average latency of other workers (that can perform the same task) are
+# not picked over those other workers (even when they are less busy).
+SLOW_FACTOR = 3.0
 
 
 class RequestsCache(base.ExpiringCache):
     """Represents a thread-safe requests cache."""
 
+    def __init__(self):
+        super(RequestsCache, self).__init__()
+        # Task class name -> requests (of that task class) that were waiting
+        # when they were added (or last looked at); requests never go back
+        # to the waiting state so the ones that are no longer waiting are
+        # dropped from this index when they are encountered.
+        self._waiting = collections.defaultdict(collections.OrderedDict)
+
+    def _on_added(self, uuid, request):
+        if request.state == pr.WAITING:
+            self._waiting[request.task_cls][uuid] = request
+
+    def _on_removed(self, uuid, request):
+        waiting = self._waiting.get(request.task_cls)
+        if waiting is not None:
+            waiting.pop(uuid, None)
+            if not waiting:
+                del self._waiting[request.task_cls]
+
     def get_waiting_requests(self, tasks):
         """Get list of waiting requests by tasks."""
         waiting_requests = []
-        with self._lock.read_lock():
-            for request in six.itervalues(self._data):
-                if request.state == pr.WAITING and request.task_cls in tasks:
-                    waiting_requests.append(request)
+        with self._lock.write_lock():
+            for task_cls in tasks:
+                waiting = self._waiting.get(task_cls)
+                if not waiting:
+                    continue
+                for (uuid, request) in list(six.iteritems(waiting)):
+                    if request.state == pr.WAITING:
+                        waiting_requests.append(request)
+                    else:
+                        del waiting[uuid]
+                if not waiting:
+                    del self._waiting[task_cls]
         return waiting_requests
 
 
+class _WorkerStats(object):
+    """How busy (and how responsive) the workers of a topic are."""
+
+    def __init__(self):
+        # What the workers last said they can process at the same time (if
+        # they said) and how many requests they had not yet processed.
+        self.capacity = None
+        self.in_flight = 0
+        # How many requests were sent to the workers (by this executor) that
+        # have not yet finished.
+        self.outstanding = 0
+        # Moving average of how long it takes the workers to acknowledge
+        # requests (once sent); this grows when the workers are overloaded
+        # (requests wait to be processed) or slow to respond.
+        self.latency = None
+
+    @property
+    def load(self):
+        load = float(max(self.outstanding, self.in_flight))
+        if self.capacity:
+            load /= self.capacity
+        return load
+
+    def is_slower_than(self, other):
+        if self.latency is None or other.latency is None:
+            return False
+        return self.latency > other.latency * SLOW_FACTOR
+
+
 class WorkersCache(base.ExpiringCache):
-    """Represents a thread-safe workers cache."""
+    """Represents a thread-safe workers cache.
+
+    Topics are picked (out of the topics whose workers can perform a task)
+    using the power of two choices; two of those topics are picked at random
+    and the one whose workers are the least busy is used (unless the workers
+    of one of them are much slower to acknowledge requests, in which case
+    the other one is used).
+    """
+
+    def __init__(self):
+        super(WorkersCache, self).__init__()
+        # Task class name -> topics of the workers that can perform it.
+        self._topics = collections.defaultdict(list)
+        self._stats = collections.defaultdict(_WorkerStats)
+        # Request uuid -> (topic, stopwatch) of the requests that were sent
+        # (and have not yet finished).
+        self._sent = {}
+
+    def _on_added(self, topic, tasks):
+        for task in set(tasks):
+            self._topics[task].append(topic)
+
+    def _on_removed(self, topic, tasks):
+        for task in set(tasks):
+            topics = self._topics.get(task)
+            if topics is not None:
+                topics.remove(topic)
+                if not topics:
+                    del self._topics[task]
 
     def get_topic_by_task(self, task):
         """Get topic for a given task."""
-        available_topics = []
         with self._lock.read_lock():
-            for topic, tasks in six.iteritems(self._data):
-                if task in tasks:
-                    available_topics.append(topic)
-        return random.choice(available_topics) if available_topics else None
+            topics = self._topics.get(task)
+            if not topics:
+                return None
+            if len(topics) == 1:
+                return topics[0]
+            topic, other_topic = random.sample(topics, 2)
+            stats = self._stats.get(topic) or _WorkerStats()
+            other_stats = self._stats.get(other_topic) or _WorkerStats()
+            if stats.is_slower_than(other_stats):
+                return other_topic
+            if other_stats.is_slower_than(stats):
+                return topic
+            if other_stats.load < stats.load:
+                return other_topic
+            return topic
+
+    def update_load(self, topic, in_flight=None, capacity=None):
+        """Records how busy the workers of a topic said they are."""
+        with self._lock.write_lock():
+            stats = self._stats[topic]
+            stats.in_flight = in_flight or 0
+            stats.capacity = capacity
+
+    def on_sent(self, topic, uuid):
+        """Records that a request is (about to be) sent to a topic."""
+        with self._lock.write_lock():
+            if uuid in self._sent:
+                return
+            self._sent[uuid] = (topic, tt.StopWatch().start())
+            self._stats[topic].outstanding += 1
+
+    def on_running(self, uuid):
+        """Records that a sent request was acknowledged by a worker."""
+        with self._lock.write_lock():
+            try:
+                topic, watch = self._sent[uuid]
+            except KeyError:
+                return
+            if watch is None:
+                return
+            self._sent[uuid] = (topic, None)
+            stats = self._stats[topic]
+            latency = watch.elapsed()
+            if stats.latency is None:
+                stats.latency = latency
+            else:
+                stats.latency += LATENCY_WEIGHT * (latency - stats.latency)
+
+    def on_finished(self, uuid):
+        """Records that a sent request has finished (or failed)."""
+        with self._lock.write_lock():
+            try:
+                topic, _watch = self._sent.pop(uuid)
+            except KeyError:
+                return
+            self._stats[topic].outstanding -= 1
@@ -40,6 +40,21 @@ class WorkerBasedActionEngine(engine.ActionEngine):
                                for will have its result become a
                                `RequestTimeout` exception instead of its
                                normally returned value (or raised exception).
+    :param serializers: list of (kombu) serializer names that messages can be
+                        sent with (in order of preference), the first of
+                        these that a worker accepts is used to send requests
+                        to that worker (defaults to msgpack, when it is
+                        installed, and json).
+    :param compression_threshold: compress messages whose (serialized) body
+                                  is at least this many bytes (defaults to
+                                  not compressing messages).
+    :param blob_store: blob store (or the path of a directory, that is shared
+                       with the workers, to store blobs in) that arguments
+                       (and results) that are too big to be sent inline in
+                       messages are put into (defaults to sending all of
+                       them inline).
+    :param blob_threshold: put arguments (and results) that are at least this
+                           many bytes (once serialized) into the blob store.
     """
 
     _storage_factory = t_storage.SingleThreadedStorage
@@ -55,7 +70,11 @@ class WorkerBasedActionEngine(engine.ActionEngine):
             transport=self._conf.get('transport'),
             transport_options=self._conf.get('transport_options'),
             transition_timeout=self._conf.get('transition_timeout',
-                                              pr.REQUEST_TIMEOUT))
+                                              pr.REQUEST_TIMEOUT),
+            serializers=self._conf.get('serializers'),
+            compression_threshold=self._conf.get('compression_threshold'),
+            blob_store=self._conf.get('blob_store'),
+            blob_threshold=self._conf.get('blob_threshold'))
 
     def __init__(self, flow, flow_detail, backend, conf, **kwargs):
         super(WorkerBasedActionEngine, self).__init__(
@@ -19,8 +19,10 @@ import logging
 import threading
 
 from oslo.utils import timeutils
+import six
 
 from taskflow.engines.action_engine import executor
+from taskflow.engines.worker_based import blobs as bl
 from taskflow.engines.worker_based import cache
 from taskflow.engines.worker_based import protocol as pr
 from taskflow.engines.worker_based import proxy
@@ -79,6 +81,19 @@ class WorkerTaskExecutor(executor.TaskExecutorBase):
         self._requests_cache = cache.RequestsCache()
         self._transition_timeout = transition_timeout
         self._workers_cache = cache.WorkersCache()
+        # Topic -> serializer to send requests to the workers of that topic
+        # with (the first of the serializers this executor prefers that those
+        # workers said they accept).
+        self._serializers = tuple(kwargs.get('serializers') or
+                                  pr.get_default_serializers())
+        self._topic_serializers = {}
+        # Arguments (and results) that are at least as big as the threshold
+        # are put into the blob store (if one was provided) instead of being
+        # sent inline.
+        self._blob_store = bl.fetch_store(kwargs.get('blob_store'))
+        self._blob_threshold = kwargs.get('blob_threshold')
+        if self._blob_threshold is None:
+            self._blob_threshold = bl.DEFAULT_THRESHOLD
         self._workers_arrival = threading.Condition()
         handlers = {
             pr.NOTIFY: [
@@ -103,6 +118,11 @@ class WorkerTaskExecutor(executor.TaskExecutorBase):
                   message.delivery_tag)
         topic = notify['topic']
         tasks = notify['tasks']
+        self._topic_serializers[topic] = pr.choose_serializer(
+            self._serializers, notify.get('serializers'))
+        self._workers_cache.update_load(topic,
+                                        in_flight=notify.get('in_flight'),
+                                        capacity=notify.get('capacity'))
 
         # Add worker info to the cache
         LOG.debug("Received that tasks %s can be processed by topic '%s'",
@@ -114,10 +134,13 @@ class WorkerTaskExecutor(executor.TaskExecutorBase):
         finally:
             self._workers_arrival.release()
 
-        # Publish waiting requests
+        # Publish waiting requests (together)
+        requests = []
         for request in self._requests_cache.get_waiting_requests(tasks):
             if request.transition_and_log_error(pr.PENDING, logger=LOG):
-                self._publish_request(request, topic)
+                requests.append(request)
+        if requests:
+            self._publish_requests(requests, topic)
 
     def _process_response(self, response, message):
         """Process response from remote side."""
@@ -134,10 +157,12 @@ class WorkerTaskExecutor(executor.TaskExecutorBase):
                 LOG.debug("Response with state '%s' received for '%s'",
                           response.state, request)
                 if response.state == pr.RUNNING:
+                    self._workers_cache.on_running(request.uuid)
                     request.transition_and_log_error(pr.RUNNING, logger=LOG)
                 elif response.state == pr.PROGRESS:
                     request.on_progress(**response.data)
                 elif response.state in (pr.FAILURE, pr.SUCCESS):
+                    self._workers_cache.on_finished(request.uuid)
                     moved = request.transition_and_log_error(response.state,
                                                              logger=LOG)
                     if moved:
@@ -146,20 +171,65 @@ class WorkerTaskExecutor(executor.TaskExecutorBase):
                         # schedule another request with the same uuid; so
                         # we remove it, then set the result...
                         del self._requests_cache[request.uuid]
-                        request.set_result(**response.data)
+                        request.set_result(**self._load_result(response.data))
                 else:
                     LOG.warning("Unexpected response status: '%s'",
                                 response.state)
             else:
                 LOG.debug("Request with id='%s' not found", task_uuid)
 
-    @staticmethod
-    def _handle_expired_request(request):
+    def _load_result(self, data):
+        """Loads the result (if it was put into the blob store) of a response.
+
+        If the result can not be loaded the result becomes a failure (that
+        contains the reason it could not be loaded) instead.
+        """
+        if 'result_blob' not in data:
+            return data
+        data = dict(data)
+        key = data.pop('result_blob')
+        try:
+            if self._blob_store is None:
+                raise exc.NotFound("Result was put into blob store with key"
+                                   " '%s' but no blob store to load it from"
+                                   " was provided" % key)
+            data['result'] = bl.load(self._blob_store, key)
+        except Exception:
+            LOG.warn("Failed to load the result stored with key '%s'", key,
+                     exc_info=True)
+            data['result'] = misc.Failure()
+        return data
+
+    def _offload(self, arguments, kwargs):
+        """Puts the big arguments (and result) into the blob store."""
+        store = self._blob_store
+        threshold = self._blob_threshold
+        blobs = {}
+        inline_arguments = {}
+        for (name, value) in six.iteritems(arguments):
+            key = bl.offload(store, value, threshold=threshold)
+            if key is None:
+                inline_arguments[name] = value
+            else:
+                inline_arguments[name] = None
+                blobs.setdefault('arguments', {})[name] = key
+        result = kwargs.get('result')
+        if result is not None and not isinstance(result, misc.Failure):
+            key = bl.offload(store, result, threshold=threshold)
+            if key is not None:
+                kwargs = dict(kwargs, result=None)
+                blobs['result'] = key
+        if blobs:
+            kwargs = dict(kwargs, blobs=blobs)
+        return (inline_arguments, kwargs)
+
+    def _handle_expired_request(self, request):
         """Handle expired request.
 
         When request has expired it is removed from the requests cache and
         the `RequestTimeout` exception is set as a request result.
         """
+        self._workers_cache.on_finished(request.uuid)
         if request.transition_and_log_error(pr.FAILURE, logger=LOG):
             # Raise an exception (and then catch it) so we get a nice
             # traceback that the request will get instead of it getting
@@ -183,6 +253,8 @@ class WorkerTaskExecutor(executor.TaskExecutorBase):
     def _submit_task(self, task, task_uuid, action, arguments,
                      progress_callback, **kwargs):
         """Submit task request to a worker."""
+        if self._blob_store is not None:
+            arguments, kwargs = self._offload(arguments, kwargs)
         request = pr.Request(task, task_uuid, action, arguments,
                              progress_callback, self._transition_timeout,
                              **kwargs)
@@ -204,28 +276,73 @@ class WorkerTaskExecutor(executor.TaskExecutorBase):
 
         return request.result
 
+    def _make_publish_kwargs(self, request, topic):
+        """Makes the keyword arguments to publish a request with."""
+        kwargs = dict(reply_to=self._uuid, correlation_id=request.uuid)
+        serializer = self._topic_serializers.get(topic, pr.DEFAULT_SERIALIZER)
+        if serializer != pr.DEFAULT_SERIALIZER:
+            kwargs['serializer'] = serializer
+        return kwargs
+
     def _publish_request(self, request, topic):
         """Publish request to a given topic."""
         LOG.debug("Submitting execution of '%s' to topic '%s' (expecting"
                   " response identified by reply_to=%s and"
                   " correlation_id=%s)", request, topic, self._uuid,
                   request.uuid)
+        self._workers_cache.on_sent(topic, request.uuid)
         try:
-            self._proxy.publish(msg=request,
-                                routing_key=topic,
-                                reply_to=self._uuid,
-                                correlation_id=request.uuid)
+            self._proxy.publish(msg=request, routing_key=topic,
+                                **self._make_publish_kwargs(request, topic))
         except Exception:
             with misc.capture_failure() as failure:
                 LOG.critical("Failed to submit '%s' (transitioning it to"
                              " %s)", request, pr.FAILURE, exc_info=True)
+                self._workers_cache.on_finished(request.uuid)
                 if request.transition_and_log_error(pr.FAILURE, logger=LOG):
                     del self._requests_cache[request.uuid]
                     request.set_result(failure)
 
+    def _publish_requests(self, requests, topic):
+        """Publish requests (together) to a given topic."""
+        messages = []
+        for request in requests:
+            LOG.debug("Submitting execution of '%s' to topic '%s' (expecting"
+                      " response identified by reply_to=%s and"
+                      " correlation_id=%s)", request, topic, self._uuid,
+                      request.uuid)
+            messages.append((request, topic,
+                             self._make_publish_kwargs(request, topic)))
+            self._workers_cache.on_sent(topic, request.uuid)
+        published = set()
+
+        def on_published(request):
+            published.add(request.uuid)
+
+        try:
+            self._proxy.publish_many(messages, on_published=on_published)
+        except Exception:
+            # Only the requests that were not published
+            # before the failure are failed, the ones that were published
+            # stay pending (and will be responded to or will time out).
+            with misc.capture_failure() as failure:
+                unpublished = [request for request in requests
+                               if request.uuid not in published]
+                LOG.critical("Failed to submit %s of %s requests"
+                             " (transitioning them to %s)", len(unpublished),
+                             len(requests), pr.FAILURE, exc_info=True)
+                for request in unpublished:
+                    self._workers_cache.on_finished(request.uuid)
+                    if request.transition_and_log_error(pr.FAILURE,
+                                                        logger=LOG):
+                        del self._requests_cache[request.uuid]
+                        request.set_result(failure)
+
     def _notify_topics(self):
         """Cyclically called to publish notify message to each topic."""
-        self._proxy.publish(pr.Notify(), self._topics, reply_to=self._uuid)
+        headers = {pr.NOTIFY_FIELDS_HEADER: list(pr.NOTIFY_FIELDS)}
+        self._proxy.publish(pr.Notify(), self._topics, reply_to=self._uuid,
+                            headers=headers)
 
     def execute_task(self, task, task_uuid, arguments,
                      progress_callback=None):
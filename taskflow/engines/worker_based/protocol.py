@@ -19,8 +19,8 @@ import logging
 import threading
 
 from concurrent import futures
-import jsonschema
 from jsonschema import exceptions as schema_exc
+from jsonschema import validators as schema_validators
 from oslo.utils import timeutils
 import six
 
@@ -31,6 +31,12 @@ from taskflow.utils import lock_utils
 from taskflow.utils import misc
 from taskflow.utils import reflection
 
+try:
+    import msgpack  # noqa
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
 # NOTE(skudriashev): This is protocol states and events, which are not
 # related to task states.
 WAITING = 'WAITING'
@@ -93,11 +99,23 @@ QUEUE_EXPIRE_TIMEOUT = REQUEST_TIMEOUT
 # Workers notify period.
 NOTIFY_PERIOD = 5
 
+# Message header that executors send notify requests with that lists the
+# (optional) notify response fields they understand; workers only send the
+# listed fields (older executors do not send this header and reject notify
+# responses that contain fields they do not know about).
+NOTIFY_FIELDS_HEADER = 'taskflow_notify_fields'
+NOTIFY_FIELDS = ('serializers', 'capacity', 'in_flight')
+
 # Message types.
 NOTIFY = 'NOTIFY'
 REQUEST = 'REQUEST'
 RESPONSE = 'RESPONSE'
 
+# The (kombu) serializer that messages are sent with when the receiver has
+# not said which serializers it accepts (all senders and receivers accept
+# messages sent with it).
+DEFAULT_SERIALIZER = 'json'
+
 # Special jsonschema validation types/adjustments.
 _SCHEMA_TYPES = {
     # See: https://github.com/Julian/jsonschema/issues/148
@@ -107,6 +125,37 @@ _SCHEMA_TYPES = {
 LOG = logging.getLogger(__name__)
 
 
+def get_default_serializers():
+    """Returns the serializers messages can be sent with (preferred first).
+
+    The compact binary msgpack serializer is preferred (when msgpack is
+    installed) over the default (json) serializer.
+    """
+    if MSGPACK_AVAILABLE:
+        return ('msgpack', DEFAULT_SERIALIZER)
+    return (DEFAULT_SERIALIZER,)
+
+
+def choose_serializer(preferred, accepted):
+    """Returns the first of the preferred serializers the receiver accepts.
+
+    If the receiver has not said which serializers it accepts (or it accepts
+    none of the preferred ones) then the default serializer is returned.
+    """
+    if accepted:
+        for serializer in preferred:
+            if serializer in accepted:
+                return serializer
+    return DEFAULT_SERIALIZER
+
+
+def _make_validator(schema):
+    """Makes a validator for the given schema (that can be reused)."""
+    validator_cls = schema_validators.validator_for(schema)
+    validator_cls.check_schema(schema)
+    return validator_cls(schema, types=_SCHEMA_TYPES)
+
+
 @six.add_metaclass(abc.ABCMeta)
 class Message(object):
     """Base class for all message types."""
@@ -137,7 +186,28 @@ class Notify(Message):
                 "items": {
                     "type": "string",
                 },
-            }
+            },
+            # The serializers the worker accepts (in order of preference),
+            # older workers do not send these (and only accept json). This
+            # and the following fields are only sent to executors that say
+            # they understand them (see NOTIFY_FIELDS_HEADER).
+            'serializers': {
+                "type": "array",
+                "items": {
+                    "type": "string",
+                },
+            },
+            # How many requests the worker can process at the same time (if
+            # it knows) and how many requests it has received but has not yet
+            # processed; older workers do not send these.
+            'capacity': {
+                "type": "integer",
+                "minimum": 1,
+            },
+            'in_flight': {
+                "type": "integer",
+                "minimum": 0,
+            },
         },
         "required": ["topic", 'tasks'],
         "additionalProperties": False,
@@ -146,6 +216,8 @@ class Notify(Message):
         "type": "object",
         "additionalProperties": False,
     }
+    _RESPONSE_VALIDATOR = _make_validator(_RESPONSE_SCHEMA)
+    _SENDER_VALIDATOR = _make_validator(_SENDER_SCHEMA)
 
     def __init__(self, **data):
         self._data = data
@@ -156,11 +228,11 @@ class Notify(Message):
     @classmethod
     def validate(cls, data, response):
         if response:
-            schema = cls._RESPONSE_SCHEMA
+            validator = cls._RESPONSE_VALIDATOR
         else:
-            schema = cls._SENDER_SCHEMA
+            validator = cls._SENDER_VALIDATOR
         try:
-            jsonschema.validate(data, schema, types=_SCHEMA_TYPES)
+            validator.validate(data)
         except schema_exc.ValidationError as e:
             if response:
                 raise excp.InvalidFormat("%s message response data not of the"
@@ -215,9 +287,28 @@ class Request(Message):
             'arguments': {
                 "type": "object",
             },
+            # The keys (in the blob store) of the arguments (and result) that
+            # were too big to be sent inline (and were put in the blob store
+            # instead).
+            'blobs': {
+                "type": "object",
+                'properties': {
+                    'arguments': {
+                        "type": "object",
+                        "additionalProperties": {
+                            "type": "string",
+                        },
+                    },
+                    'result': {
+                        "type": "string",
+                    },
+                },
+                "additionalProperties": False,
+            },
         },
         'required': ['task_cls', 'task_name', 'task_version', 'action'],
     }
+    _VALIDATOR = _make_validator(_SCHEMA)
 
     def __init__(self, task, uuid, action, arguments, progress_callback,
                  timeout, **kwargs):
@@ -266,6 +357,22 @@ class Request(Message):
             return self._watch.expired()
         return False
 
+    @property
+    def expires_in(self):
+        """How many seconds until the request can expire.
+
+        This is none if the request can not expire (once it is not in the
+        WAITING/PENDING states it never can, and it never can if it was not
+        given a timeout).
+        """
+        if self._state in WAITING_STATES:
+            try:
+                return self._watch.leftover()
+            except RuntimeError:
+                # The watch has no duration (no timeout was given).
+                pass
+        return None
+
     def to_dict(self):
         """Return json-serializable request.
 
@@ -287,6 +394,8 @@ class Request(Message):
             request['failures'] = {}
             for task, failure in six.iteritems(failures):
                 request['failures'][task] = failure.to_dict()
+        if self._kwargs.get('blobs'):
+            request['blobs'] = self._kwargs['blobs']
         return request
 
     def set_result(self, result):
@@ -341,7 +450,7 @@ class Request(Message):
     @classmethod
     def validate(cls, data):
         try:
-            jsonschema.validate(data, cls._SCHEMA, types=_SCHEMA_TYPES)
+            cls._VALIDATOR.validate(data)
         except schema_exc.ValidationError as e:
             raise excp.InvalidFormat("%s message response data not of the"
                                      " expected format: %s"
@@ -401,12 +510,18 @@ class Response(Message):
                     # thats why we can't be strict about what type it is since
                     # any of the json serializable types are allowed.
                     "result": {},
+                    # The key (in the blob store) of a result that was too
+                    # big to be sent inline.
+                    "result_blob": {
+                        "type": "string",
+                    },
                 },
                 "required": ["result"],
                 "additionalProperties": False,
             },
         },
     }
+    _VALIDATOR = _make_validator(_SCHEMA)
 
     def __init__(self, state, **data):
         self._state = state
@@ -434,7 +549,7 @@ class Response(Message):
     @classmethod
     def validate(cls, data):
         try:
-            jsonschema.validate(data, cls._SCHEMA, types=_SCHEMA_TYPES)
+            cls._VALIDATOR.validate(data)
         except schema_exc.ValidationError as e:
             raise excp.InvalidFormat("%s message response data not of the"
                                      " expected format: %s"
@@ -19,9 +19,13 @@ import socket
 import threading
 
 import kombu
+from kombu import serialization as kombu_serialization
+from oslo.utils import excutils
 import six
 
 from taskflow.engines.worker_based import dispatcher
+from taskflow.engines.worker_based import protocol as pr
+from taskflow.types import timing as tt
 from taskflow.utils import misc
 
 LOG = logging.getLogger(__name__)
@@ -30,9 +34,37 @@ LOG = logging.getLogger(__name__)
 # the socket can get "stuck", and is a best practice for Kombu consumers.
 DRAIN_EVENTS_PERIOD = 1
 
+# The queues that are published to are auto-deleted (when their consumers go
+# away) so the queues that were declared are declared again (when next
+# published to) once this many seconds have passed since they were declared.
+QUEUE_DECLARE_PERIOD = 60
+
+# The compression used for messages whose (serialized) body is at least as big
+# as the compression threshold (when one is provided).
+COMPRESSION = 'zlib'
+
+
+def get_serializer(message):
+    """Returns the serializer a received message was sent with (if known)."""
+    return kombu_serialization.registry.type_to_name.get(message.content_type)
+
 
 class Proxy(object):
-    """A proxy processes messages from/to the named exchange."""
+    """A proxy processes messages from/to the named exchange.
+
+    Messages are published using a single (long-lived) producer and each of
+    the queues that are published to is only declared when first published
+    to (and then again periodically, after publishing fails or after the
+    producers channel is revived), instead of acquiring a producer and
+    declaring the queue each time a message is published.
+
+    Messages are received using any of the given ``serializers`` (and the
+    default serializer, which is always accepted); messages are published
+    using the serializer that the ``serializer`` keyword argument they are
+    published with names (or the default serializer). If a
+    ``compression_threshold`` is given the bodies of messages that are at
+    least that many bytes (once serialized) are also compressed.
+    """
 
     def __init__(self, topic, exchange_name, type_handlers, on_wait=None,
                  **kwargs):
@@ -46,6 +78,13 @@ class Proxy(object):
             # running, otherwise requeue them.
             lambda data, message: not self.is_running)
 
+        self._serializers = tuple(kwargs.get('serializers') or
+                                  pr.get_default_serializers())
+        self._accept = list(self._serializers)
+        if pr.DEFAULT_SERIALIZER not in self._accept:
+            self._accept.append(pr.DEFAULT_SERIALIZER)
+        self._compression_threshold = kwargs.get('compression_threshold')
+
         url = kwargs.get('url')
         transport = kwargs.get('transport')
         transport_opts = kwargs.get('transport_options')
@@ -65,6 +104,15 @@ class Proxy(object):
                                         durable=False,
                                         auto_delete=True)
 
+        # The producer (and its connection) are created when
+        # first published with (and dropped if publishing fails); the queues
+        # declared using that producer are remembered (routing key -> channel
+        # declared on and stop watch started when declared) until then.
+        self._producer = None
+        self._producer_conn = None
+        self._producer_lock = threading.Lock()
+        self._declared = {}
+
     @property
     def connection_details(self):
         # The kombu drivers seem to use 'N/A' when they don't have a version...
@@ -79,6 +127,11 @@ class Proxy(object):
                 driver_name=self._conn.transport.driver_name,
                 driver_version=driver_version))
 
+    @property
+    def serializers(self):
+        """The serializers messages are received with (preferred first)."""
+        return self._serializers
+
     @property
     def is_running(self):
         """Return whether the proxy is running."""
@@ -93,22 +146,100 @@ class Proxy(object):
                            auto_delete=True,
                            **kwargs)
 
+    def _ensure_producer(self):
+        """Returns the producer to publish with (creating it if needed)."""
+        if self._producer is None:
+            self._producer_conn = self._conn.clone()
+            self._producer = kombu.Producer(self._producer_conn)
+        return self._producer
+
+    def _reset_producer(self):
+        """Drops the producer (and forgets the queues declared using it)."""
+        self._declared.clear()
+        self._producer = None
+        if self._producer_conn is not None:
+            try:
+                self._producer_conn.release()
+            except Exception:
+                LOG.warn("Failed releasing the producer connection",
+                         exc_info=True)
+            self._producer_conn = None
+
+    def _queues_to_declare(self, producer, routing_key):
+        """Returns the queues to declare when publishing with a routing key."""
+        try:
+            channel, watch = self._declared[routing_key]
+        except KeyError:
+            pass
+        else:
+            # A producer whose connection was re-established (and whose
+            # channel was revived) may be publishing to a broker that lost
+            # the queues, so only skip declaring on the same channel.
+            if channel is producer.channel and not watch.expired():
+                return []
+        watch = tt.StopWatch(duration=QUEUE_DECLARE_PERIOD)
+        self._declared[routing_key] = (producer.channel, watch.start())
+        return [self._make_queue(routing_key, self._exchange)]
+
+    def _encode(self, body, kwargs):
+        """Serializes (and compresses, if big enough) a messages body."""
+        if self._compression_threshold is None:
+            return (body, kwargs)
+        kwargs = dict(kwargs)
+        serializer = kwargs.pop('serializer', pr.DEFAULT_SERIALIZER)
+        content_type, content_encoding, body = kombu_serialization.dumps(
+            body, serializer=serializer)
+        kwargs['content_type'] = content_type
+        kwargs['content_encoding'] = content_encoding
+        if len(body) >= self._compression_threshold:
+            kwargs['compression'] = COMPRESSION
+        return (body, kwargs)
+
     def publish(self, msg, routing_key, **kwargs):
         """Publish message to the named exchange with given routing key."""
-        if isinstance(routing_key, six.string_types):
-            routing_keys = [routing_key]
-        else:
-            routing_keys = routing_key
-        LOG.debug("Sending '%s' using routing keys %s", msg, routing_keys)
-        with kombu.producers[self._conn].acquire(block=True) as producer:
-            for routing_key in routing_keys:
-                queue = self._make_queue(routing_key, self._exchange)
-                producer.publish(body=msg.to_dict(),
-                                 routing_key=routing_key,
-                                 exchange=self._exchange,
-                                 declare=[queue],
-                                 type=msg.TYPE,
-                                 **kwargs)
+        self.publish_many([(msg, routing_key, kwargs)])
+
+    def publish_many(self, messages, on_published=None):
+        """Publish messages to the named exchange.
+
+        The messages to publish are (message, routing key, keyword arguments)
+        tuples (where the routing key may also be a list of routing keys to
+        publish the message with); they are published one after the other
+        (in the given order) using the same producer. When provided the
+        ``on_published`` callback is called with each message once it has
+        been published (with all of its routing keys), so that when
+        publishing fails part way the caller can know which messages were
+        published before the failure.
+        """
+        with self._producer_lock:
+            try:
+                producer = self._ensure_producer()
+                for (msg, routing_key, kwargs) in messages:
+                    if isinstance(routing_key, six.string_types):
+                        routing_keys = [routing_key]
+                    else:
+                        routing_keys = routing_key
+                    LOG.debug("Sending '%s' using routing keys %s",
+                              msg, routing_keys)
+                    body, kwargs = self._encode(msg.to_dict(), kwargs)
+                    for routing_key in routing_keys:
+                        declare = self._queues_to_declare(producer,
+                                                          routing_key)
+                        producer.publish(
+                            body=body,
+                            routing_key=routing_key,
+                            exchange=self._exchange,
+                            declare=declare,
+                            type=msg.TYPE,
+                            **kwargs)
+                    if on_published is not None:
+                        on_published(msg)
+            except Exception:
+                # The producer (or its connection) may be in
+                # a bad state, so start over (redeclaring the queues that
+                # were declared) when next publishing.
+                with excutils.save_and_reraise_exception():
+                    self._reset_producer()
 
     def start(self):
         """Start proxy."""
@@ -117,7 +248,8 @@ class Proxy(object):
         with kombu.connections[self._conn].acquire(block=True) as conn:
             queue = self._make_queue(self._topic, self._exchange, channel=conn)
             with conn.Consumer(queues=queue,
-                               callbacks=[self._dispatcher.on_message]):
+                               callbacks=[self._dispatcher.on_message],
+                               accept=self._accept):
                 self._running.set()
                 while self.is_running:
                     try:
@@ -134,3 +266,5 @@ class Proxy(object):
     def stop(self):
         """Stop proxy."""
         self._running.clear()
+        with self._producer_lock:
+            self._reset_producer()
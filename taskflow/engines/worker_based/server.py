@@ -16,11 +16,15 @@
 
 import functools
 import logging
+import threading
 
+from oslo.utils import excutils
 import six
 
+from taskflow.engines.worker_based import blobs as bl
 from taskflow.engines.worker_based import protocol as pr
 from taskflow.engines.worker_based import proxy
+from taskflow import exceptions as excp
 from taskflow.utils import misc
 
 LOG = logging.getLogger(__name__)
@@ -50,7 +54,7 @@ class Server(object):
                 functools.partial(pr.Notify.validate, response=False),
             ],
             pr.REQUEST: [
-                delayed(executor)(self._process_request),
+                self._submit_request,
                 pr.Request.validate,
             ],
         }
@@ -58,8 +62,45 @@ class Server(object):
                                   on_wait=None, **kwargs)
         self._topic = topic
         self._executor = executor
+        self._process_request_delayed = delayed(executor)(
+            self._process_request)
+        # How many requests can be processed at the same time (if known) and
+        # how many requests have been received but are not yet processed;
+        # these are sent to executors (in notify replies) so that they can
+        # send requests to the workers that are the least busy.
+        self._capacity = kwargs.get('capacity')
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
         self._endpoints = dict([(endpoint.name, endpoint)
                                 for endpoint in endpoints])
+        # Results that are at least as big as the threshold are put into the
+        # blob store (if one was provided) instead of being sent inline.
+        self._blob_store = bl.fetch_store(kwargs.get('blob_store'))
+        self._blob_threshold = kwargs.get('blob_threshold')
+        if self._blob_threshold is None:
+            self._blob_threshold = bl.DEFAULT_THRESHOLD
+
+    @property
+    def in_flight(self):
+        """How many requests have been received but are not yet processed."""
+        return self._in_flight
+
+    def _on_request_processed(self, fut):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def _submit_request(self, request, message):
+        """Submits the request to be processed (using the executor)."""
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            fut = self._process_request_delayed(request, message)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self._on_request_processed(None)
+        else:
+            fut.add_done_callback(self._on_request_processed)
+        return fut
 
     @property
     def connection_details(self):
@@ -86,6 +127,31 @@ class Server(object):
                 action_args['failures'][k] = misc.Failure.from_dict(v)
         return task_cls, action, action_args
 
+    def _load_blobs(self, blobs, action_args):
+        """Loads the arguments (and result) put into the blob store."""
+        if not blobs:
+            return
+        if self._blob_store is None:
+            raise excp.NotFound("Request arguments were put into a blob"
+                                " store but no blob store to load them from"
+                                " was provided")
+        arguments = dict(action_args['arguments'])
+        for (name, key) in six.iteritems(blobs.get('arguments', {})):
+            arguments[name] = bl.load(self._blob_store, key)
+        action_args['arguments'] = arguments
+        if 'result' in blobs:
+            action_args['result'] = bl.load(self._blob_store,
+                                            blobs['result'])
+
+    def _offload_result(self, result):
+        """Puts the result into the blob store (if it is big enough)."""
+        if self._blob_store is not None:
+            key = bl.offload(self._blob_store, result,
+                             threshold=self._blob_threshold)
+            if key is not None:
+                return dict(result=None, result_blob=key)
+        return dict(result=result)
+
     @staticmethod
     def _parse_message(message):
         """Extracts required attributes out of the messages properties.
@@ -102,21 +168,37 @@ class Server(object):
                                  prop)
         return properties
 
-    def _reply(self, reply_to, task_uuid, state=pr.FAILURE, **kwargs):
-        """Send reply to the `reply_to` queue."""
+    def _reply(self, reply_to, task_uuid, state=pr.FAILURE, serializer=None,
+               **kwargs):
+        """Send reply to the `reply_to` queue.
+
+        The reply is sent using the given serializer (which should be the one
+        the request was sent with) when it is not the default serializer.
+        """
         response = pr.Response(state, **kwargs)
+        publish_kwargs = dict(correlation_id=task_uuid)
+        if serializer is not None and serializer != pr.DEFAULT_SERIALIZER:
+            publish_kwargs['serializer'] = serializer
         try:
-            self._proxy.publish(response, reply_to, correlation_id=task_uuid)
+            self._proxy.publish(response, reply_to, **publish_kwargs)
         except Exception:
             LOG.critical("Failed to send reply to '%s' for task '%s' with"
                          " response %s", reply_to, task_uuid, response,
                          exc_info=True)
 
     def _on_update_progress(self, reply_to, task_uuid, task, event_data,
-                            progress):
+                            progress, serializer=None):
         """Send task update progress notification."""
-        self._reply(reply_to, task_uuid, pr.PROGRESS, event_data=event_data,
-                    progress=progress)
+        self._reply(reply_to, task_uuid, pr.PROGRESS, serializer=serializer,
+                    event_data=event_data, progress=progress)
+
+    @staticmethod
+    def _fetch_notify_fields(message):
+        """Returns the optional notify fields the sender understands."""
+        fields = (message.headers or {}).get(pr.NOTIFY_FIELDS_HEADER)
+        if not isinstance(fields, (list, tuple)):
+            return frozenset()
+        return frozenset(f for f in fields if isinstance(f, six.string_types))
 
     def _process_notify(self, notify, message):
         """Process notify message and reply back."""
@@ -128,10 +210,20 @@ class Server(object):
                      " in received notify message %r", message.delivery_tag,
                      exc_info=True)
         else:
-            self._proxy.publish(
-                msg=pr.Notify(topic=self._topic, tasks=self._endpoints.keys()),
-                routing_key=reply_to
-            )
+            data = dict(topic=self._topic,
+                        tasks=list(self._endpoints.keys()))
+            # Older executors reject notify responses with
+            # fields they do not know about, so only send the (optional)
+            # fields the executor said it understands.
+            fields = self._fetch_notify_fields(message)
+            if 'serializers' in fields:
+                data['serializers'] = list(self._proxy.serializers)
+            if 'in_flight' in fields:
+                data['in_flight'] = self._in_flight
+            if 'capacity' in fields and self._capacity is not None:
+                data['capacity'] = self._capacity
+            notify = pr.Notify(**data)
+            self._proxy.publish(msg=notify, routing_key=reply_to)
 
     def _process_request(self, request, message):
         """Process request message and reply back."""
@@ -148,19 +240,22 @@ class Server(object):
                      message.delivery_tag, exc_info=True)
             return
         else:
+            # reply using the serializer the request was sent with
+            serializer = proxy.get_serializer(message)
             # prepare task progress callback
             progress_callback = functools.partial(
-                self._on_update_progress, reply_to, task_uuid)
+                self._on_update_progress, reply_to, task_uuid,
+                serializer=serializer)
             # prepare reply callback
             reply_callback = functools.partial(
-                self._reply, reply_to, task_uuid)
+                self._reply, reply_to, task_uuid, serializer=serializer)
 
         # parse request to get task name, action and action arguments
         try:
             task_cls, action, action_args = self._parse_request(**request)
             action_args.update(task_uuid=task_uuid,
                                progress_callback=progress_callback)
-        except ValueError:
+        except (ValueError, EnvironmentError, excp.NotFound):
             with misc.capture_failure() as failure:
                 LOG.warn("Failed to parse request contents from message %r",
                          message.delivery_tag, exc_info=True)
@@ -180,6 +275,17 @@ class Server(object):
         else:
             reply_callback(state=pr.RUNNING)
 
+        # Loaded only after replying as running (so that this does not count
+        # against the time the executor waits for requests to start).
+        try:
+            self._load_blobs(request.get('blobs'), action_args)
+        except (ValueError, EnvironmentError, excp.NotFound):
+            with misc.capture_failure() as failure:
+                LOG.warn("Failed to load the blobs of request message %r",
+                         message.delivery_tag, exc_info=True)
+                reply_callback(result=failure.to_dict())
+                return
+
         # perform task action
         try:
             result = getattr(endpoint, action)(**action_args)
@@ -193,7 +299,17 @@ class Server(object):
             if isinstance(result, misc.Failure):
                 reply_callback(result=result.to_dict())
             else:
-                reply_callback(state=pr.SUCCESS, result=result)
+                try:
+                    data = self._offload_result(result)
+                except Exception:
+                    with misc.capture_failure() as failure:
+                        LOG.warn("Failed to put the result of the '%s'"
+                                 " endpoint '%s' execution for request"
+                                 " message %r into the blob store", endpoint,
+                                 action, message.delivery_tag, exc_info=True)
+                        reply_callback(result=failure.to_dict())
+                else:
+                    reply_callback(state=pr.SUCCESS, **data)
 
     def start(self):
         """Start processing incoming requests."""
@@ -77,8 +77,23 @@ class Worker(object):
     :param executor: custom executor object that can used for processing
         requests in separate threads (if not provided one will be created)
     :param threads_count: threads count to be passed to the default executor
+    :param capacity: how many requests the worker can process at the same
+        time (this is reported to executors so that they can prefer the
+        least busy workers, it defaults to the threads count when the worker
+        creates its own executor)
     :param transport: transport to be used (e.g. amqp, memory, etc.)
     :param transport_options: transport specific options
+    :param serializers: list of (kombu) serializer names that the worker
+        accepts requests in (in order of preference), replies are sent using
+        the serializer the request was sent with
+    :param compression_threshold: compress messages whose (serialized) body
+        is at least this many bytes
+    :param blob_store: blob store (or the path of a directory, that is shared
+        with the executors, to store blobs in) that requests arguments (and
+        results) that were too big to be sent inline are loaded from (and that
+        results that are too big are put into)
+    :param blob_threshold: put results that are at least this many bytes
+        (once serialized) into the blob store
     """
 
     def __init__(self, exchange, topic, tasks, executor=None, **kwargs):
@@ -95,6 +110,7 @@ class Worker(object):
                 self._threads_count = tu.get_optimal_thread_count()
             self._executor = futures.ThreadPoolExecutor(self._threads_count)
             self._owns_executor = True
+            kwargs.setdefault('capacity', self._threads_count)
         self._endpoints = self._derive_endpoints(tasks)
         self._exchange = exchange
         self._server = server.Server(topic, exchange, self._executor,
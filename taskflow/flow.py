@@ -38,8 +38,16 @@ class Flow(object):
     a flow is just a 'structuring' concept this is typically a behavior that
     should not be worried about (as it is not visible to the user), but it is
     worth mentioning here.
+
+    :ivar max_in_flight: The maximum number of the atoms contained in this
+                         flow (and its subflows) that engines will have
+                         running at the same time (or none if engines may run
+                         as many of them at the same time as they can).
     """
 
+    #: Default maximum number of contained atoms running at once (unbounded).
+    max_in_flight = None
+
     def __init__(self, name, retry=None):
         self._name = six.text_type(name)
         self._retry = retry
@@ -422,7 +422,14 @@ class TaskDetail(AtomDetail):
 
 
 class RetryDetail(AtomDetail):
-    """This class represents a retry detail for retry controller object."""
+    """This class represents a retry detail for retry controller object.
+
+    The results of a retry detail are a list of ``(result, failures)``
+    tuples; when compacted (see :py:meth:`.compact`) the oldest of these
+    are dropped and only how many were dropped (and the results of the most
+    recently dropped ones) is kept in this details metadata under the
+    ``compacted_count`` and ``compacted_results`` keys.
+    """
     def __init__(self, name, uuid):
         super(RetryDetail, self).__init__(name, uuid)
         self.results = []
@@ -432,6 +439,53 @@ class RetryDetail(AtomDetail):
         self.failure = None
         self.state = state
         self.intention = states.EXECUTE
+        self.meta.pop('compacted_count', None)
+        self.meta.pop('compacted_results', None)
+
+    def compact(self, limit):
+        """Compacts the results so that at most limit (full) ones remain.
+
+        How many entries were dropped and the results (but *not* the
+        failures) of at most limit of the most recently dropped entries are
+        retained in this details metadata, so that the size of this detail
+        stays bounded no matter how many results are put into it. Returns
+        true if any entries were compacted.
+
+        The retained results are *not* moved to a separate record (the
+        persistence backends have no such record type), so they are still
+        saved along with this detail each time it is saved; what compacting
+        bounds is how much of them there is (at most limit of them).
+        """
+        if limit < 1:
+            raise ValueError("At least one result must be retained")
+        extra = len(self.results) - limit
+        if extra <= 0:
+            return False
+        compacted = list(self.meta.get('compacted_results', []))
+        for (result, _failures) in self.results[0:extra]:
+            compacted.append(result)
+        self.meta['compacted_results'] = compacted[-limit:]
+        self.meta['compacted_count'] = self.meta.get('compacted_count', 0)
+        self.meta['compacted_count'] += extra
+        self.results = self.results[extra:]
+        return True
+
+    @property
+    def history(self):
+        """Gets the full history (including any compacted entries).
+
+        Compacted entries are provided without their failures and the ones
+        whose results were not retained are provided as ``(None, {})``, so
+        that there is still an entry for every result that was put.
+        """
+        count = self.meta.get('compacted_count')
+        if not count:
+            return list(self.results)
+        compacted = self.meta.get('compacted_results', [])
+        history = [(None, {})] * (count - len(compacted))
+        history.extend((result, {}) for result in compacted)
+        history.extend(self.results)
+        return history
 
     @property
     def last_results(self):
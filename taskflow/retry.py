@@ -70,15 +70,26 @@ class Retry(atom.Atom, Decider):
     object is an atom it may also provide execute and revert methods to alter
     the inputs of connected atoms (depending on the desired strategy to be
     used this can be quite useful).
+
+    When a ``history_limit`` is provided only that many of the most recent
+    history entries keep their failures (and are persisted in full); older
+    entries are still provided in the history given to this retry controller
+    but with only their results (and no failures), and entries older than
+    twice that limit are provided as ``(None, {})``. Controllers that look at
+    the results of all prior attempts (like :py:class:`.ForEach`) should use
+    a limit that is at least half as large as the number of values they try.
     """
 
     default_provides = None
 
     def __init__(self, name=None, provides=None, requires=None,
-                 auto_extract=True, rebind=None):
+                 auto_extract=True, rebind=None, history_limit=None):
         if provides is None:
             provides = self.default_provides
         super(Retry, self).__init__(name, provides)
+        if history_limit is not None and history_limit < 1:
+            raise ValueError("History limit must be greater than zero")
+        self.history_limit = history_limit
         self._build_arg_mapping(self.execute, requires, rebind, auto_extract,
                                 ignore_list=['history'])
 
@@ -145,9 +156,10 @@ class Times(Retry):
     """Retries subflow given number of times. Returns attempt number."""
 
     def __init__(self, attempts=1, name=None, provides=None, requires=None,
-                 auto_extract=True, rebind=None):
+                 auto_extract=True, rebind=None, history_limit=None):
         super(Times, self).__init__(name, provides, requires,
-                                    auto_extract, rebind)
+                                    auto_extract, rebind,
+                                    history_limit=history_limit)
         self._attempts = attempts
 
     def on_failure(self, history, *args, **kwargs):
@@ -190,9 +202,10 @@ class ForEach(ForEachBase):
     """
 
     def __init__(self, values, name=None, provides=None, requires=None,
-                 auto_extract=True, rebind=None):
+                 auto_extract=True, rebind=None, history_limit=None):
         super(ForEach, self).__init__(name, provides, requires,
-                                      auto_extract, rebind)
+                                      auto_extract, rebind,
+                                      history_limit=history_limit)
         self._values = values
 
     def on_failure(self, history, *args, **kwargs):
@@ -15,8 +15,8 @@
 #    under the License.
 
 import abc
-import contextlib
 import logging
+import threading
 
 import six
 
@@ -24,6 +24,7 @@ from taskflow import exceptions
 from taskflow.openstack.common import uuidutils
 from taskflow.persistence import logbook
 from taskflow import states
+from taskflow.types import timing as tt
 from taskflow.utils import lock_utils
 from taskflow.utils import misc
 from taskflow.utils import reflection
@@ -32,6 +33,18 @@ LOG = logging.getLogger(__name__)
 STATES_WITH_RESULTS = (states.SUCCESS, states.REVERTING, states.FAILURE)
 
 
+class _ConnectionHolder(object):
+    """Holds the backend connection that storage reuses."""
+    connection = None
+    generation = None
+
+
+class _ThreadLocalConnectionHolder(threading.local):
+    """Holds the backend connection (one per thread) that storage reuses."""
+    connection = None
+    generation = None
+
+
 @six.add_metaclass(abc.ABCMeta)
 class Storage(object):
     """Interface between engines and logbook.
@@ -41,11 +54,24 @@ class Storage(object):
     atom_details, flow_details) for use by engines. This makes it easier to
     interact with the underlying storage & backend mechanism through this
     interface rather than accessing those objects directly.
+
+    When ``write_behind`` is enabled changes to atom details are *not* saved
+    to the backend as they happen; instead the changed atom details are
+    remembered and saved together (using a single flow detail update) when
+    :py:meth:`.flush` is called, when the flow state changes or (if a
+    ``flush_interval`` in seconds is provided) once that interval has elapsed
+    since the last flush happened.
     """
 
     injector_name = '_TaskFlow_INJECTOR'
 
-    def __init__(self, flow_detail, backend=None):
+    # Holds the backend connection that is reused for saving (subclasses that
+    # are used from many threads should use a holder that gives each thread
+    # its own connection).
+    _connection_holder_cls = _ConnectionHolder
+
+    def __init__(self, flow_detail, backend=None, write_behind=False,
+                 flush_interval=None):
         self._result_mappings = {}
         self._reverse_mapping = {}
         self._backend = backend
@@ -53,6 +79,23 @@ class Storage(object):
         self._lock = self._lock_cls()
         self._transients = {}
         self._injected_args = {}
+        self._write_behind = bool(write_behind)
+        self._dirty = set()
+        self._flush_watch = tt.StopWatch(duration=flush_interval)
+        self._flush_watch.start()
+        self._connection_holder = self._connection_holder_cls()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._connections_generation = 0
+        # Atom name -> (args mapping, plan) where the plan is the argument
+        # values that were resolved (using that mapping) the last time they
+        # were fetched (they are memoized, not where they came from); and the
+        # reverse of that, a name -> atom names whose plans resolved that name
+        # (so that plans can be dropped when a provider of that name changes).
+        self._fetch_plans = {}
+        self._fetch_plan_users = {}
+        self._fetch_plans_lock = threading.Lock()
+        self._retry_history_limits = {}
 
         # NOTE(imelnikov): failure serialization looses information,
         # so we cache failures here, in atom name -> failure mapping.
@@ -85,14 +128,59 @@ class Storage(object):
         being used in a multithreaded situation.
         """
 
+    def _get_connection(self):
+        holder = self._connection_holder
+        if (holder.connection is None or
+                holder.generation != self._connections_generation):
+            conn = self._backend.get_connection()
+            with self._connections_lock:
+                self._connections.append(conn)
+                holder.connection = conn
+                holder.generation = self._connections_generation
+        return holder.connection
+
+    def _close_connection(self, conn):
+        with self._connections_lock:
+            try:
+                self._connections.remove(conn)
+            except ValueError:
+                pass
+        try:
+            conn.close()
+        except Exception:
+            LOG.warn("Failed closing backend connection %s", conn,
+                     exc_info=True)
+
     def _with_connection(self, functor, *args, **kwargs):
         # NOTE(harlowja): Activate the given function with a backend
         # connection, if a backend is provided in the first place, otherwise
         # don't call the function.
         if self._backend is None:
             return
-        with contextlib.closing(self._backend.get_connection()) as conn:
+        # If the reused connection fails, retry once using a new one.
+        conn = self._get_connection()
+        try:
             functor(conn, *args, **kwargs)
+        except exceptions.StorageFailure:
+            LOG.warn("Backend connection %s failed, retrying using a new"
+                     " connection", conn, exc_info=True)
+            self._connection_holder.connection = None
+            self._close_connection(conn)
+            functor(self._get_connection(), *args, **kwargs)
+
+    def close(self):
+        """Closes any backend connections this storage has open.
+
+        New connections will be opened if they are needed afterwards.
+        """
+        with self._connections_lock:
+            connections = self._connections
+            self._connections = []
+            # This makes the connection any thread is holding
+            # on to out of date (so that a new one will be used instead).
+            self._connections_generation += 1
+        for conn in connections:
+            self._close_connection(conn)
 
     def ensure_task(self, task_name, task_version=None, result_mapping=None):
         """Ensure that there is taskdetail that corresponds the task.
@@ -123,13 +211,15 @@ class Storage(object):
         return task_id
 
     def ensure_retry(self, retry_name, retry_version=None,
-                     result_mapping=None):
+                     result_mapping=None, history_limit=None):
         """Ensure that there is atom detail that corresponds the retry.
 
         If retry does not exist, adds a record for it. Added retry
         will have PENDING state. Sets result mapping for the retry from
         result_mapping argument. Initializes retry result as an empty
-        collections of results and failures history.
+        collections of results and failures history. When a history limit is
+        provided the retry history will be compacted (so that only that many
+        entries retain their failures) whenever a new result is saved.
 
         Returns uuid for the retry details corresponding to the retry
         with given name.
@@ -150,6 +240,10 @@ class Storage(object):
                         "Atom detail %s already exists in flow detail %s." %
                         (retry_name, self._flowdetail.name))
             self._set_result_mapping(retry_name, result_mapping)
+            if history_limit is not None:
+                self._retry_history_limits[retry_name] = history_limit
+            else:
+                self._retry_history_limits.pop(retry_name, None)
         return retry_id
 
     def _create_atom_detail(self, _detail_cls, name, uuid, task_version=None):
@@ -180,6 +274,9 @@ class Storage(object):
         # the result of the update actually added more (aka another process
         # added item to the flow detail).
         self._flowdetail.update(conn.update_flow_details(self._flowdetail))
+        # This also saved all the contained atom details (so nothing is left
+        # to be saved).
+        self._dirty.clear()
 
     def _atomdetail_by_name(self, atom_name, expected_type=None):
         try:
@@ -204,6 +301,45 @@ class Storage(object):
         # do this update.
         atom_detail.update(conn.update_atom_details(atom_detail))
 
+    def _persist_atom_detail(self, atom_detail):
+        # When in write-behind mode, only remember that the
+        # atom detail has changed, it will get saved (with the other changed
+        # atom details) the next time a flush happens.
+        if not self._write_behind:
+            self._with_connection(self._save_atom_detail, atom_detail)
+        elif self._backend is not None:
+            self._dirty.add(atom_detail.uuid)
+            if self._flush_watch.expired():
+                self._flush()
+
+    def _flush(self):
+        if self._dirty:
+            self._with_connection(self._save_flow_detail)
+        self._flush_watch.stop()
+        self._flush_watch.start()
+
+    @property
+    def write_behind(self):
+        """Whether atom detail changes are saved in batches."""
+        return self._write_behind
+
+    @property
+    def dirty(self):
+        """Whether there are atom detail changes that are not yet saved."""
+        with self._lock.read_lock():
+            return bool(self._dirty)
+
+    def flush(self):
+        """Saves any not yet saved atom detail changes to the backend.
+
+        All the changed atom details are saved using a single flow detail
+        update (which saves the flow detail and its contained atom details).
+        When not in write-behind mode this does nothing (since changes are
+        saved as they happen).
+        """
+        with self._lock.write_lock():
+            self._flush()
+
     def get_atom_uuid(self, atom_name):
         """Gets an atoms uuid given a atoms name."""
         with self._lock.read_lock():
@@ -214,8 +350,11 @@ class Storage(object):
         """Sets an atoms state."""
         with self._lock.write_lock():
             ad = self._atomdetail_by_name(atom_name)
+            if ((ad.state in STATES_WITH_RESULTS) !=
+                    (state in STATES_WITH_RESULTS)):
+                self._invalidate_provider_fetch_plans(atom_name)
             ad.state = state
-            self._with_connection(self._save_atom_detail, ad)
+            self._persist_atom_detail(ad)
 
     def get_atom_state(self, atom_name):
         """Gets the state of an atom given an atoms name."""
@@ -227,7 +366,7 @@ class Storage(object):
         """Sets the intention of an atom given an atoms name."""
         ad = self._atomdetail_by_name(atom_name)
         ad.intention = intention
-        self._with_connection(self._save_atom_detail, ad)
+        self._persist_atom_detail(ad)
 
     def get_atom_intention(self, atom_name):
         """Gets the intention of an atom given an atoms name."""
@@ -248,7 +387,7 @@ class Storage(object):
                                           expected_type=expected_type)
             if update_with:
                 ad.meta.update(update_with)
-                self._with_connection(self._save_atom_detail, ad)
+                self._persist_atom_detail(ad)
 
     def update_atom_metadata(self, atom_name, update_with):
         """Updates a atoms associated metadata.
@@ -260,6 +399,12 @@ class Storage(object):
         """
         self._update_atom_metadata(atom_name, update_with)
 
+    def get_atom_metadata(self, atom_name):
+        """Gets (a copy of) a atoms associated metadata."""
+        with self._lock.read_lock():
+            ad = self._atomdetail_by_name(atom_name)
+            return dict(ad.meta)
+
     def set_task_progress(self, task_name, progress, details=None):
         """Set a tasks progress.
 
@@ -335,13 +480,20 @@ class Storage(object):
         with self._lock.write_lock():
             ad = self._atomdetail_by_name(atom_name)
             ad.put(state, data)
+            self._invalidate_provider_fetch_plans(ad.name)
+            try:
+                history_limit = self._retry_history_limits[ad.name]
+            except KeyError:
+                pass
+            else:
+                ad.compact(history_limit)
             if state == states.FAILURE and isinstance(data, misc.Failure):
                 # NOTE(imelnikov): failure serialization looses information,
                 # so we cache failures here, in atom name -> failure mapping.
                 self._failures[ad.name] = data
             else:
                 self._check_all_results_provided(ad.name, data)
-            self._with_connection(self._save_atom_detail, ad)
+            self._persist_atom_detail(ad)
 
     def save_retry_failure(self, retry_name, failed_atom_name, failure):
         """Save subflow failure to retry controller history."""
@@ -357,7 +509,7 @@ class Storage(object):
             else:
                 if failed_atom_name not in failures:
                     failures[failed_atom_name] = failure
-                    self._with_connection(self._save_atom_detail, ad)
+                    self._persist_atom_detail(ad)
 
     def cleanup_retry_history(self, retry_name, state):
         """Cleanup history of retry atom with given name."""
@@ -366,7 +518,10 @@ class Storage(object):
                                           expected_type=logbook.RetryDetail)
             ad.state = state
             ad.results = []
-            self._with_connection(self._save_atom_detail, ad)
+            ad.meta.pop('compacted_count', None)
+            ad.meta.pop('compacted_results', None)
+            self._invalidate_provider_fetch_plans(ad.name)
+            self._persist_atom_detail(ad)
 
     def _get(self, atom_name, only_last=False):
         with self._lock.read_lock():
@@ -408,6 +563,7 @@ class Storage(object):
             return False
         ad.reset(state)
         self._failures.pop(ad.name, None)
+        self._invalidate_provider_fetch_plans(ad.name)
         return True
 
     def reset(self, atom_name, state=states.PENDING):
@@ -415,7 +571,7 @@ class Storage(object):
         with self._lock.write_lock():
             ad = self._atomdetail_by_name(atom_name)
             if self._reset_atom(ad, state):
-                self._with_connection(self._save_atom_detail, ad)
+                self._persist_atom_detail(ad)
 
     def inject_atom_args(self, atom_name, pairs):
         """Add *transient* values into storage for a specific atom only.
@@ -433,6 +589,7 @@ class Storage(object):
         with self._lock.write_lock():
             self._injected_args.setdefault(atom_name, {})
             self._injected_args[atom_name].update(pairs)
+            self._fetch_plans.pop(atom_name, None)
 
     def inject(self, pairs, transient=False):
         """Add values into storage.
@@ -459,7 +616,7 @@ class Storage(object):
                 ad.state = states.SUCCESS
             else:
                 ad.results.update(pairs)
-            self._with_connection(self._save_atom_detail, ad)
+            self._persist_atom_detail(ad)
             return (self.injector_name, six.iterkeys(ad.results))
 
         def save_transient():
@@ -488,6 +645,7 @@ class Storage(object):
         if not mapping:
             return
         self._result_mappings[atom_name] = mapping
+        self._invalidate_fetch_plans(mapping)
         for name, index in six.iteritems(mapping):
             entries = self._reverse_mapping.setdefault(name, [])
 
@@ -507,24 +665,44 @@ class Storage(object):
                 LOG.warning("Multiple provider mappings being created for %r",
                             name)
 
+    def _locate(self, name):
+        """Locates the value of a name (using the providers of that name)."""
+        try:
+            indexes = self._reverse_mapping[name]
+        except KeyError:
+            raise exceptions.NotFound("Name %r is not mapped" % name)
+        # Return the first one that is found.
+        for (atom_name, index) in reversed(indexes):
+            results = self._get_results(atom_name)
+            try:
+                return misc.item_from(results, index, name)
+            except exceptions.NotFound:
+                pass
+        raise exceptions.NotFound("Unable to find result %r" % name)
+
+    def _get_results(self, atom_name):
+        if not atom_name:
+            return self._transients
+        else:
+            return self._get(atom_name, only_last=True)
+
+    def _invalidate_fetch_plans(self, names):
+        """Drops the fetch plans that resolved any of the given names."""
+        if not self._fetch_plans:
+            return
+        for name in names:
+            for atom_name in self._fetch_plan_users.pop(name, ()):
+                self._fetch_plans.pop(atom_name, None)
+
+    def _invalidate_provider_fetch_plans(self, atom_name):
+        mapping = self._result_mappings.get(atom_name)
+        if mapping:
+            self._invalidate_fetch_plans(mapping)
+
     def fetch(self, name):
         """Fetch a named atoms result."""
         with self._lock.read_lock():
-            try:
-                indexes = self._reverse_mapping[name]
-            except KeyError:
-                raise exceptions.NotFound("Name %r is not mapped" % name)
-            # Return the first one that is found.
-            for (atom_name, index) in reversed(indexes):
-                if not atom_name:
-                    results = self._transients
-                else:
-                    results = self._get(atom_name, only_last=True)
-                try:
-                    return misc.item_from(results, index, name)
-                except exceptions.NotFound:
-                    pass
-            raise exceptions.NotFound("Unable to find result %r" % name)
+            return self._locate(name)
 
     def fetch_all(self):
         """Fetch all named atom results known so far.
@@ -541,17 +719,45 @@ class Storage(object):
             return results
 
     def fetch_mapped_args(self, args_mapping, atom_name=None):
-        """Fetch arguments for an atom using an atoms arguments mapping."""
+        """Fetch arguments for an atom using an atoms arguments mapping.
+
+        When an atom name is provided the resolved argument values are
+        memoized (as a plan) so that later fetches can return those values
+        directly (instead of searching the providers for them again); the
+        plan is dropped when any provider of one of the names used saves or
+        resets its results (or new providers appear). This also allows the
+        arguments of an atom to be fetched ahead of time (before the atom is
+        ran).
+        """
         with self._lock.read_lock():
-            injected_args = {}
-            if atom_name:
-                injected_args = self._injected_args.get(atom_name, {})
+            if not atom_name:
+                mapped_args = {}
+                for key, name in six.iteritems(args_mapping):
+                    mapped_args[key] = self._locate(name)
+                return mapped_args
+            injected_args = self._injected_args.get(atom_name, {})
+            try:
+                plan_args_mapping, plan_args = self._fetch_plans[atom_name]
+            except KeyError:
+                pass
+            else:
+                if (plan_args_mapping is args_mapping or
+                        plan_args_mapping == args_mapping):
+                    return dict(plan_args)
             mapped_args = {}
             for key, name in six.iteritems(args_mapping):
                 if name in injected_args:
                     mapped_args[key] = injected_args[name]
                 else:
-                    mapped_args[key] = self.fetch(name)
+                    mapped_args[key] = self._locate(name)
+            # Readers may build plans concurrently (providers can not change
+            # meanwhile, that needs the write lock).
+            with self._fetch_plans_lock:
+                self._fetch_plans[atom_name] = (args_mapping,
+                                                dict(mapped_args))
+                for name in six.itervalues(args_mapping):
+                    users = self._fetch_plan_users.setdefault(name, set())
+                    users.add(atom_name)
             return mapped_args
 
     def set_flow_state(self, state):
@@ -575,18 +781,19 @@ class Storage(object):
                                           expected_type=logbook.RetryDetail)
             if ad.failure is not None:
                 cached = self._failures.get(retry_name)
-                history = list(ad.results)
+                history = ad.history
                 if ad.failure.matches(cached):
                     history.append((cached, {}))
                 else:
                     history.append((ad.failure, {}))
                 return history
-            return ad.results
+            return ad.history
 
 
 class MultiThreadedStorage(Storage):
     """Storage that uses locks to protect against concurrent access."""
     _lock_cls = lock_utils.ReaderWriterLock
+    _connection_holder_cls = _ThreadLocalConnectionHolder
 
 
 class SingleThreadedStorage(Storage):
@@ -36,10 +36,33 @@ class BaseTask(atom.Atom):
     functionality that defines what can be executed to accomplish that work
     as well as a way of defining what can be executed to reverted/undo that
     same piece of work.
+
+    Task classes may opt-in to being executed in batches by providing a
+    ``execute_batch`` method that accepts a list of the keyword arguments
+    that each task in the batch would have been executed with (and that
+    returns a list of the results of each task, in the same order). When
+    many tasks of such a class are ready to execute at the same time engines
+    may then execute them with a single call to the ``execute_batch`` method
+    of one of them (instead of executing each task on its own). If it raises
+    an exception all the tasks in the batch fail, a result that is a
+    :py:class:`~taskflow.utils.misc.Failure` fails just that task.
+
+    Tasks that are *trivial* (that take a very small amount of time to run)
+    can be marked as ``inline``; engines that would otherwise run them in
+    another thread (or greenthread) will then run them directly on the thread
+    that is running the engine (avoiding the overhead of submitting them to
+    and waiting on them to complete in that other thread).
     """
 
     TASK_EVENTS = ('update_progress', )
 
+    #: Whether engines should run this task on the engine thread (see above).
+    inline = False
+
+    #: Batch execution method (none if tasks of this class can not be
+    #: executed in batches, see above).
+    execute_batch = None
+
     def __init__(self, name, provides=None, inject=None):
         if name is None:
             name = reflection.get_class_name(self)
@@ -231,7 +254,7 @@ class FunctorTask(BaseTask):
 
     def __init__(self, execute, name=None, provides=None,
                  requires=None, auto_extract=True, rebind=None, revert=None,
-                 version=None, inject=None):
+                 version=None, inject=None, inline=None):
         assert six.callable(execute), ("Function to use for executing must be"
                                        " callable")
         if revert:
@@ -245,6 +268,8 @@ class FunctorTask(BaseTask):
         self._revert = revert
         if version is not None:
             self.version = version
+        if inline is not None:
+            self.inline = inline
         self._build_arg_mapping(execute, requires, rebind, auto_extract)
 
     def execute(self, *args, **kwargs):
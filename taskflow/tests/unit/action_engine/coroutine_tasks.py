@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2014 Yahoo! Inc. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# This module is a SyntaxError before python 3.5, so it is only imported on
+# 3.5 (or newer) and is excluded from flake8 (see tox.ini).
+
+import asyncio
+import threading
+
+from taskflow import task
+
+
+class SleepyTask(task.Task):
+    async def execute(self, delay):
+        self.update_progress(0.5)
+        await asyncio.sleep(delay)
+        return threading.current_thread().name
+
+
+class FailingTask(task.Task):
+    async def execute(self):
+        await asyncio.sleep(0)
+        raise IOError("Woot!")
+
+    async def revert(self, result, flow_failures):
+        await asyncio.sleep(0)
+        return 'reverted'
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2014 Yahoo! Inc. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from taskflow.engines.action_engine import compiler
+from taskflow.engines.action_engine import executor
+from taskflow.engines.action_engine import runtime
+from taskflow.patterns import linear_flow as lf
+from taskflow.patterns import unordered_flow as uf
+from taskflow import states as st
+from taskflow import storage
+from taskflow import test
+from taskflow.tests import utils as test_utils
+from taskflow.utils import misc
+from taskflow.utils import persistence_utils as pu
+
+
+class AnalyzerTest(test.TestCase):
+    def _make_runtime(self, flow):
+        compilation = compiler.PatternCompiler().compile(flow)
+        flow_detail = pu.create_flow_detail(flow)
+        store = storage.SingleThreadedStorage(flow_detail)
+        for task in compilation.execution_graph:
+            store.ensure_task(task.name)
+        return runtime.Runtime(compilation, store, misc.Notifier(),
+                               executor.SerialTaskExecutor())
+
+    def test_initial_ready_nodes(self):
+        a, b, c = test_utils.make_many(3)
+        flow = lf.Flow("root")
+        flow.add(a, b, c)
+        rt = self._make_runtime(flow)
+        rt.analyzer.refresh()
+        self.assertEqual([a], rt.analyzer.get_next_nodes())
+        self.assertFalse(rt.analyzer.is_success())
+
+    def test_ready_nodes_follow_state_changes(self):
+        a, b, c = test_utils.make_many(3)
+        flow = lf.Flow("root")
+        flow.add(a, b, c)
+        rt = self._make_runtime(flow)
+        rt.analyzer.refresh()
+
+        rt.task_action.change_state(a, st.RUNNING)
+        self.assertEqual([], rt.analyzer.get_next_nodes())
+        rt.task_action.change_state(a, st.SUCCESS)
+        self.assertEqual([b], rt.analyzer.get_next_nodes(a))
+        self.assertEqual([b], rt.analyzer.get_next_nodes())
+
+        for task in (b, c):
+            rt.task_action.change_state(task, st.RUNNING)
+            rt.task_action.change_state(task, st.SUCCESS)
+        self.assertEqual([], rt.analyzer.get_next_nodes())
+        self.assertTrue(rt.analyzer.is_success())
+
+    def test_ready_nodes_follow_intention_changes(self):
+        a, b = test_utils.make_many(2)
+        flow = uf.Flow("root")
+        flow.add(a, b)
+        rt = self._make_runtime(flow)
+        rt.analyzer.refresh()
+        self.assertEqual(set([a, b]), set(rt.analyzer.get_next_nodes()))
+
+        rt.task_action.change_state(a, st.RUNNING)
+        rt.task_action.change_state(a, st.SUCCESS)
+        rt.reset_nodes([a, b], state=None, intention=st.REVERT)
+        self.assertEqual([a], rt.analyzer.browse_nodes_for_revert())
+        self.assertEqual([], rt.analyzer.browse_nodes_for_execute())
+
+    def test_refresh_picks_up_external_changes(self):
+        a, b = test_utils.make_many(2)
+        flow = lf.Flow("root")
+        flow.add(a, b)
+        rt = self._make_runtime(flow)
+        rt.analyzer.refresh()
+        self.assertEqual([a], rt.analyzer.get_next_nodes())
+
+        rt.storage.save(a.name, 5)
+        self.assertEqual([a], rt.analyzer.get_next_nodes())
+        rt.analyzer.refresh()
+        self.assertEqual([b], rt.analyzer.get_next_nodes())
+
+    def test_pop_unready_nodes(self):
+        a, b = test_utils.make_many(2)
+        flow = uf.Flow("root")
+        flow.add(a, b)
+        rt = self._make_runtime(flow)
+        rt.analyzer.refresh()
+        self.assertEqual([], rt.analyzer.pop_unready_nodes())
+
+        rt.task_action.change_state(a, st.RUNNING)
+        self.assertEqual([a], rt.analyzer.pop_unready_nodes())
+        self.assertEqual([], rt.analyzer.pop_unready_nodes())
+
+        # Atoms that become ready again are not returned.
+        rt.reset_nodes([b], state=st.RUNNING)
+        rt.reset_nodes([b], state=st.PENDING)
+        self.assertEqual([], rt.analyzer.pop_unready_nodes())
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2014 Yahoo! Inc. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sys
+import threading
+
+import testtools
+
+import taskflow.engines
+from taskflow.engines.action_engine import engine as eng
+from taskflow.engines.action_engine import executor
+from taskflow.patterns import linear_flow as lf
+from taskflow.patterns import unordered_flow as uf
+from taskflow import states
+from taskflow import task
+from taskflow import test
+from taskflow.test import mock
+from taskflow.utils import asyncio_utils
+from taskflow.utils import misc
+
+# The coroutine_tasks module uses syntax that older pythons
+# can not even compile, so it is only imported where that syntax is valid.
+if sys.version_info >= (3, 5):
+    from taskflow.tests.unit.action_engine import coroutine_tasks
+else:
+    coroutine_tasks = None
+
+
+class PlainTask(task.Task):
+    def execute(self):
+        return threading.current_thread().name
+
+
+class LoopThreadTest(test.TestCase):
+    def test_asyncio_not_available(self):
+        with mock.patch.object(asyncio_utils, 'ASYNCIO_AVAILABLE', False):
+            self.assertRaises(RuntimeError, asyncio_utils.LoopThread)
+
+
+@testtools.skipIf(coroutine_tasks is None or
+                  not asyncio_utils.ASYNCIO_AVAILABLE,
+                  'coroutine functions are not available')
+class AsyncioTaskExecutorTest(test.TestCase):
+    def setUp(self):
+        super(AsyncioTaskExecutorTest, self).setUp()
+        self.executor = executor.AsyncioTaskExecutor()
+        self.executor.start()
+        self.addCleanup(self.executor.stop)
+
+    def test_execute(self):
+        progress = []
+
+        def on_progress(task, event_data, progress_value, **kwargs):
+            progress.append(progress_value)
+
+        t = coroutine_tasks.SleepyTask(name='sleepy')
+        fut = self.executor.execute_task(t, 'uuid', {'delay': 0},
+                                         progress_callback=on_progress)
+        (_task, event, result) = fut.result()
+        self.assertEqual(executor.EXECUTED, event)
+        self.assertEqual([0.5], progress)
+        self.assertNotEqual(threading.current_thread().name, result)
+
+    def test_execute_failure_and_revert(self):
+        t = coroutine_tasks.FailingTask(name='fail')
+        (_task, event, result) = self.executor.execute_task(
+            t, 'uuid', {}).result()
+        self.assertEqual(executor.EXECUTED, event)
+        self.assertIsInstance(result, misc.Failure)
+        self.assertTrue(result.check(IOError))
+        (_task, event, result) = self.executor.revert_task(
+            t, 'uuid', {}, result, {'fail': result}).result()
+        self.assertEqual(executor.REVERTED, event)
+        self.assertEqual('reverted', result)
+
+    def test_plain_task_not_ran_on_loop(self):
+        t = PlainTask(name='plain')
+        (_task, _event, result) = self.executor.execute_task(
+            t, 'uuid', {}).result()
+        self.assertEqual(executor.EXECUTED, _event)
+        self.assertNotEqual(threading.current_thread().name, result)
+
+    def test_cancel(self):
+        t = coroutine_tasks.SleepyTask(name='sleepy')
+        fut = self.executor.execute_task(t, 'uuid', {'delay': 60})
+        self.executor.cancel()
+        done, not_done = self.executor.wait_for_any([fut], timeout=10)
+        self.assertEqual(set([fut]), set(done))
+        self.assertTrue(fut.cancelled())
+
+
+@testtools.skipIf(coroutine_tasks is None or
+                  not asyncio_utils.ASYNCIO_AVAILABLE,
+                  'coroutine functions are not available')
+class AsyncioEngineTest(test.TestCase):
+    def _make_engine(self, flow, store):
+        return taskflow.engines.load(flow, store=store,
+                                     engine_conf='asyncio')
+
+    def test_many_in_flight(self):
+        flow = uf.Flow('flow')
+        for i in range(0, 100):
+            flow.add(coroutine_tasks.SleepyTask(name='s-%s' % i,
+                                                provides='r-%s' % i))
+        flow.add(PlainTask(name='plain', provides='plain'))
+        engine = self._make_engine(flow, {'delay': 0.1})
+        self.assertIsInstance(engine, eng.AsyncioActionEngine)
+        engine.run()
+        results = set(engine.storage.fetch('r-%s' % i)
+                      for i in range(0, 100))
+        # All of the coroutines were ran by the same (event loop) thread.
+        self.assertEqual(1, len(results))
+        self.assertNotIn(engine.storage.fetch('plain'), results)
+
+    def test_revert(self):
+        flow = lf.Flow('flow').add(
+            coroutine_tasks.SleepyTask(name='sleepy'),
+            coroutine_tasks.FailingTask(name='fail'))
+        engine = self._make_engine(flow, {'delay': 0})
+        self.assertRaisesRegexp(IOError, '^Woot', engine.run)
+        self.assertEqual(states.REVERTED, engine.storage.get_flow_state())
+
+    def test_suspend_cancels(self):
+        flow = uf.Flow('flow').add(
+            coroutine_tasks.SleepyTask(name='sleepy', provides='sleepy'))
+        engine = self._make_engine(flow, {'delay': 60})
+        for state in engine.run_iter():
+            if state == states.WAITING:
+                engine.suspend()
+        self.assertEqual(states.SUSPENDED, engine.storage.get_flow_state())
+        self.assertEqual(states.RUNNING,
+                         engine.storage.get_atom_state('sleepy'))
+        # The cancelled task is ran again when the engine is resumed.
+        engine.storage.inject({'delay': 0})
+        engine.run()
+        self.assertEqual(states.SUCCESS, engine.storage.get_flow_state())
+        self.assertIsNotNone(engine.storage.fetch('sleepy'))
@@ -21,6 +21,7 @@ from taskflow.patterns import linear_flow as lf
 from taskflow.patterns import unordered_flow as uf
 from taskflow import retry
 from taskflow import test
+from taskflow.types import cache
 from taskflow.tests import utils as test_utils
 
 
@@ -417,3 +418,170 @@ class PatternCompileTest(test.TestCase):
         self.assertIs(c1, g.node[b]['retry'])
         self.assertIs(c1, g.node[c]['retry'])
         self.assertIs(None, g.node[c1].get('retry'))
+
+    def test_indexed_graph(self):
+        a, b, c, d = test_utils.make_many(4)
+        flo = gf.Flow("test")
+        flo.add(a, b, c, d)
+        flo.link(a, b)
+        flo.link(a, c)
+        flo.link(c, d)
+        compilation = compiler.PatternCompiler().compile(flo)
+        g = compilation.execution_graph
+        ig = compilation.indexed_graph
+
+        self.assertEqual(len(g), len(ig))
+        for atom in ig.atoms:
+            index = ig.index_of(atom)
+            self.assertIs(atom, ig.atoms[index])
+            self.assertEqual(index, ig.index_of_name(atom.name))
+            self.assertEqual(g.successors(atom),
+                             [ig.atoms[i] for i in ig.successors(index)])
+            self.assertEqual(g.predecessors(atom),
+                             [ig.atoms[i] for i in ig.predecessors(index)])
+            self.assertEqual(compiler.NO_INDEX, ig.retry_of(index))
+        self.assertEqual((), ig.retries)
+
+    def test_indexed_graph_retries_hierarchy(self):
+        c1 = retry.AlwaysRevert("cp1")
+        c2 = retry.AlwaysRevert("cp2")
+        a, b, c, d = test_utils.make_many(4)
+        flo = lf.Flow("test", c1).add(
+            a,
+            lf.Flow("test", c2).add(b, c),
+            d)
+        compilation = compiler.PatternCompiler().compile(flo)
+        ig = compilation.indexed_graph
+
+        self.assertEqual(sorted([ig.index_of(c1), ig.index_of(c2)]),
+                         sorted(ig.retries))
+        self.assertEqual(ig.index_of(c1), ig.retry_of(ig.index_of(a)))
+        self.assertEqual(ig.index_of(c1), ig.retry_of(ig.index_of(c2)))
+        self.assertEqual(ig.index_of(c2), ig.retry_of(ig.index_of(b)))
+        self.assertEqual(compiler.NO_INDEX, ig.retry_of(ig.index_of(c1)))
+        self.assertItemsEqual([b, c, d],
+                              [ig.atoms[i]
+                               for i in ig.subgraph_of(ig.index_of(c2))])
+        self.assertItemsEqual([a, c2, b, c, d],
+                              [ig.atoms[i]
+                               for i in ig.subgraph_of(ig.index_of(c1))])
+
+    def test_indexed_graph_flow_limits(self):
+        a, b, c, d = test_utils.make_many(4)
+        inner = uf.Flow("test2").add(b, c)
+        inner.max_in_flight = 1
+        flo = lf.Flow("test").add(a, inner, d)
+        flo.max_in_flight = 2
+        compilation = compiler.PatternCompiler().compile(flo)
+        ig = compilation.indexed_graph
+
+        self.assertEqual((1, 2), ig.flow_limits)
+        self.assertEqual((1,), ig.flow_limits_of(ig.index_of(a)))
+        self.assertEqual((0, 1), ig.flow_limits_of(ig.index_of(b)))
+        self.assertEqual((0, 1), ig.flow_limits_of(ig.index_of(c)))
+        self.assertEqual((1,), ig.flow_limits_of(ig.index_of(d)))
+
+    def test_indexed_graph_no_flow_limits(self):
+        flo = lf.Flow("test").add(*test_utils.make_many(2))
+        ig = compiler.PatternCompiler().compile(flo).indexed_graph
+        self.assertEqual((), ig.flow_limits)
+        for index in range(0, len(ig)):
+            self.assertEqual((), ig.flow_limits_of(index))
+
+
+class CachingPatternCompileTest(test.TestCase):
+    def _make_flow(self):
+        c1 = retry.AlwaysRevert("cp1")
+        a, b, c, d = test_utils.make_many(4)
+        return lf.Flow("test", c1).add(
+            a,
+            gf.Flow("test2").add(b, c),
+            d)
+
+    def test_cache_hit(self):
+        c = cache.LRUCache(2)
+        flo = self._make_flow()
+        compilation = compiler.PatternCompiler(cache=c).compile(flo)
+        self.assertEqual(0, c.hits)
+        self.assertEqual(1, c.misses)
+        self.assertEqual(1, len(c))
+
+        flo2 = self._make_flow()
+        compilation2 = compiler.PatternCompiler(cache=c).compile(flo2)
+        self.assertEqual(1, c.hits)
+        self.assertEqual(1, c.misses)
+
+        g = compilation.execution_graph
+        g2 = compilation2.execution_graph
+        self.assertTrue(g2.frozen)
+        self.assertEqual(g.name, g2.name)
+
+        def edge_names(graph):
+            return sorted((u.name, v.name, attrs)
+                          for (u, v, attrs) in graph.edges_iter(data=True))
+
+        self.assertEqual(edge_names(g), edge_names(g2))
+        atoms2 = set(g2.nodes())
+        for atom in compilation2.indexed_graph.atoms:
+            self.assertIn(atom, atoms2)
+            retry_atom = g2.node[atom].get('retry')
+            if retry_atom is not None:
+                self.assertIn(retry_atom, atoms2)
+        self.assertEqual([n.name for n in compilation.indexed_graph.atoms],
+                         [n.name for n in compilation2.indexed_graph.atoms])
+
+    def test_cache_hit_unordered(self):
+        c = cache.LRUCache(2)
+
+        def make_flow():
+            # The children of unordered flows are kept in a set, so the order
+            # they are iterated in differs between (identical) flows.
+            return uf.Flow("test").add(
+                lf.Flow("sub").add(*test_utils.make_many(2, offset=20)),
+                *test_utils.make_many(20))
+
+        names = None
+        for _i in range(0, 10):
+            compilation = compiler.PatternCompiler(cache=c).compile(
+                make_flow())
+            g = compilation.execution_graph
+            if names is None:
+                names = sorted(n.name for n in g.nodes())
+            self.assertEqual(names, sorted(n.name for n in g.nodes()))
+            self.assertEqual(1, len(g.edges()))
+        self.assertEqual(9, c.hits)
+        self.assertEqual(1, c.misses)
+        self.assertEqual(1, len(c))
+
+    def test_cache_miss_on_structure_change(self):
+        c = cache.LRUCache(2)
+        flo = self._make_flow()
+        compiler.PatternCompiler(cache=c).compile(flo)
+        flo2 = self._make_flow()
+        flo2.add(test_utils.DummyTask(name='e'))
+        compiler.PatternCompiler(cache=c).compile(flo2)
+        self.assertEqual(0, c.hits)
+        self.assertEqual(2, c.misses)
+        self.assertEqual(2, len(c))
+
+    def test_cache_miss_on_limit_change(self):
+        c = cache.LRUCache(2)
+        flo = self._make_flow()
+        compiler.PatternCompiler(cache=c).compile(flo)
+        flo2 = self._make_flow()
+        flo2.max_in_flight = 1
+        compilation = compiler.PatternCompiler(cache=c).compile(flo2)
+        self.assertEqual(0, c.hits)
+        self.assertEqual(2, c.misses)
+        self.assertEqual((1,), compilation.indexed_graph.flow_limits)
+
+    def test_failures_not_cached(self):
+        c = cache.LRUCache(2)
+        a = test_utils.DummyTask(name='a')
+        b = test_utils.DummyTask(name='a')
+        for _i in range(0, 2):
+            flo = lf.Flow("test").add(a, b)
+            self.assertRaises(exc.Duplicate,
+                              compiler.PatternCompiler(cache=c).compile,
+                              flo)
+        self.assertEqual(0, len(c))
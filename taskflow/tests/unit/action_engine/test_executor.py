@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2014 Yahoo! Inc. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import functools
+
+from concurrent import futures
+
+from taskflow.engines.action_engine import executor
+from taskflow import test
+
+
+class FanOutTest(test.TestCase):
+    def _make_batch(self, amount):
+        fut = futures.Future()
+        fs = [futures.Future() for _i in range(0, amount)]
+        fut.add_done_callback(functools.partial(executor._fan_out, fs=fs))
+        return (fut, fs)
+
+    def test_results(self):
+        fut, fs = self._make_batch(2)
+        fut.set_result(['a', 'b'])
+        self.assertEqual(['a', 'b'], [f.result() for f in fs])
+
+    def test_failed(self):
+        fut, fs = self._make_batch(2)
+        fut.set_exception(KeyboardInterrupt())
+        for f in fs:
+            self.assertIsInstance(f.exception(), KeyboardInterrupt)
+
+    def test_cancelled(self):
+        fut, fs = self._make_batch(2)
+        self.assertTrue(fut.cancel())
+        self.assertTrue(all(f.cancelled() for f in fs))
+
+    def test_child_cancelled(self):
+        fut, fs = self._make_batch(2)
+        self.assertTrue(fs[0].cancel())
+        fut.set_result(['a', 'b'])
+        self.assertTrue(fs[0].cancelled())
+        self.assertEqual('b', fs[1].result())
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2014 Yahoo! Inc. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import taskflow.engines
+from taskflow.engines.action_engine import engine as eng
+from taskflow.engines.action_engine import executor
+from taskflow.patterns import linear_flow as lf
+from taskflow import task
+from taskflow import test
+from taskflow.utils import misc
+
+# The tasks used in these tests must be defined at the module
+# level so that they can be pickled (and sent to the child processes).
+
+
+class SquareTask(task.Task):
+    def execute(self, x):
+        self.update_progress(0.5, note='half-way')
+        return x * x
+
+
+class FailingTask(task.Task):
+    def execute(self):
+        raise IOError("Woot!")
+
+
+class RevertingTask(task.Task):
+    def execute(self):
+        pass
+
+    def revert(self, result, flow_failures):
+        return (result, sorted(flow_failures))
+
+
+class ProcessPoolTaskExecutorTest(test.TestCase):
+    def setUp(self):
+        super(ProcessPoolTaskExecutorTest, self).setUp()
+        self.executor = executor.ProcessPoolTaskExecutor(max_workers=2)
+        self.executor.start()
+        self.addCleanup(self.executor.stop)
+
+    def test_execute(self):
+        t = SquareTask(name='square')
+        fut = self.executor.execute_task(t, 'uuid', {'x': 4})
+        (_task, event, result) = fut.result()
+        self.assertEqual(executor.EXECUTED, event)
+        self.assertEqual(16, result)
+
+    def test_execute_failure(self):
+        t = FailingTask(name='fail')
+        fut = self.executor.execute_task(t, 'uuid', {})
+        (_task, event, result) = fut.result()
+        self.assertEqual(executor.EXECUTED, event)
+        self.assertIsInstance(result, misc.Failure)
+        self.assertTrue(result.check(IOError))
+
+    def test_progress_relayed(self):
+        progress = []
+
+        def on_progress(task, event_data, progress_value, **kwargs):
+            progress.append((task.name, progress_value, kwargs))
+
+        t = SquareTask(name='square')
+        fut = self.executor.execute_task(t, 'uuid', {'x': 2},
+                                         progress_callback=on_progress)
+        fut.result()
+        # Progress is relayed before the task is marked as completed.
+        self.assertEqual([('square', 0.5, {'note': 'half-way'})], progress)
+
+    def test_revert(self):
+        try:
+            raise RuntimeError("Woot!")
+        except RuntimeError:
+            failure = misc.Failure()
+        t = RevertingTask(name='revert')
+        fut = self.executor.revert_task(t, 'uuid', {}, failure,
+                                        {'revert': failure})
+        (_task, event, result) = fut.result()
+        self.assertEqual(executor.REVERTED, event)
+        (revert_result, failed_names) = result
+        self.assertTrue(revert_result.check(RuntimeError))
+        self.assertEqual(['revert'], failed_names)
+
+
+class ParallelProcessEngineTest(test.TestCase):
+    def test_load(self):
+        flow = lf.Flow('flow').add(SquareTask(name='square',
+                                              provides='squared'))
+        engine = taskflow.engines.load(flow, store={'x': 3},
+                                       engine_conf='parallel-process')
+        self.assertIsInstance(engine, eng.ParallelProcessActionEngine)
+        engine.run()
+        self.assertEqual(9, engine.storage.fetch('squared'))
@@ -21,10 +21,13 @@ from taskflow.engines.action_engine import executor
 from taskflow.engines.action_engine import runner
 from taskflow.engines.action_engine import runtime
 from taskflow import exceptions as excp
+from taskflow.patterns import graph_flow as gf
 from taskflow.patterns import linear_flow as lf
+from taskflow.patterns import unordered_flow as uf
 from taskflow import states as st
 from taskflow import storage
 from taskflow import test
+from taskflow.test import mock
 from taskflow.tests import utils as test_utils
 from taskflow.types import fsm
 from taskflow.utils import misc
@@ -32,7 +35,7 @@ from taskflow.utils import persistence_utils as pu
 
 
 class _RunnerTestMixin(object):
-    def _make_runtime(self, flow, initial_state=None):
+    def _make_runtime(self, flow, initial_state=None, options=None):
         compilation = compiler.PatternCompiler().compile(flow)
         flow_detail = pu.create_flow_detail(flow)
         store = storage.SingleThreadedStorage(flow_detail)
@@ -46,7 +49,8 @@ class _RunnerTestMixin(object):
         task_executor.start()
         self.addCleanup(task_executor.stop)
         return runtime.Runtime(compilation, store,
-                               task_notifier, task_executor)
+                               task_notifier, task_executor,
+                               options=options)
 
 
 class RunnerTest(test.TestCase, _RunnerTestMixin):
@@ -78,10 +82,8 @@ class RunnerTest(test.TestCase, _RunnerTestMixin):
         self.assertEqual(st.SCHEDULING, state)
         self.assertEqual(0, len(failures))
 
-        state, failures = six.next(it)
-        self.assertEqual(st.WAITING, state)
-        self.assertEqual(0, len(failures))
-
+        # The serial executor completes tasks as they are scheduled, so
+        # there is nothing to wait on (and the waiting state is skipped).
         state, failures = six.next(it)
         self.assertEqual(st.ANALYZING, state)
         self.assertEqual(0, len(failures))
@@ -174,6 +176,213 @@ class RunnerTest(test.TestCase, _RunnerTestMixin):
                          rt.storage.get_atom_state(sad_tasks[0].name))
 
 
+class SchedulerTest(test.TestCase, _RunnerTestMixin):
+    def _make_ordered(self, amount, **kwargs):
+        # Unordered flows have no order, so ensure (via the priorities) that
+        # the tasks are admitted in the order they were made in.
+        tasks = test_utils.make_many(amount, **kwargs)
+        for (i, t) in enumerate(tasks):
+            t.priority = -i
+        return tasks
+
+    def _make_chain_flow(self):
+        # The chain a -> b -> c is longer than the single d (so a should be
+        # started before d even though they are both ready at the same time).
+        a = test_utils.TaskOneReturn(name='a', provides='x')
+        b = test_utils.TaskOneArgOneReturn(name='b', provides='y')
+        c = test_utils.TaskOneArg(name='c', rebind=['y'])
+        d = test_utils.TaskNoRequiresNoReturns(name='d')
+        flow = gf.Flow('root').add(d, a, b, c)
+        return (flow, [a, b, c, d])
+
+    def test_prioritize_critical_path(self):
+        flow, (a, _b, _c, d) = self._make_chain_flow()
+        rt = self._make_runtime(flow, initial_state=st.RUNNING)
+        self.assertEqual([a, d], rt.scheduler.prioritize([d, a]))
+
+    def test_prioritize_durations(self):
+        flow, (a, _b, _c, d) = self._make_chain_flow()
+        rt = self._make_runtime(flow, initial_state=st.RUNNING)
+        rt.storage.update_atom_metadata('d', {'duration': 10.0})
+        rt.scheduler.refresh()
+        self.assertEqual([d, a], rt.scheduler.prioritize([a, d]))
+
+    def test_prioritize_priority(self):
+        tasks = test_utils.make_many(
+            3, task_cls=test_utils.TaskNoRequiresNoReturns)
+        tasks[1].priority = 10
+        tasks[2].priority = -1
+        flow = uf.Flow('root').add(*tasks)
+        rt = self._make_runtime(flow, initial_state=st.RUNNING)
+        self.assertEqual([tasks[1], tasks[0], tasks[2]],
+                         rt.scheduler.prioritize(reversed(tasks)))
+
+    def test_window(self):
+        tasks = test_utils.make_many(
+            3, task_cls=test_utils.TaskNoRequiresNoReturns)
+        flow = uf.Flow('root').add(*tasks)
+        rt = self._make_runtime(flow, initial_state=st.RUNNING,
+                                options={'max_in_flight': 1})
+        self.assertEqual(1, rt.scheduler.window)
+        for (state, failures) in rt.runner.run_iter():
+            self.assertEqual(0, len(failures))
+        self.assertEqual(st.SUCCESS, state)
+        for t in tasks:
+            self.assertEqual(st.SUCCESS, rt.storage.get_atom_state(t.name))
+
+    def test_admit_flow_limit(self):
+        tasks = self._make_ordered(
+            3, task_cls=test_utils.TaskNoRequiresNoReturns)
+        flow = uf.Flow('root').add(*tasks)
+        flow.max_in_flight = 2
+        rt = self._make_runtime(flow, initial_state=st.RUNNING)
+        self.assertTrue(rt.scheduler.limited)
+        admitted, deferred = rt.scheduler.admit(tasks)
+        self.assertEqual(tasks[0:2], admitted)
+        self.assertEqual(tasks[2:], deferred)
+        admitted, deferred = rt.scheduler.admit(deferred)
+        self.assertEqual([], admitted)
+        rt.scheduler.release(tasks[1])
+        admitted, deferred = rt.scheduler.admit(deferred)
+        self.assertEqual(tasks[2:], admitted)
+        self.assertEqual([], deferred)
+
+    def test_schedule_batch_mixed_intentions(self):
+        tasks = [test_utils.BatchingTask(name='x%s' % i, inject={'x': i})
+                 for i in range(1, 4)]
+        flow = uf.Flow('root').add(*tasks)
+        rt = self._make_runtime(flow, initial_state=st.RUNNING)
+        rt.storage.set_atom_intention('x1', st.REVERT)
+        with mock.patch.object(rt.task_action, 'schedule_reversion',
+                               return_value='reverting') as revert:
+            with mock.patch.object(rt.task_action,
+                                   'schedule_batch_execution',
+                                   return_value=['x2', 'x3']) as batch:
+                futures, failures = rt.scheduler.schedule(tasks)
+        self.assertEqual([], failures)
+        self.assertEqual(set(['reverting', 'x2', 'x3']), futures)
+        revert.assert_called_once_with(tasks[0], inline=False)
+        self.assertEqual(1, batch.call_count)
+        self.assertEqual(set(tasks[1:]), set(batch.call_args[0][0]))
+
+    def test_admit_deferred(self):
+        tasks = self._make_ordered(
+            4, task_cls=test_utils.TaskNoRequiresNoReturns)
+        flow = uf.Flow('root').add(*tasks)
+        flow.max_in_flight = 1
+        rt = self._make_runtime(flow, initial_state=st.RUNNING)
+        admitted, deferred = rt.scheduler.admit(reversed(tasks))
+        self.assertEqual(tasks[0:1], admitted)
+        self.assertEqual(list(reversed(tasks[1:])), deferred)
+        self.assertTrue(rt.scheduler.deferring)
+
+        # Deferred nodes are admitted (most important first) as admitted
+        # nodes are released, unless they were discarded.
+        rt.scheduler.discard(tasks[1])
+        rt.scheduler.release(tasks[0])
+        self.assertEqual((tasks[2:3], []), rt.scheduler.admit([]))
+        rt.scheduler.release(tasks[2])
+        self.assertEqual((tasks[3:4], []), rt.scheduler.admit([]))
+        self.assertFalse(rt.scheduler.deferring)
+
+    def test_admit_class_limit(self):
+        tasks = self._make_ordered(
+            2, task_cls=test_utils.TaskNoRequiresNoReturns)
+        others = self._make_ordered(2, offset=2)
+        flow = uf.Flow('root').add(*(tasks + others))
+        options = {
+            'max_in_flight_per_class': {
+                test_utils.TaskNoRequiresNoReturns: 1,
+            },
+        }
+        rt = self._make_runtime(flow, initial_state=st.RUNNING,
+                                options=options)
+        admitted, deferred = rt.scheduler.admit(tasks + others)
+        self.assertItemsEqual([tasks[0]] + others, admitted)
+        self.assertEqual([tasks[1]], deferred)
+
+    def test_admit_class_limit_attribute(self):
+        tasks = self._make_ordered(
+            3, task_cls=test_utils.TaskNoRequiresNoReturns)
+        tasks[0].max_in_flight = 2
+        flow = uf.Flow('root').add(*tasks)
+        rt = self._make_runtime(flow, initial_state=st.RUNNING)
+        admitted, deferred = rt.scheduler.admit(tasks)
+        self.assertEqual(tasks[0:2], admitted)
+        self.assertEqual(tasks[2:], deferred)
+
+        # The engine option (by class name) takes precedence.
+        cls_name = 'taskflow.tests.utils.TaskNoRequiresNoReturns'
+        options = {'max_in_flight_per_class': {cls_name: 1}}
+        rt = self._make_runtime(flow, initial_state=st.RUNNING,
+                                options=options)
+        admitted, deferred = rt.scheduler.admit(tasks)
+        self.assertEqual(tasks[0:1], admitted)
+        self.assertEqual(tasks[1:], deferred)
+
+    def test_unlimited(self):
+        tasks = test_utils.make_many(3)
+        flow = uf.Flow('root').add(*tasks)
+        rt = self._make_runtime(flow, initial_state=st.RUNNING)
+        self.assertFalse(rt.scheduler.limited)
+        admitted, deferred = rt.scheduler.admit(tasks)
+        self.assertEqual(3, len(admitted))
+        self.assertEqual([], deferred)
+
+    def test_limited_flow_runs(self):
+        tasks = test_utils.make_many(
+            4, task_cls=test_utils.TaskNoRequiresNoReturns)
+        flow = uf.Flow('root').add(*tasks)
+        flow.max_in_flight = 1
+        rt = self._make_runtime(flow, initial_state=st.RUNNING)
+        for (state, failures) in rt.runner.run_iter():
+            self.assertEqual(0, len(failures))
+        self.assertEqual(st.SUCCESS, state)
+
+    def test_predict(self):
+        flow, (a, _b, _c, _d) = self._make_chain_flow()
+        rt = self._make_runtime(flow, initial_state=st.RUNNING)
+        # The b task requires what a provides (so its arguments can not be
+        # fetched before a completes).
+        self.assertEqual(set(), rt.scheduler.predict([a]))
+        e = test_utils.TaskNoRequiresNoReturns(name='e')
+        flow = lf.Flow('root').add(a, e)
+        rt = self._make_runtime(flow, initial_state=st.RUNNING)
+        self.assertEqual(set([e]), rt.scheduler.predict([a]))
+
+    def test_prefetch(self):
+        flow, (_a, b, c, _d) = self._make_chain_flow()
+        rt = self._make_runtime(flow, initial_state=st.RUNNING)
+        self.assertTrue(rt.scheduler.prefetching)
+        rt.storage.inject({'x': 1})
+        self.assertEqual(1, rt.scheduler.prefetch([b, c]))
+        with mock.patch.object(rt.storage, '_locate') as mocked_locate:
+            self.assertEqual({'x': 1}, rt.storage.fetch_mapped_args(
+                b.rebind, atom_name=b.name))
+        self.assertFalse(mocked_locate.called)
+
+    def test_prefetch_disabled(self):
+        flow, _tasks = self._make_chain_flow()
+        rt = self._make_runtime(flow, initial_state=st.RUNNING,
+                                options={'prefetch_arguments': False})
+        self.assertFalse(rt.scheduler.prefetching)
+
+    def test_bad_window(self):
+        flow = lf.Flow('root').add(*test_utils.make_many(1))
+        rt = self._make_runtime(flow, initial_state=st.RUNNING,
+                                options={'max_in_flight': 0})
+        self.assertRaises(ValueError, getattr, rt, 'scheduler')
+
+    def test_bad_class_limit(self):
+        flow = lf.Flow('root').add(*test_utils.make_many(1))
+        options = {
+            'max_in_flight_per_class': {test_utils.DummyTask: 0},
+        }
+        rt = self._make_runtime(flow, initial_state=st.RUNNING,
+                                options=options)
+        self.assertRaises(ValueError, getattr, rt, 'scheduler')
+
+
 class RunnerBuilderTest(test.TestCase, _RunnerTestMixin):
     def test_builder_manual_process(self):
         flow = lf.Flow("root")
@@ -217,20 +426,12 @@ class RunnerBuilderTest(test.TestCase, _RunnerTestMixin):
                         next_event, *args, **kwargs)
         reaction, terminal = machine.process_event(next_event)
         self.assertFalse(terminal)
-        self.assertEqual(st.WAITING, machine.current_state)
+        self.assertIsNotNone(reaction)
+        self.assertEqual(st.ANALYZING, machine.current_state)
         self.assertRaises(excp.NotFound, machine.process_event, 'poke')
 
-        # Should now be running...
+        # Should now be running (and its result ready to be analyzed)...
         self.assertEqual(st.RUNNING, rt.storage.get_atom_state(tasks[0].name))
-
-        last_state = machine.current_state
-        cb, args, kwargs = reaction
-        next_event = cb(last_state, machine.current_state,
-                        next_event, *args, **kwargs)
-        reaction, terminal = machine.process_event(next_event)
-        self.assertFalse(terminal)
-        self.assertIsNotNone(reaction)
-        self.assertEqual(st.ANALYZING, machine.current_state)
         self.assertRaises(excp.NotFound, machine.process_event, 'poke')
 
         last_state = machine.current_state
@@ -296,8 +497,9 @@ class RunnerBuilderTest(test.TestCase, _RunnerTestMixin):
         transitions = list(machine.run_iter('start'))
 
         occurrences = dict((t, transitions.count(t)) for t in transitions)
-        self.assertEqual(10, occurrences.get((st.SCHEDULING, st.WAITING)))
-        self.assertEqual(10, occurrences.get((st.WAITING, st.ANALYZING)))
+        self.assertEqual(10, occurrences.get((st.SCHEDULING, st.ANALYZING)))
+        self.assertIsNone(occurrences.get((st.SCHEDULING, st.WAITING)))
+        self.assertIsNone(occurrences.get((st.WAITING, st.ANALYZING)))
         self.assertEqual(9, occurrences.get((st.ANALYZING, st.SCHEDULING)))
         self.assertEqual(1, occurrences.get((runner._GAME_OVER, st.SUCCESS)))
         self.assertEqual(1, occurrences.get((runner._UNDEFINED, st.RESUMING)))
@@ -289,6 +289,37 @@ class PersistenceTestMixin(object):
         self.assertIsInstance(fail2, misc.Failure)
         self.assertTrue(fail.matches(fail2))
 
+    def test_retry_detail_save_compacted(self):
+        lb_id = uuidutils.generate_uuid()
+        lb_name = 'lb-%s' % (lb_id)
+        lb = logbook.LogBook(name=lb_name, uuid=lb_id)
+        fd = logbook.FlowDetail('test', uuid=uuidutils.generate_uuid())
+        lb.add(fd)
+        rd = logbook.RetryDetail("retry-1", uuid=uuidutils.generate_uuid())
+        fail = misc.Failure.from_exception(RuntimeError('fail'))
+        rd.results.append((1, {'some-task': fail}))
+        rd.results.append((2, {'some-task': fail}))
+        self.assertTrue(rd.compact(1))
+        fd.add(rd)
+
+        # save it
+        with contextlib.closing(self._get_connection()) as conn:
+            conn.save_logbook(lb)
+            conn.update_flow_details(fd)
+            conn.update_atom_details(rd)
+
+        # now read it back
+        with contextlib.closing(self._get_connection()) as conn:
+            lb2 = conn.get_logbook(lb_id)
+        fd2 = lb2.find(fd.uuid)
+        rd2 = fd2.find(rd.uuid)
+        self.assertEqual(1, len(rd2.results))
+        history = rd2.history
+        self.assertEqual(2, len(history))
+        self.assertEqual((1, {}), history[0])
+        self.assertEqual(2, history[1][0])
+        self.assertTrue(fail.matches(history[1][1]['some-task']))
+
     def test_retry_detail_save_intention(self):
         lb_id = uuidutils.generate_uuid()
         lb_name = 'lb-%s' % (lb_id)
@@ -16,6 +16,7 @@
 
 import contextlib
 import threading
+import time
 
 from concurrent import futures
 import testtools
@@ -37,6 +38,7 @@ from taskflow.types import graph as gr
 from taskflow.utils import eventlet_utils as eu
 from taskflow.utils import misc
 from taskflow.utils import persistence_utils as p_utils
+from taskflow.utils import threading_utils as tu
 
 
 class EngineTaskTest(utils.EngineTestBase):
@@ -162,7 +164,7 @@ class EngineLinearFlowTest(utils.EngineTestBase):
             try:
                 s = it.send(suspend_it)
                 gathered_states.append(s)
-                if s == states.WAITING:
+                if s == states.ANALYZING:
                     # Stop it before task2 runs/starts.
                     suspend_it = True
             except StopIteration:
@@ -263,6 +265,26 @@ class EngineParallelFlowTest(utils.EngineTestBase):
         result = set(self.values)
         self.assertEqual(result, set(['task1', 'task2']))
 
+    def test_parallel_flow_batch(self):
+        flow = uf.Flow('p-b').add(
+            *[utils.BatchingTask(name='task%s' % i, provides='r%s' % i,
+                                 inject={'x': i}) for i in range(0, 3)])
+        engine = self._make_engine(flow)
+        engine.run()
+        self.assertEqual({'r0': 0, 'r1': 2, 'r2': 4},
+                         engine.storage.fetch_all())
+
+    def test_parallel_flow_batch_failure(self):
+        flow = uf.Flow('p-b').add(
+            *[utils.FailingBatchingTask(name='task%s' % i, inject={'x': i})
+              for i in range(0, 3)])
+        engine = self._make_engine(flow)
+        self.assertFailuresRegexp(RuntimeError, '^Woot', engine.run)
+        self.assertEqual(states.REVERTED, engine.storage.get_flow_state())
+        for i in range(0, 3):
+            self.assertEqual(states.REVERTED,
+                             engine.storage.get_atom_state('task%s' % i))
+
     def test_parallel_revert(self):
         flow = uf.Flow('p-r-3').add(
             utils.TaskNoRequiresNoReturns(name='task1'),
@@ -561,6 +583,13 @@ class SingleThreadedEngineTest(EngineTaskTest,
         engine = taskflow.engines.load(utils.TaskNoRequiresNoReturns)
         self.assertIsInstance(engine, eng.SingleThreadedActionEngine)
 
+    def test_batch_execution(self):
+        flow = uf.Flow('p-b').add(
+            *[utils.BatchingTask(name='task%s' % i, inject={'x': i})
+              for i in range(0, 3)])
+        self._make_engine(flow).run()
+        self.assertEqual(['batch of 3'], self.values)
+
 
 class MultiThreadedEngineTest(EngineTaskTest,
                               EngineLinearFlowTest,
@@ -591,6 +620,132 @@ class MultiThreadedEngineTest(EngineTaskTest,
         finally:
             executor.shutdown(wait=True)
 
+    def test_executor_statistics(self):
+        flow = uf.Flow('p-1').add(
+            utils.SaveOrderTask(name='task1'),
+            utils.SaveOrderTask(name='task2'))
+        engine = self._make_engine(flow)
+        seen = []
+        for state in engine.run_iter():
+            if state == states.WAITING:
+                seen.append(engine.executor_statistics)
+        self.assertTrue(seen)
+        for statistics in seen:
+            self.assertIn('active_workers', statistics)
+            self.assertIn('idle_workers', statistics)
+            self.assertIn('queue_length', statistics)
+        self.assertEqual({}, engine.executor_statistics)
+
+    def test_batch_execution(self):
+        flow = uf.Flow('p-b').add(
+            *[utils.BatchingTask(name='task%s' % i, inject={'x': i})
+              for i in range(0, 3)])
+        self._make_engine(flow).run()
+        self.assertEqual(['batch of 3'], self.values)
+
+    def test_inline_tasks(self):
+        threads = {}
+
+        def inline():
+            threads['inline'] = threading.current_thread()
+
+        def pooled():
+            threads['pooled'] = threading.current_thread()
+
+        flow = uf.Flow('p-1').add(
+            task.FunctorTask(inline, inline=True),
+            task.FunctorTask(pooled))
+        self._make_engine(flow).run()
+        self.assertIs(threading.current_thread(), threads['inline'])
+        self.assertIsNot(threading.current_thread(), threads['pooled'])
+
+    def test_inline_threshold(self):
+        threads = {}
+
+        def fast():
+            threads['fast'] = threading.current_thread()
+
+        def slow():
+            threads['slow'] = threading.current_thread()
+
+        flow = uf.Flow('p-1').add(
+            task.FunctorTask(fast, name='fast'),
+            task.FunctorTask(slow, name='slow'))
+        engine_conf = {
+            'engine': 'parallel',
+            'inline_threshold': 0.1,
+        }
+        engine = taskflow.engines.load(flow, engine_conf=engine_conf,
+                                       backend=self.backend)
+        engine.compile()
+        engine.prepare()
+        engine.storage.update_atom_metadata('fast', {'duration': 0.001})
+        engine.storage.update_atom_metadata('slow', {'duration': 10.0})
+        engine.run()
+        self.assertIs(threading.current_thread(), threads['fast'])
+        self.assertIsNot(threading.current_thread(), threads['slow'])
+
+    def test_max_in_flight_priority(self):
+        tasks = [utils.SaveOrderTask(name='task%s' % i) for i in range(0, 3)]
+        for (i, t) in enumerate(tasks):
+            t.priority = i
+        flow = uf.Flow('p-1').add(*tasks)
+        engine_conf = {
+            'engine': 'parallel',
+            'max_in_flight': 1,
+        }
+        engine = taskflow.engines.load(flow, engine_conf=engine_conf,
+                                       backend=self.backend)
+        engine.run()
+        self.assertEqual(['task2', 'task1', 'task0'], self.values)
+
+    def test_max_in_flight_flow(self):
+        lock = threading.Lock()
+        counts = {'running': 0, 'max_running': 0}
+
+        class CountingTask(task.Task):
+            def execute(self):
+                with lock:
+                    counts['running'] += 1
+                    counts['max_running'] = max(counts['running'],
+                                                counts['max_running'])
+                time.sleep(0.01)
+                with lock:
+                    counts['running'] -= 1
+
+        flow = uf.Flow('p-1').add(
+            *[CountingTask(name='task%s' % i) for i in range(0, 10)])
+        flow.max_in_flight = 2
+        engine = self._make_engine(flow)
+        engine.run()
+        self.assertEqual(states.SUCCESS, engine.storage.get_flow_state())
+        self.assertLessEqual(counts['max_running'], 2)
+
+    def test_shared_executor(self):
+        self.addCleanup(tu.shutdown_shared_executor, 'test-shared')
+        flow = uf.Flow('p-1').add(
+            utils.SaveOrderTask(name='task1'),
+            utils.SaveOrderTask(name='task2'))
+        engine_conf = {
+            'engine': 'parallel',
+            'shared_executor': 'test-shared',
+            'shared_executor_limit': 1,
+        }
+        for _i in range(0, 2):
+            engine = taskflow.engines.load(flow, engine_conf=engine_conf,
+                                           backend=self.backend)
+            seen = []
+            for state in engine.run_iter():
+                if state == states.WAITING:
+                    seen.append(engine.executor_statistics)
+            self.assertEqual(states.SUCCESS, engine.storage.get_flow_state())
+            for statistics in seen:
+                self.assertEqual(1, statistics['clients'])
+                self.assertLessEqual(statistics['client_active_workers'], 1)
+        shared = tu.fetch_shared_executor('test-shared')
+        self.assertEqual(0, shared.statistics['clients'])
+        self.assertTrue(shared.alive)
+
 
 @testtools.skipIf(not eu.EVENTLET_AVAILABLE, 'eventlet is not available')
 class ParallelEngineWithEventletTest(EngineTaskTest,
@@ -15,6 +15,7 @@
 #    under the License.
 
 import contextlib
+import json
 import threading
 
 from taskflow import exceptions
@@ -48,13 +49,14 @@ class StorageTestMixin(object):
         for t in threads:
             t.join()
 
-    def _get_storage(self, flow_detail=None, threaded=False):
+    def _get_storage(self, flow_detail=None, threaded=False, **kwargs):
         if flow_detail is None:
             _lb, flow_detail = p_utils.temporary_flow_detail(self.backend)
         storage_cls = storage.SingleThreadedStorage
         if threaded:
             storage_cls = storage.MultiThreadedStorage
-        return storage_cls(flow_detail=flow_detail, backend=self.backend)
+        return storage_cls(flow_detail=flow_detail, backend=self.backend,
+                           **kwargs)
 
     def test_non_saving_storage(self):
         _lb, flow_detail = p_utils.temporary_flow_detail(self.backend)
@@ -347,6 +349,67 @@ class StorageTestMixin(object):
         self.assertEqual(s.fetch_mapped_args({'viking': 'spam'}),
                          {'viking': 'eggs'})
 
+    def test_fetch_mapped_args_plan_reused(self):
+        s = self._get_storage()
+        s.ensure_task('a', result_mapping={'x': None})
+        s.ensure_task('b')
+        s.save('a', 1)
+        args_mapping = {'y': 'x'}
+        self.assertEqual(s.fetch_mapped_args(args_mapping, atom_name='b'),
+                         {'y': 1})
+        with mock.patch.object(s, '_locate') as mocked_locate:
+            self.assertEqual(
+                s.fetch_mapped_args(args_mapping, atom_name='b'), {'y': 1})
+        self.assertFalse(mocked_locate.called)
+
+    def test_fetch_mapped_args_plan_invalidated(self):
+        s = self._get_storage()
+        s.ensure_task('a', result_mapping={'x': None})
+        s.ensure_task('b')
+        s.save('a', 1)
+        args_mapping = {'y': 'x'}
+        self.assertEqual(s.fetch_mapped_args(args_mapping, atom_name='b'),
+                         {'y': 1})
+        s.save('a', 2)
+        self.assertEqual(s.fetch_mapped_args(args_mapping, atom_name='b'),
+                         {'y': 2})
+        s.ensure_task('c', result_mapping={'x': None})
+        s.save('c', 3)
+        self.assertEqual(s.fetch_mapped_args(args_mapping, atom_name='b'),
+                         {'y': 3})
+        s.reset('c')
+        self.assertRaises(exceptions.NotFound,
+                          s.fetch_mapped_args, args_mapping, atom_name='b')
+        s.inject_atom_args('b', {'x': 4})
+        self.assertEqual(s.fetch_mapped_args(args_mapping, atom_name='b'),
+                         {'y': 4})
+
+    def test_fetch_mapped_args_plan_saved_under_plans_lock(self):
+        s = self._get_storage()
+        s.inject({'x': 1})
+        s.ensure_task('b')
+        args_mapping = {'y': 'x'}
+        s._fetch_plans_lock = mock.MagicMock(wraps=s._fetch_plans_lock)
+        self.assertEqual(s.fetch_mapped_args(args_mapping, atom_name='b'),
+                         {'y': 1})
+        self.assertEqual(1, s._fetch_plans_lock.__enter__.call_count)
+        self.assertEqual(s.fetch_mapped_args(args_mapping, atom_name='b'),
+                         {'y': 1})
+        self.assertEqual(1, s._fetch_plans_lock.__enter__.call_count)
+
+    def test_fetch_mapped_args_plan_copied(self):
+        s = self._get_storage()
+        s.inject({'x': 1})
+        s.ensure_task('b')
+        args_mapping = {'y': 'x'}
+        args = s.fetch_mapped_args(args_mapping, atom_name='b')
+        args['y'] = 2
+        self.assertEqual(s.fetch_mapped_args(args_mapping, atom_name='b'),
+                         {'y': 1})
+        s.inject({'x': 3})
+        self.assertEqual(s.fetch_mapped_args(args_mapping, atom_name='b'),
+                         {'y': 3})
+
     def test_fetch_not_found_args(self):
         s = self._get_storage()
         s.inject({'foo': 'bar', 'spam': 'eggs'})
@@ -500,6 +563,43 @@ class StorageTestMixin(object):
         self.assertEqual(s.fetch_all(), {'x': 'b'})
         self.assertEqual(s.fetch('x'), 'b')
 
+    def test_save_retry_results_compacted(self):
+        s = self._get_storage()
+        s.ensure_retry('my retry', history_limit=2)
+        s.save('my retry', 'a')
+        a_failure = misc.Failure.from_exception(RuntimeError('Woot!'))
+        s.save_retry_failure('my retry', 'my task', a_failure)
+        s.save('my retry', 'b')
+        s.save('my retry', 'c')
+        history = s.get_retry_history('my retry')
+        self.assertEqual(history, [('a', {}), ('b', {}), ('c', {})])
+        ad = s._atomdetail_by_name('my retry')
+        self.assertEqual(ad.results, [('b', {}), ('c', {})])
+        self.assertEqual(ad.meta['compacted_results'], ['a'])
+        self.assertEqual(ad.meta['compacted_count'], 1)
+        s.cleanup_retry_history('my retry', states.REVERTED)
+        self.assertEqual(s.get_retry_history('my retry'), [])
+        self.assertNotIn('compacted_count', ad.meta)
+
+    def test_save_retry_results_compacted_bounded(self):
+        s = self._get_storage()
+        s.ensure_retry('my retry', history_limit=2)
+        a_failure = misc.Failure.from_exception(RuntimeError('Woot!'))
+        sizes = []
+        for i in range(0, 100):
+            s.save('my retry', 'result-%03d' % i)
+            s.save_retry_failure('my retry', 'my task', a_failure)
+            ad = s._atomdetail_by_name('my retry')
+            sizes.append(len(json.dumps(ad.to_dict())))
+        # Only the compacted count grows (by a digit or so).
+        self.assertLessEqual(max(sizes), sizes[10] + 2)
+        history = s.get_retry_history('my retry')
+        self.assertEqual(100, len(history))
+        self.assertEqual([(None, {})] * 96, history[0:96])
+        self.assertEqual(['result-096', 'result-097',
+                          'result-098', 'result-099'],
+                         [r for (r, _failures) in history[96:]])
+
     def test_cleanup_retry_history(self):
         s = self._get_storage()
         s.ensure_retry('my retry', result_mapping={'x': 0})
@@ -540,6 +640,94 @@ class StorageTestMixin(object):
         intention = s.get_atom_intention('my retry')
         self.assertEqual(intention, states.RETRY)
 
+    def test_write_behind_batches_saves(self):
+        lb, flow_detail = p_utils.temporary_flow_detail(self.backend)
+        s = self._get_storage(flow_detail, write_behind=True)
+        s.ensure_task('my task')
+        with mock.patch.object(s, '_save_atom_detail') as mocked_save:
+            s.set_atom_state('my task', states.RUNNING)
+            s.save('my task', 5)
+            self.assertTrue(s.dirty)
+            s.flush()
+            self.assertFalse(s.dirty)
+        self.assertFalse(mocked_save.called)
+        with contextlib.closing(self.backend.get_connection()) as conn:
+            fd = conn.get_logbook(lb.uuid).find(flow_detail.uuid)
+        s2 = self._get_storage(fd)
+        self.assertEqual(s2.get_atom_state('my task'), states.SUCCESS)
+        self.assertEqual(s2.get('my task'), 5)
+
+    def test_write_behind_flushed_on_flow_state_change(self):
+        s = self._get_storage(write_behind=True)
+        s.ensure_task('my task')
+        s.set_atom_state('my task', states.RUNNING)
+        self.assertTrue(s.dirty)
+        s.set_flow_state(states.SUSPENDED)
+        self.assertFalse(s.dirty)
+
+    def test_write_behind_flush_interval(self):
+        s = self._get_storage(write_behind=True, flush_interval=0.0)
+        s.ensure_task('my task')
+        with mock.patch.object(s._flush_watch, 'expired', return_value=True):
+            s.set_atom_state('my task', states.RUNNING)
+        self.assertFalse(s.dirty)
+
+    def test_write_behind_without_backend(self):
+        _lb, flow_detail = p_utils.temporary_flow_detail(self.backend)
+        s = storage.SingleThreadedStorage(flow_detail=flow_detail,
+                                          write_behind=True)
+        s.ensure_task('my task')
+        s.set_atom_state('my task', states.RUNNING)
+        self.assertFalse(s.dirty)
+        s.flush()
+
+    def test_connection_reused(self):
+        s = self._get_storage()
+        with mock.patch.object(self.backend, 'get_connection',
+                               wraps=self.backend.get_connection) as m:
+            s.ensure_task('my task')
+            s.set_atom_state('my task', states.RUNNING)
+            s.save('my task', 5)
+            s.set_flow_state(states.RUNNING)
+        self.assertEqual(1, m.call_count)
+
+    def test_connection_per_thread(self):
+        s = self._get_storage(threaded=True)
+        s.ensure_task('my task')
+
+        def save_state():
+            s.set_atom_state('my task', states.RUNNING)
+
+        with mock.patch.object(self.backend, 'get_connection',
+                               wraps=self.backend.get_connection) as m:
+            self._run_many_threads([threading.Thread(target=save_state)
+                                    for _i in range(0, 2)])
+        self.assertEqual(2, m.call_count)
+
+    def test_reconnect_on_failure(self):
+        s = self._get_storage()
+        s.ensure_task('my task')
+        broken_conn = mock.Mock()
+        broken_conn.update_atom_details.side_effect = \
+            exceptions.StorageFailure("Woot!")
+        s._connection_holder.connection = broken_conn
+        s._connection_holder.generation = s._connections_generation
+        s._connections.append(broken_conn)
+        s.set_atom_state('my task', states.RUNNING)
+        self.assertTrue(broken_conn.close.called)
+        self.assertIsNot(broken_conn, s._connection_holder.connection)
+        self.assertEqual(states.RUNNING, s.get_atom_state('my task'))
+
+    def test_close_connections(self):
+        s = self._get_storage()
+        s.ensure_task('my task')
+        conn = s._connection_holder.connection
+        with mock.patch.object(conn, 'close') as mocked_close:
+            s.close()
+        self.assertTrue(mocked_close.called)
+        s.set_atom_state('my task', states.RUNNING)
+        self.assertIsNot(conn, s._connection_holder.connection)
+
 
 class StorageMemoryTest(StorageTestMixin, test.TestCase):
     def setUp(self):
@@ -21,6 +21,7 @@ import six
 
 from taskflow import exceptions as excp
 from taskflow import test
+from taskflow.types import cache
 from taskflow.types import fsm
 from taskflow.types import graph
 from taskflow.types import table
@@ -325,3 +326,94 @@ class FSMTest(test.TestCase):
         m.add_state('broken')
         self.assertRaises(AssertionError, m.add_state, 'b', on_enter=2)
         self.assertRaises(AssertionError, m.add_state, 'b', on_exit=2)
+
+
+class _Expirable(object):
+    def __init__(self, expires_in=None):
+        self.expired = False
+        self.expires_in = expires_in
+
+
+class ExpiringCacheTest(test.TestCase):
+    def test_cleanup(self):
+        c = cache.ExpiringCache()
+        c['a'] = _Expirable(0)
+        c['b'] = _Expirable(0)
+        c['c'] = _Expirable(0)
+        c['a'].expired = True
+        c['c'].expired = True
+        expired = []
+        c.cleanup(lambda k, v: expired.append(k))
+        self.assertEqual(['a', 'c'], expired)
+        self.assertEqual(1, len(c))
+        self.assertIsNotNone(c.get('b'))
+
+    def test_cleanup_not_yet_expirable(self):
+        c = cache.ExpiringCache()
+        value = _Expirable(60)
+        c['a'] = value
+        value.expired = True
+        c.cleanup()
+        self.assertIs(value, c.get('a'))
+
+    def test_cleanup_never_expires(self):
+        c = cache.ExpiringCache()
+        c['a'] = _Expirable(0)
+        c.cleanup()
+        c['a'].expires_in = None
+        c.cleanup()
+        c['a'].expired = True
+        c.cleanup()
+        self.assertEqual(1, len(c))
+
+    def test_cleanup_replaced_and_deleted(self):
+        c = cache.ExpiringCache()
+        c['a'] = _Expirable(0)
+        c['a'] = _Expirable(60)
+        c['b'] = _Expirable(0)
+        del c['b']
+        c['a'].expired = True
+        c.cleanup()
+        self.assertEqual(1, len(c))
+
+    def test_cleanup_unscheduled(self):
+        c = cache.ExpiringCache()
+        value = _Expirable()
+        del value.expires_in
+        c['a'] = value
+        c.cleanup()
+        self.assertEqual(1, len(c))
+        value.expired = True
+        expired = []
+        c.cleanup(expired.append)
+        self.assertEqual([value], expired)
+        self.assertEqual(0, len(c))
+
+
+class LRUCacheTest(test.TestCase):
+    def test_eviction(self):
+        c = cache.LRUCache(2)
+        c['a'] = 1
+        c['b'] = 2
+        self.assertEqual(1, c.get('a'))
+        c['c'] = 3
+        self.assertEqual(2, len(c))
+        self.assertIsNone(c.get('b'))
+        self.assertEqual(1, c.get('a'))
+        self.assertEqual(3, c.get('c'))
+
+    def test_counters(self):
+        c = cache.LRUCache(1)
+        c['a'] = 1
+        c.get('a')
+        c.get('b')
+        c.get('b', 2)
+        self.assertEqual(1, c.hits)
+        self.assertEqual(2, c.misses)
+        c.clear()
+        self.assertEqual(0, len(c))
+        self.assertEqual(0, c.hits)
+        self.assertEqual(0, c.misses)
+
+    def test_bad_size(self):
+        self.assertRaises(ValueError, cache.LRUCache, 0)
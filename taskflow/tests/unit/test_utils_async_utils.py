@@ -20,6 +20,7 @@ import testtools
 from taskflow import test
 from taskflow.utils import async_utils as au
 from taskflow.utils import eventlet_utils as eu
+from taskflow.utils import threading_utils as tu
 
 
 class WaitForAnyTestsMixin(object):
@@ -83,6 +84,11 @@ class AsyncUtilsThreadedTest(test.TestCase,
     executor_cls = futures.ThreadPoolExecutor
 
 
+class AsyncUtilsAdaptiveThreadedTest(test.TestCase,
+                                     WaitForAnyTestsMixin):
+    executor_cls = tu.AdaptiveThreadPoolExecutor
+
+
 class MakeCompletedFutureTest(test.TestCase):
 
     def test_make_completed_future(self):
@@ -90,3 +96,70 @@ class MakeCompletedFutureTest(test.TestCase):
         future = au.make_completed_future(result)
         self.assertTrue(future.done())
         self.assertIs(future.result(), result)
+
+
+class CompletedFutureTest(test.TestCase):
+
+    def test_completed(self):
+        result = object()
+        future = au.CompletedFuture(result)
+        self.assertTrue(future.done())
+        self.assertFalse(future.running())
+        self.assertFalse(future.cancelled())
+        self.assertFalse(future.cancel())
+        self.assertIsNone(future.exception())
+        self.assertIs(future.result(), result)
+
+    def test_done_callback(self):
+        called = []
+        future = au.CompletedFuture(1)
+        future.add_done_callback(called.append)
+        self.assertEqual([future], called)
+
+    def test_wait_for_any(self):
+        f1 = au.CompletedFuture(1)
+        f2 = futures.Future()
+        done, not_done = au.wait_for_any([f1, f2], timeout=0.001)
+        self.assertEqual(set([f1]), set(done))
+        self.assertEqual(set([f2]), set(not_done))
+
+
+class CompletionQueueTest(test.TestCase):
+
+    def test_completed_in_order(self):
+        q = au.CompletionQueue()
+        f1 = futures.Future()
+        f2 = futures.Future()
+        q.watch(f1)
+        q.watch(f2)
+        self.assertEqual([], q.get(block=False))
+        f2.set_result(2)
+        f1.set_result(1)
+        self.assertEqual([f2, f1], q.get(block=False))
+        self.assertEqual([], q.get(block=False))
+
+    def test_already_completed(self):
+        q = au.CompletionQueue()
+        fut = au.make_completed_future(1)
+        q.watch(fut)
+        self.assertEqual([fut], q.get(timeout=0.001))
+
+    def test_waits_for_completion(self):
+        def foo():
+            pass
+
+        q = au.CompletionQueue()
+        with futures.ThreadPoolExecutor(2) as e:
+            fs = [e.submit(foo), e.submit(foo)]
+            for fut in fs:
+                q.watch(fut)
+            done = []
+            while len(done) != len(fs):
+                # this test assumes that our foo will end within 10 seconds
+                done.extend(q.get(timeout=10))
+        self.assertEqual(set(fs), set(done))
+
+    def test_timeout(self):
+        q = au.CompletionQueue()
+        q.watch(futures.Future())
+        self.assertEqual([], q.get(timeout=0.001))
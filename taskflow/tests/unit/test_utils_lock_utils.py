@@ -500,6 +500,29 @@ class ReadWriteLockTest(test.TestCase):
         self.assertFalse(lock.is_reader())
         self.assertFalse(lock.is_writer())
 
+    def test_double_reader_blocks_writer(self):
+        lock = lock_utils.ReaderWriterLock()
+        activated = collections.deque()
+
+        def writer_func():
+            with lock.write_lock():
+                activated.append(lock.owner)
+
+        writer = threading.Thread(target=writer_func)
+        with lock.read_lock():
+            with lock.read_lock():
+                writer.start()
+                while not lock.has_pending_writers:
+                    time.sleep(0.001)
+            # Still a reader (the outer read lock is still held), so the
+            # writer should not be able to proceed yet.
+            time.sleep(0.05)
+            self.assertEqual(0, len(activated))
+            self.assertTrue(lock.is_reader())
+        writer.join()
+        self.assertEqual(['w'], list(activated))
+        self.assertFalse(lock.is_reader())
+
     def test_multi_reader_multi_writer(self):
         writer_times, reader_times = _spawn_variation(10, 10)
         self.assertEqual(10, len(writer_times))
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2014 Yahoo! Inc. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+
+from concurrent import futures
+import testtools
+
+from taskflow import test
+from taskflow.test import mock
+from taskflow.utils import threading_utils as tu
+
+
+class AdaptiveThreadPoolExecutorTest(test.TestCase):
+    def _make_executor(self, *args, **kwargs):
+        e = tu.AdaptiveThreadPoolExecutor(*args, **kwargs)
+        self.addCleanup(e.shutdown)
+        return e
+
+    def test_bad_bounds(self):
+        self.assertRaises(ValueError, tu.AdaptiveThreadPoolExecutor,
+                          max_workers=0)
+        self.assertRaises(ValueError, tu.AdaptiveThreadPoolExecutor,
+                          min_workers=-1)
+        self.assertRaises(ValueError, tu.AdaptiveThreadPoolExecutor,
+                          min_workers=3, max_workers=2)
+
+    def test_grows_when_no_idle_workers(self):
+        release = threading.Event()
+        e = self._make_executor(max_workers=4)
+        self.assertEqual(0, e.statistics['workers'])
+        fs = [e.submit(release.wait) for _i in range(0, 6)]
+        stats = e.statistics
+        self.assertEqual(4, stats['workers'])
+        release.set()
+        futures.wait(fs, timeout=10)
+        self.assertTrue(all(f.done() for f in fs))
+        # Futures are done before the workers that ran them become idle.
+        deadline = time.time() + 10
+        stats = e.statistics
+        while stats['active_workers'] and time.time() < deadline:
+            time.sleep(0.01)
+            stats = e.statistics
+        self.assertEqual(0, stats['queue_length'])
+        self.assertEqual(0, stats['active_workers'])
+        self.assertEqual(4, stats['idle_workers'])
+        self.assertIsNotNone(stats['average_latency'])
+
+    def test_reuses_idle_workers(self):
+        e = self._make_executor(max_workers=4)
+        for _i in range(0, 10):
+            e.submit(lambda: None).result()
+        self.assertEqual(1, e.statistics['workers'])
+
+    def test_shrinks_when_idle(self):
+        release = threading.Event()
+        e = self._make_executor(min_workers=1, max_workers=4,
+                                idle_timeout=0.05)
+        fs = [e.submit(release.wait) for _i in range(0, 4)]
+        self.assertEqual(4, e.statistics['workers'])
+        release.set()
+        futures.wait(fs, timeout=10)
+        deadline = time.time() + 10
+        while e.statistics['workers'] > 1 and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(1, e.statistics['workers'])
+
+    def test_cpu_bound_limits_growth(self):
+        if tu._thread_time is None:
+            self.skipTest("thread cpu time can not be measured")
+
+        def spin():
+            started = time.time()
+            while time.time() - started < 0.01:
+                pass
+
+        e = self._make_executor(max_workers=100)
+        for _i in range(0, 5):
+            e.submit(spin).result()
+        stats = e.statistics
+        self.assertTrue(stats['cpu_bound'])
+        self.assertEqual(tu.get_optimal_thread_count(), stats['max_workers'])
+
+    def test_cpu_bound_inactive_without_thread_time(self):
+
+        def spin():
+            started = time.time()
+            while time.time() - started < 0.01:
+                pass
+
+        with mock.patch.object(tu, '_thread_time', None):
+            e = self._make_executor(max_workers=100)
+            for _i in range(0, 5):
+                e.submit(spin).result()
+            stats = e.statistics
+        self.assertFalse(stats['cpu_bound'])
+        self.assertEqual(100, stats['max_workers'])
+
+    @testtools.skipIf(tu.resource is None or
+                      not hasattr(tu.resource, 'RUSAGE_THREAD'),
+                      'thread resource usage is not available')
+    def test_rusage_thread_time(self):
+        started = tu._rusage_thread_time()
+        spin_started = time.time()
+        while time.time() - spin_started < 0.05:
+            pass
+        self.assertTrue(tu._rusage_thread_time() > started)
+
+    def test_shutdown_finishes_queued_work(self):
+        release = threading.Event()
+        e = tu.AdaptiveThreadPoolExecutor(max_workers=1)
+        fs = [e.submit(release.wait, 10) for _i in range(0, 3)]
+        release.set()
+        e.shutdown(wait=True)
+        self.assertTrue(all(f.done() for f in fs))
+        self.assertRaises(RuntimeError, e.submit, lambda: None)
+        self.assertFalse(e.alive)
+
+    def test_exception_propagated(self):
+        e = self._make_executor()
+
+        def boom():
+            raise IOError("Woot!")
+
+        self.assertRaises(IOError, e.submit(boom).result)
+
+
+class SharedThreadPoolExecutorTest(test.TestCase):
+    def _make_executor(self, *args, **kwargs):
+        e = tu.SharedThreadPoolExecutor(*args, **kwargs)
+        self.addCleanup(e.shutdown)
+        return e
+
+    def test_attach_and_detach(self):
+        e = self._make_executor(min_workers=1, max_workers=2)
+        client = e.attach()
+        self.assertEqual(1, e.statistics['clients'])
+        self.assertEqual(4, client.submit(lambda: 4).result())
+        client.shutdown()
+        self.assertEqual(0, e.statistics['clients'])
+        self.assertTrue(e.alive)
+        self.assertRaises(RuntimeError, client.submit, lambda: None)
+        self.assertRaises(RuntimeError, e.submit, lambda: None)
+
+    def test_fair_between_clients(self):
+        release = threading.Event()
+        order = []
+        e = self._make_executor(min_workers=1, max_workers=1)
+        c1 = e.attach()
+        c2 = e.attach()
+        blocker = c1.submit(release.wait, 10)
+        fs = [c1.submit(order.append, 'c1') for _i in range(0, 3)]
+        fs.extend(c2.submit(order.append, 'c2') for _i in range(0, 3))
+        release.set()
+        futures.wait([blocker] + fs, timeout=10)
+        # The work of each client was ran in turn (and not all of the first
+        # clients work before the second clients).
+        self.assertEqual(6, len(order))
+        for (prior, current) in zip(order, order[1:]):
+            self.assertNotEqual(prior, current)
+
+    def test_admission_limit(self):
+        release = threading.Event()
+        e = self._make_executor(min_workers=1, max_workers=4)
+        limited = e.attach(max_workers=1)
+        fs = [limited.submit(release.wait, 10) for _i in range(0, 3)]
+        deadline = time.time() + 10
+        statistics = limited.statistics
+        while (statistics['client_active_workers'] != 1 and
+               time.time() < deadline):
+            time.sleep(0.01)
+            statistics = limited.statistics
+        self.assertEqual(1, statistics['client_active_workers'])
+        self.assertEqual(2, statistics['client_queue_length'])
+        self.assertEqual(2, statistics['held_back'])
+        # Other clients are not held back by the limited one.
+        other = e.attach()
+        self.assertEqual(1, other.submit(lambda: 1).result(timeout=10))
+        release.set()
+        futures.wait(fs, timeout=10)
+        self.assertTrue(all(f.done() for f in fs))
+
+    def test_detach_waits(self):
+        release = threading.Event()
+        e = self._make_executor(min_workers=1, max_workers=1)
+        client = e.attach()
+        fs = [client.submit(release.wait, 10) for _i in range(0, 2)]
+        threading.Timer(0.05, release.set).start()
+        client.shutdown(wait=True)
+        self.assertTrue(all(f.done() for f in fs))
+
+    def test_shutdown_runs_held_back_work(self):
+        release = threading.Event()
+        e = self._make_executor(min_workers=2, max_workers=2)
+        limited = e.attach(max_workers=1)
+        fs = [limited.submit(release.wait, 10) for _i in range(0, 3)]
+        threading.Timer(0.05, release.set).start()
+        e.shutdown(wait=True)
+        self.assertTrue(all(f.done() and not f.cancelled() for f in fs))
+
+    def test_shutdown_cancels_work_left_behind(self):
+        e = self._make_executor(min_workers=1, max_workers=1)
+        limited = e.attach(max_workers=1)
+        # Simulate work that was held back (behind work that is in flight)
+        # but that no worker is left to run.
+        limited.in_flight = 1
+        work = tu._WorkItem(futures.Future(), lambda: None, (), {},
+                            owner=limited)
+        with e._cond:
+            e._work.append(work)
+            e._workers.clear()
+        e.shutdown(wait=True)
+        self.assertTrue(work.future.cancelled())
+        self.assertEqual(0, e.statistics['held_back'])
+
+    def test_fetch_shared_executor(self):
+        self.addCleanup(tu.shutdown_shared_executor, 'test')
+        e = tu.fetch_shared_executor('test', min_workers=1, max_workers=2)
+        self.assertIs(e, tu.fetch_shared_executor('test'))
+        tu.shutdown_shared_executor('test')
+        self.assertFalse(e.alive)
+        self.assertIsNot(e, tu.fetch_shared_executor('test'))
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2014 Yahoo! Inc. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+
+from taskflow.engines.worker_based import blobs
+from taskflow import exceptions as excp
+from taskflow import test
+from taskflow.test import mock
+
+
+class TestDirectoryBlobStore(test.TestCase):
+
+    def setUp(self):
+        super(TestDirectoryBlobStore, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.store = blobs.DirectoryBlobStore(self.path)
+
+    def test_put_get(self):
+        key = self.store.put(b'data')
+        self.assertEqual(blobs.BlobStore.make_key(b'data'), key)
+        self.assertEqual(b'data', self.store.get(key))
+
+    def test_put_same_data(self):
+        key = self.store.put(b'data')
+        self.assertEqual(key, self.store.put(b'data'))
+        self.assertEqual([key], os.listdir(os.path.join(self.path, key[0:2])))
+
+    def test_get_missing(self):
+        key = blobs.BlobStore.make_key(b'data')
+        self.assertRaises(excp.NotFound, self.store.get, key)
+
+    def test_get_invalid_key(self):
+        self.assertRaises(ValueError, self.store.get, '../../etc/passwd')
+
+    def test_offload(self):
+        value = {'manifest': ['a' * 10] * 10}
+        self.assertIsNone(blobs.offload(self.store, value, threshold=1024))
+        key = blobs.offload(self.store, value, threshold=10)
+        self.assertIsNotNone(key)
+        self.assertEqual(value, blobs.load(self.store, key))
+
+    def test_offload_small_not_encoded(self):
+        value = {'manifest': ['a' * 10] * 10, 'size': 10, 'ok': True}
+        with mock.patch.object(blobs.jsonutils, 'dumps') as dumps:
+            self.assertIsNone(blobs.offload(self.store, value,
+                                            threshold=4096))
+        self.assertFalse(dumps.called)
+
+    def test_estimate_size(self):
+        values = [
+            None, True, 1.5, -10, u'\u2603' * 10, 'a"b\\c',
+            {'a': [1, 2, {'b': None}]}, ['x', ('y', 'z')],
+        ]
+        for value in values:
+            actual = len(blobs.jsonutils.dumps(value))
+            self.assertTrue(blobs._estimate_size(value, 4096) >= actual)
+        self.assertEqual(10, blobs._estimate_size(['a' * 100], 10))
+        self.assertEqual(10, blobs._estimate_size(object(), 10))
+
+    def test_fetch_store(self):
+        self.assertIsNone(blobs.fetch_store(None))
+        self.assertIs(self.store, blobs.fetch_store(self.store))
+        store = blobs.fetch_store(self.path)
+        self.assertIsInstance(store, blobs.DirectoryBlobStore)
+        self.assertEqual(self.path, store.path)
+        self.assertRaises(TypeError, blobs.fetch_store, 1)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2014 Yahoo! Inc. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from taskflow.engines.worker_based import cache
+from taskflow.engines.worker_based import protocol as pr
+from taskflow import test
+from taskflow.test import mock
+from taskflow.tests import utils
+from taskflow.types import timing as tt
+from taskflow.utils import reflection
+
+
+class TestRequestsCache(test.TestCase):
+
+    def setUp(self):
+        super(TestRequestsCache, self).setUp()
+        self.cache = cache.RequestsCache()
+        self.task_cls = reflection.get_class_name(utils.DummyTask)
+
+    def request(self, uuid, task=None, timeout=60):
+        if task is None:
+            task = utils.DummyTask()
+        return pr.Request(task, uuid, pr.EXECUTE, {}, None, timeout)
+
+    def test_get_waiting_requests(self):
+        request = self.request('a')
+        self.cache['a'] = request
+        self.assertEqual([request],
+                         self.cache.get_waiting_requests([self.task_cls]))
+        self.assertEqual([], self.cache.get_waiting_requests(['other']))
+
+    def test_get_waiting_requests_not_waiting(self):
+        request = self.request('a')
+        request.transition(pr.PENDING)
+        self.cache['a'] = request
+        self.assertEqual([], self.cache.get_waiting_requests([self.task_cls]))
+
+        request = self.request('b')
+        self.cache['b'] = request
+        request.transition(pr.PENDING)
+        self.assertEqual([], self.cache.get_waiting_requests([self.task_cls]))
+        self.assertEqual(2, len(self.cache))
+
+    def test_get_waiting_requests_removed(self):
+        self.cache['a'] = self.request('a')
+        del self.cache['a']
+        self.assertEqual([], self.cache.get_waiting_requests([self.task_cls]))
+
+    def test_cleanup_expired(self):
+        self.cache['a'] = self.request('a', timeout=0)
+        self.cache['b'] = self.request('b')
+        expired = []
+        self.cache.cleanup(expired.append)
+        self.assertEqual(['a'], [r.uuid for r in expired])
+        self.assertEqual(['b'], [r.uuid for r in
+                                 self.cache.get_waiting_requests(
+                                     [self.task_cls])])
+
+
+class TestWorkersCache(test.TestCase):
+
+    def setUp(self):
+        super(TestWorkersCache, self).setUp()
+        self.cache = cache.WorkersCache()
+
+    def test_get_topic_by_task(self):
+        self.cache['topic1'] = ['a', 'b']
+        self.cache['topic2'] = ['b']
+        self.assertEqual('topic1', self.cache.get_topic_by_task('a'))
+        self.assertIn(self.cache.get_topic_by_task('b'), ['topic1', 'topic2'])
+        self.assertIsNone(self.cache.get_topic_by_task('c'))
+
+    def test_get_topic_by_task_updated(self):
+        self.cache['topic1'] = ['a']
+        self.cache['topic1'] = ['b']
+        self.assertIsNone(self.cache.get_topic_by_task('a'))
+        self.assertEqual('topic1', self.cache.get_topic_by_task('b'))
+        del self.cache['topic1']
+        self.assertIsNone(self.cache.get_topic_by_task('b'))
+
+    def test_get_topic_by_task_least_loaded(self):
+        self.cache['topic1'] = ['a']
+        self.cache['topic2'] = ['a']
+        self.cache.update_load('topic1', in_flight=4, capacity=2)
+        self.cache.update_load('topic2', in_flight=4, capacity=8)
+        for _i in range(0, 10):
+            self.assertEqual('topic2', self.cache.get_topic_by_task('a'))
+
+    def test_get_topic_by_task_outstanding(self):
+        self.cache['topic1'] = ['a']
+        self.cache['topic2'] = ['a']
+        self.cache.on_sent('topic1', 'uuid1')
+        for _i in range(0, 10):
+            self.assertEqual('topic2', self.cache.get_topic_by_task('a'))
+        self.cache.on_finished('uuid1')
+        self.cache.on_sent('topic2', 'uuid2')
+        for _i in range(0, 10):
+            self.assertEqual('topic1', self.cache.get_topic_by_task('a'))
+
+    def test_get_topic_by_task_slow(self):
+        self.cache['topic1'] = ['a']
+        self.cache['topic2'] = ['a']
+        self.cache.on_sent('topic1', 'uuid1')
+        self.cache.on_sent('topic2', 'uuid2')
+        with mock.patch.object(tt.StopWatch, 'elapsed', return_value=10.0):
+            self.cache.on_running('uuid1')
+        with mock.patch.object(tt.StopWatch, 'elapsed', return_value=0.1):
+            self.cache.on_running('uuid2')
+        # The fast workers are picked even though they are busier.
+        self.cache.on_finished('uuid1')
+        for _i in range(0, 10):
+            self.assertEqual('topic2', self.cache.get_topic_by_task('a'))
@@ -46,7 +46,11 @@ class TestWorkerBasedActionEngine(test.MockTestCase):
                                      topics=[],
                                      transport=None,
                                      transport_options=None,
-                                     transition_timeout=mock.ANY)
+                                     transition_timeout=mock.ANY,
+                                     serializers=None,
+                                     compression_threshold=None,
+                                     blob_store=None,
+                                     blob_threshold=None)
         ]
         self.assertEqual(self.master_mock.mock_calls, expected_calls)
 
@@ -55,7 +59,9 @@ class TestWorkerBasedActionEngine(test.MockTestCase):
         _, flow_detail = pu.temporary_flow_detail()
         config = {'url': self.broker_url, 'exchange': self.exchange,
                   'topics': self.topics, 'transport': 'memory',
-                  'transport_options': {}, 'transition_timeout': 200}
+                  'transport_options': {}, 'transition_timeout': 200,
+                  'serializers': ['json'], 'compression_threshold': 1024,
+                  'blob_store': '/tmp/blobs', 'blob_threshold': 2048}
         engine.WorkerBasedActionEngine(
             flow, flow_detail, None, config).compile()
 
@@ -66,6 +72,10 @@ class TestWorkerBasedActionEngine(test.MockTestCase):
                                      topics=self.topics,
                                      transport='memory',
                                      transport_options={},
-                                     transition_timeout=200)
+                                     transition_timeout=200,
+                                     serializers=['json'],
+                                     compression_threshold=1024,
+                                     blob_store='/tmp/blobs',
+                                     blob_threshold=2048)
         ]
         self.assertEqual(self.master_mock.mock_calls, expected_calls)
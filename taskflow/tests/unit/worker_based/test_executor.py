@@ -14,14 +14,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import shutil
+import tempfile
 import threading
 import time
 
 from concurrent import futures
 from oslo.utils import timeutils
 
+from taskflow.engines.worker_based import blobs
 from taskflow.engines.worker_based import executor
 from taskflow.engines.worker_based import protocol as pr
+from taskflow import exceptions as exc
 from taskflow import test
 from taskflow.test import mock
 from taskflow.tests import utils
@@ -55,6 +59,7 @@ class TestWorkerTaskExecutor(test.MockTestCase):
         self.proxy_inst_mock.stop.side_effect = self._fake_proxy_stop
         self.request_inst_mock.uuid = self.task_uuid
         self.request_inst_mock.expired = False
+        self.request_inst_mock.expires_in = self.timeout
         self.request_inst_mock.task_cls = self.task.name
         self.wait_for_any_mock = self.patch(
             'taskflow.engines.worker_based.executor.async_utils.wait_for_any')
@@ -138,6 +143,37 @@ class TestWorkerTaskExecutor(test.MockTestCase):
         ]
         self.assertEqual(expected_calls, self.request_inst_mock.mock_calls)
 
+    def _make_blob_store(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        return blobs.DirectoryBlobStore(path)
+
+    def test_on_message_response_result_blob(self):
+        store = self._make_blob_store()
+        key = blobs.offload(store, self.task_result, threshold=0)
+        response = pr.Response(pr.SUCCESS, result=None, result_blob=key)
+        ex = self.executor(blob_store=store)
+        ex._requests_cache[self.task_uuid] = self.request_inst_mock
+        ex._process_response(response.to_dict(), self.message_mock)
+
+        expected_calls = [
+            mock.call.transition_and_log_error(pr.SUCCESS, logger=mock.ANY),
+            mock.call.set_result(result=self.task_result)
+        ]
+        self.assertEqual(expected_calls, self.request_inst_mock.mock_calls)
+
+    def test_on_message_response_result_blob_missing(self):
+        store = self._make_blob_store()
+        key = blobs.BlobStore.make_key(b'missing')
+        response = pr.Response(pr.SUCCESS, result=None, result_blob=key)
+        ex = self.executor(blob_store=store)
+        ex._requests_cache[self.task_uuid] = self.request_inst_mock
+        ex._process_response(response.to_dict(), self.message_mock)
+
+        result = self.request_inst_mock.set_result.call_args[1]['result']
+        self.assertIsInstance(result, misc.Failure)
+        self.assertTrue(result.check(exc.NotFound))
+
     def test_on_message_response_unknown_state(self):
         response = pr.Response(state='<unknown>')
         ex = self.executor()
@@ -175,6 +211,7 @@ class TestWorkerTaskExecutor(test.MockTestCase):
     def test_on_wait_task_expired(self):
         now = timeutils.utcnow()
         self.request_inst_mock.expired = True
+        self.request_inst_mock.expires_in = 0
         self.request_inst_mock.created_on = now
         timeutils.set_time_override(now)
         self.addCleanup(timeutils.clear_time_override)
@@ -243,6 +280,50 @@ class TestWorkerTaskExecutor(test.MockTestCase):
         ]
         self.assertEqual(expected_calls, self.master_mock.mock_calls)
 
+    def test_execute_task_negotiated_serializer(self):
+        self.message_mock.properties['type'] = pr.NOTIFY
+        notify = pr.Notify(topic=self.executor_topic, tasks=[self.task.name],
+                           serializers=['json', 'msgpack'])
+        ex = self.executor(serializers=['msgpack', 'json'])
+        ex._process_notify(notify.to_dict(), self.message_mock)
+        ex.execute_task(self.task, self.task_uuid, self.task_args)
+
+        expected_calls = [
+            mock.call.Request(self.task, self.task_uuid, 'execute',
+                              self.task_args, None, self.timeout),
+            mock.call.request.transition_and_log_error(pr.PENDING,
+                                                       logger=mock.ANY),
+            mock.call.proxy.publish(msg=self.request_inst_mock,
+                                    routing_key=self.executor_topic,
+                                    reply_to=self.executor_uuid,
+                                    correlation_id=self.task_uuid,
+                                    serializer='msgpack')
+        ]
+        self.assertEqual(expected_calls, self.master_mock.mock_calls)
+
+    def test_execute_task_offloads_arguments(self):
+        store = self._make_blob_store()
+        ex = self.executor(blob_store=store, blob_threshold=100)
+        ex.execute_task(self.task, self.task_uuid,
+                        {'a': 'a', 'big': 'b' * 100})
+
+        (args, kwargs) = self.request_mock.call_args
+        self.assertEqual({'a': 'a', 'big': None}, args[3])
+        key = kwargs['blobs']['arguments']['big']
+        self.assertEqual('b' * 100, blobs.load(store, key))
+
+    def test_revert_task_offloads_result(self):
+        store = self._make_blob_store()
+        ex = self.executor(blob_store=store, blob_threshold=100)
+        ex.revert_task(self.task, self.task_uuid, self.task_args,
+                       'r' * 100, self.task_failures)
+
+        (args, kwargs) = self.request_mock.call_args
+        self.assertEqual(self.task_args, args[3])
+        self.assertIsNone(kwargs['result'])
+        key = kwargs['blobs']['result']
+        self.assertEqual('r' * 100, blobs.load(store, key))
+
     def test_execute_task_topic_not_found(self):
         workers_info = {self.executor_topic: ['<unknown>']}
         ex = self.executor(workers_info=workers_info)
@@ -277,6 +358,113 @@ class TestWorkerTaskExecutor(test.MockTestCase):
         ]
         self.assertEqual(expected_calls, self.master_mock.mock_calls)
 
+    def test_notify_topics(self):
+        ex = self.executor()
+        ex._notify_topics()
+
+        master_mock_calls = [
+            mock.call.proxy.publish(
+                mock.ANY, [self.executor_topic],
+                reply_to=self.executor_uuid,
+                headers={pr.NOTIFY_FIELDS_HEADER: list(pr.NOTIFY_FIELDS)}),
+        ]
+        self.assertEqual(master_mock_calls, self.master_mock.mock_calls)
+
+    def test_process_notify_load(self):
+        ex = self.executor()
+        notify = pr.Notify(topic=self.executor_topic, tasks=[self.task.name],
+                           in_flight=3, capacity=2)
+        ex._process_notify(notify.to_dict(), self.message_mock)
+
+        stats = ex._workers_cache._stats[self.executor_topic]
+        self.assertEqual(3, stats.in_flight)
+        self.assertEqual(2, stats.capacity)
+
+    def test_outstanding_requests(self):
+        ex = self.executor()
+        ex._workers_cache[self.executor_topic] = [self.task.name]
+        ex.execute_task(self.task, self.task_uuid, self.task_args)
+        stats = ex._workers_cache._stats[self.executor_topic]
+        self.assertEqual(1, stats.outstanding)
+
+        ex._requests_cache[self.task_uuid] = self.request_inst_mock
+        response = pr.Response(pr.RUNNING)
+        ex._process_response(response.to_dict(), self.message_mock)
+        self.assertIsNotNone(stats.latency)
+        response = pr.Response(pr.SUCCESS, result=self.task_result,
+                               event='executed')
+        ex._process_response(response.to_dict(), self.message_mock)
+        self.assertEqual(0, stats.outstanding)
+
+    def test_process_notify_publishes_waiting_requests(self):
+        self.message_mock.properties['type'] = pr.NOTIFY
+        self.request_inst_mock.state = pr.WAITING
+        ex = self.executor()
+        ex.execute_task(self.task, self.task_uuid, self.task_args)
+        notify = pr.Notify(topic=self.executor_topic, tasks=[self.task.name])
+        ex._process_notify(notify.to_dict(), self.message_mock)
+
+        expected_calls = [
+            mock.call.Request(self.task, self.task_uuid, 'execute',
+                              self.task_args, None, self.timeout),
+            mock.call.request.transition_and_log_error(pr.PENDING,
+                                                       logger=mock.ANY),
+            mock.call.proxy.publish_many([
+                (self.request_inst_mock, self.executor_topic,
+                 dict(reply_to=self.executor_uuid,
+                      correlation_id=self.task_uuid)),
+            ], on_published=mock.ANY),
+        ]
+        self.assertEqual(expected_calls, self.master_mock.mock_calls)
+
+    def test_process_notify_publish_many_error(self):
+        self.message_mock.properties['type'] = pr.NOTIFY
+        self.request_inst_mock.state = pr.WAITING
+        self.proxy_inst_mock.publish_many.side_effect = Exception('Woot!')
+        ex = self.executor()
+        ex.execute_task(self.task, self.task_uuid, self.task_args)
+        notify = pr.Notify(topic=self.executor_topic, tasks=[self.task.name])
+        ex._process_notify(notify.to_dict(), self.message_mock)
+
+        expected_calls = [
+            mock.call.Request(self.task, self.task_uuid, 'execute',
+                              self.task_args, None, self.timeout),
+            mock.call.request.transition_and_log_error(pr.PENDING,
+                                                       logger=mock.ANY),
+            mock.call.proxy.publish_many(mock.ANY, on_published=mock.ANY),
+            mock.call.request.transition_and_log_error(pr.FAILURE,
+                                                       logger=mock.ANY),
+            mock.call.request.set_result(mock.ANY)
+        ]
+        self.assertEqual(expected_calls, self.master_mock.mock_calls)
+        self.assertEqual(0, len(ex._requests_cache))
+
+    def test_publish_requests_partial_error(self):
+        published, unpublished = mock.MagicMock(), mock.MagicMock()
+        published.uuid = 'published-uuid'
+        unpublished.uuid = 'unpublished-uuid'
+        published.expires_in = unpublished.expires_in = self.timeout
+
+        def publish_many(messages, on_published):
+            on_published(messages[0][0])
+            raise Exception('Woot!')
+
+        self.proxy_inst_mock.publish_many.side_effect = publish_many
+        ex = self.executor()
+        for request in (published, unpublished):
+            ex._requests_cache[request.uuid] = request
+        ex._publish_requests([published, unpublished], self.executor_topic)
+
+        self.assertFalse(published.transition_and_log_error.called)
+        self.assertFalse(published.set_result.called)
+        self.assertIs(published, ex._requests_cache.get(published.uuid))
+        unpublished.transition_and_log_error.assert_called_once_with(
+            pr.FAILURE, logger=mock.ANY)
+        self.assertTrue(unpublished.set_result.called)
+        self.assertIsNone(ex._requests_cache.get(unpublished.uuid))
+        stats = ex._workers_cache._stats[self.executor_topic]
+        self.assertEqual(1, stats.outstanding)
+
     def test_wait_for_any(self):
         fs = [futures.Future(), futures.Future()]
         ex = self.executor()
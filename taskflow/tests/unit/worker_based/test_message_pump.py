@@ -85,6 +85,39 @@ class TestMessagePump(test.TestCase):
         self.assertTrue(on_response.called)
         on_response.assert_called_with(resp.to_dict(), mock.ANY)
 
+    def test_response_compressed(self):
+        barrier = threading.Event()
+
+        on_response = mock.MagicMock()
+        on_response.side_effect = lambda *args, **kwargs: barrier.set()
+
+        handlers = {pr.RESPONSE: on_response}
+        p = proxy.Proxy(TEST_TOPIC, TEST_EXCHANGE, handlers,
+                        transport='memory',
+                        transport_options={
+                            'polling_interval': POLLING_INTERVAL,
+                        },
+                        compression_threshold=0)
+
+        t = threading.Thread(target=p.start)
+        t.daemon = True
+        t.start()
+        p.wait()
+        resp = pr.Response(pr.SUCCESS, result='a' * 1024)
+        p.publish(resp, TEST_TOPIC,
+                  serializer=pr.get_default_serializers()[0])
+
+        barrier.wait(BARRIER_WAIT_TIMEOUT)
+        self.assertTrue(barrier.is_set())
+        p.stop()
+        t.join()
+
+        self.assertTrue(on_response.called)
+        on_response.assert_called_with(resp.to_dict(), mock.ANY)
+        message = on_response.call_args[0][1]
+        self.assertEqual(pr.get_default_serializers()[0],
+                         proxy.get_serializer(message))
+
     def test_multi_message(self):
         message_count = 30
         barrier = latch.Latch(message_count)
@@ -41,6 +41,26 @@ class TestProtocolValidation(test.TestCase):
         msg = pr.Notify(topic="bob", tasks=['a', 'b', 'c'])
         pr.Notify.validate(msg.to_dict(), True)
 
+    def test_reply_notify_serializers(self):
+        msg = pr.Notify(topic="bob", tasks=['a'],
+                        serializers=['msgpack', 'json'])
+        pr.Notify.validate(msg.to_dict(), True)
+
+    def test_reply_notify_serializers_invalid(self):
+        msg = pr.Notify(topic="bob", tasks=['a'], serializers='msgpack')
+        self.assertRaises(excp.InvalidFormat,
+                          pr.Notify.validate, msg.to_dict(), True)
+
+    def test_choose_serializer(self):
+        preferred = ('msgpack', 'json')
+        self.assertEqual('msgpack',
+                         pr.choose_serializer(preferred, ['json', 'msgpack']))
+        self.assertEqual('json', pr.choose_serializer(preferred, ['json']))
+        self.assertEqual(pr.DEFAULT_SERIALIZER,
+                         pr.choose_serializer(preferred, ['yaml']))
+        self.assertEqual(pr.DEFAULT_SERIALIZER,
+                         pr.choose_serializer(preferred, None))
+
     def test_reply_notify_invalid(self):
         msg = {
             'topic': {},
@@ -69,6 +89,20 @@ class TestProtocolValidation(test.TestCase):
         msg['action'] = 'NOTHING'
         self.assertRaises(excp.InvalidFormat, pr.Request.validate, msg)
 
+    def test_request_blobs(self):
+        msg = pr.Request(utils.DummyTask("hi"), uuidutils.generate_uuid(),
+                         pr.EXECUTE, {'a': None}, None, 1.0,
+                         blobs={'arguments': {'a': 'key'}})
+        msg = msg.to_dict()
+        self.assertEqual({'arguments': {'a': 'key'}}, msg['blobs'])
+        pr.Request.validate(msg)
+        msg['blobs'] = {'arguments': {'a': 1}}
+        self.assertRaises(excp.InvalidFormat, pr.Request.validate, msg)
+
+    def test_response_result_blob(self):
+        msg = pr.Response(pr.SUCCESS, result=None, result_blob='key')
+        pr.Response.validate(msg.to_dict())
+
     def test_response_progress(self):
         msg = pr.Response(pr.PROGRESS, progress=0.5, event_data={})
         pr.Response.validate(msg.to_dict())
@@ -175,6 +209,15 @@ class TestProtocol(test.TestCase):
         request.transition(pr.RUNNING)
         self.assertFalse(request.expired)
 
+    @mock.patch('taskflow.engines.worker_based.protocol.misc.wallclock')
+    def test_expires_in(self, mocked_wallclock):
+        mocked_wallclock.side_effect = [0, 1, 2]
+        request = self.request()
+        self.assertEqual(self.timeout - 1, request.expires_in)
+        request.transition(pr.PENDING)
+        request.transition(pr.RUNNING)
+        self.assertIsNone(request.expires_in)
+
     def test_set_result(self):
         request = self.request()
         request.set_result(111)
@@ -19,6 +19,7 @@ import threading
 
 from six.moves import mock
 
+from taskflow.engines.worker_based import protocol as pr
 from taskflow.engines.worker_based import proxy
 from taskflow import test
 
@@ -83,8 +84,9 @@ class TestProxy(test.MockTestCase):
                             durable=False,
                             auto_delete=True,
                             channel=self.conn_inst_mock),
-            mock.call.connection.Consumer(queues=self.queue_inst_mock,
-                                          callbacks=[mock.ANY]),
+            mock.call.connection.Consumer(
+                queues=self.queue_inst_mock, callbacks=[mock.ANY],
+                accept=list(pr.get_default_serializers())),
             mock.call.connection.Consumer().__enter__(),
         ] + calls + [
             mock.call.connection.Consumer().__exit__(exc_type, mock.ANY,
@@ -127,6 +129,26 @@ class TestProxy(test.MockTestCase):
         ]
         self.assertEqual(self.master_mock.mock_calls, master_mock_calls)
 
+    def _publish_calls(self, msg_mock, routing_key, declare=True, **kwargs):
+        calls = []
+        if declare:
+            calls.append(mock.call.Queue(name=self._queue_name(routing_key),
+                                         exchange=self.exchange_inst_mock,
+                                         routing_key=routing_key,
+                                         durable=False,
+                                         auto_delete=True))
+            queues = [self.queue_inst_mock]
+        else:
+            queues = []
+        calls.append(mock.call.producer.publish(
+            body=msg_mock.to_dict.return_value,
+            routing_key=routing_key,
+            exchange=self.exchange_inst_mock,
+            declare=queues,
+            type=msg_mock.TYPE,
+            **kwargs))
+        return calls
+
     def test_publish(self):
         msg_mock = mock.MagicMock()
         msg_data = 'msg-data'
@@ -139,21 +161,160 @@ class TestProxy(test.MockTestCase):
             msg_mock, routing_key, correlation_id=task_uuid, **kwargs)
 
         master_mock_calls = [
-            mock.call.Queue(name=self._queue_name(routing_key),
-                            exchange=self.exchange_inst_mock,
-                            routing_key=routing_key,
-                            durable=False,
-                            auto_delete=True),
-            mock.call.producer.publish(body=msg_data,
-                                       routing_key=routing_key,
-                                       exchange=self.exchange_inst_mock,
-                                       correlation_id=task_uuid,
-                                       declare=[self.queue_inst_mock],
-                                       type=msg_mock.TYPE,
-                                       **kwargs)
+            mock.call.connection.clone(),
+            mock.call.Producer(self.conn_inst_mock.clone.return_value),
+        ] + self._publish_calls(msg_mock, routing_key,
+                                correlation_id=task_uuid, **kwargs)
+        self.master_mock.assert_has_calls(master_mock_calls)
+
+    def test_publish_declares_once(self):
+        msg_mock = mock.MagicMock()
+        routing_key = 'routing-key'
+
+        p = self.proxy(reset_master_mock=True)
+        p.publish(msg_mock, routing_key)
+        p.publish(msg_mock, routing_key)
+
+        master_mock_calls = (
+            self._publish_calls(msg_mock, routing_key) +
+            self._publish_calls(msg_mock, routing_key, declare=False))
+        self.master_mock.assert_has_calls(master_mock_calls)
+        self.assertEqual(1, self.producer_mock.call_count)
+
+    def test_publish_redeclares_after_period(self):
+        msg_mock = mock.MagicMock()
+        routing_key = 'routing-key'
+
+        p = self.proxy(reset_master_mock=True)
+        with mock.patch.object(proxy, 'QUEUE_DECLARE_PERIOD', -1):
+            p.publish(msg_mock, routing_key)
+        p.publish(msg_mock, routing_key)
+
+        master_mock_calls = (
+            self._publish_calls(msg_mock, routing_key) +
+            self._publish_calls(msg_mock, routing_key))
+        self.master_mock.assert_has_calls(master_mock_calls)
+
+    def test_publish_many(self):
+        msg_mock = mock.MagicMock()
+        other_msg_mock = mock.MagicMock()
+
+        self.proxy(reset_master_mock=True).publish_many([
+            (msg_mock, ['a', 'b'], {'reply_to': 'me'}),
+            (other_msg_mock, 'a', {}),
+        ])
+
+        master_mock_calls = (
+            self._publish_calls(msg_mock, 'a', reply_to='me') +
+            self._publish_calls(msg_mock, 'b', reply_to='me') +
+            self._publish_calls(other_msg_mock, 'a', declare=False))
+        self.master_mock.assert_has_calls(master_mock_calls)
+
+    def test_publish_many_on_published(self):
+        msg_mock = mock.MagicMock()
+        other_msg_mock = mock.MagicMock()
+        self.producer_inst_mock.publish.side_effect = [
+            None, None, RuntimeError('Woot!')]
+        published = []
+
+        p = self.proxy(reset_master_mock=True)
+        self.assertRaises(RuntimeError, p.publish_many, [
+            (msg_mock, ['a', 'b'], {}),
+            (other_msg_mock, 'a', {}),
+        ], on_published=published.append)
+        self.assertEqual([msg_mock], published)
+
+    def test_publish_failure_resets_producer(self):
+        msg_mock = mock.MagicMock()
+        routing_key = 'routing-key'
+        self.producer_inst_mock.publish.side_effect = [
+            RuntimeError('Woot!'), None]
+
+        p = self.proxy(reset_master_mock=True)
+        self.assertRaises(RuntimeError, p.publish, msg_mock, routing_key)
+        p.publish(msg_mock, routing_key)
+
+        master_mock_calls = self._publish_calls(msg_mock, routing_key) + [
+            mock.call.connection.clone().release(),
+            mock.call.connection.clone(),
+            mock.call.Producer(self.conn_inst_mock.clone.return_value),
+        ] + self._publish_calls(msg_mock, routing_key)
+        self.master_mock.assert_has_calls(master_mock_calls)
+
+    def test_publish_failure_redeclares(self):
+        msg_mock = mock.MagicMock()
+        self.producer_inst_mock.publish.side_effect = [
+            None, RuntimeError('Woot!'), None]
+
+        p = self.proxy(reset_master_mock=True)
+        p.publish(msg_mock, 'a')
+        self.assertRaises(RuntimeError, p.publish, msg_mock, 'b')
+        p.publish(msg_mock, 'a')
+
+        master_mock_calls = (
+            self._publish_calls(msg_mock, 'a') +
+            self._publish_calls(msg_mock, 'b') + [
+                mock.call.connection.clone().release(),
+                mock.call.connection.clone(),
+                mock.call.Producer(self.conn_inst_mock.clone.return_value),
+            ] + self._publish_calls(msg_mock, 'a'))
+        self.master_mock.assert_has_calls(master_mock_calls)
+
+    def test_publish_channel_revived_redeclares(self):
+        msg_mock = mock.MagicMock()
+        routing_key = 'routing-key'
+
+        p = self.proxy(reset_master_mock=True)
+        p.publish(msg_mock, routing_key)
+        self.producer_inst_mock.channel = mock.MagicMock(name='revived')
+        p.publish(msg_mock, routing_key)
+        p.publish(msg_mock, routing_key)
+
+        master_mock_calls = (
+            self._publish_calls(msg_mock, routing_key) +
+            self._publish_calls(msg_mock, routing_key) +
+            self._publish_calls(msg_mock, routing_key, declare=False))
+        self.master_mock.assert_has_calls(master_mock_calls)
+        self.assertEqual(1, self.producer_mock.call_count)
+
+    def test_publish_compressed(self):
+        msg_mock = mock.MagicMock()
+        msg_mock.to_dict.return_value = {'a': 'b' * 10}
+        routing_key = 'routing-key'
+
+        p = self.proxy(reset_master_mock=True, compression_threshold=10)
+        p.publish(msg_mock, routing_key, serializer='json')
+        msg_mock.to_dict.return_value = {}
+        p.publish(msg_mock, routing_key, serializer='json')
+
+        master_mock_calls = [
+            mock.call.producer.publish(
+                body=mock.ANY,
+                routing_key=routing_key,
+                exchange=self.exchange_inst_mock,
+                declare=[self.queue_inst_mock],
+                type=msg_mock.TYPE,
+                content_type='application/json',
+                content_encoding='utf-8',
+                compression=proxy.COMPRESSION),
+            mock.call.producer.publish(
+                body=mock.ANY,
+                routing_key=routing_key,
+                exchange=self.exchange_inst_mock,
+                declare=[],
+                type=msg_mock.TYPE,
+                content_type='application/json',
+                content_encoding='utf-8'),
         ]
         self.master_mock.assert_has_calls(master_mock_calls)
 
+    def test_get_serializer(self):
+        message = mock.MagicMock()
+        message.content_type = 'application/json'
+        self.assertEqual('json', proxy.get_serializer(message))
+        message.content_type = 'application/unknown'
+        self.assertIsNone(proxy.get_serializer(message))
+
     def test_start(self):
         try:
             # KeyboardInterrupt will be raised after two iterations
@@ -14,8 +14,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import shutil
+import tempfile
+
+import jsonschema
 import six
 
+from taskflow.engines.worker_based import blobs
 from taskflow.engines.worker_based import endpoint as ep
 from taskflow.engines.worker_based import protocol as pr
 from taskflow.engines.worker_based import server
@@ -54,6 +59,8 @@ class TestServer(test.MockTestCase):
         self.message_mock.properties = {'correlation_id': self.task_uuid,
                                         'reply_to': self.reply_to,
                                         'type': pr.REQUEST}
+        self.message_mock.content_type = 'application/json'
+        self.message_mock.headers = {}
         self.master_mock.attach_mock(self.executor_mock, 'executor')
         self.master_mock.attach_mock(self.message_mock, 'message')
 
@@ -101,6 +108,92 @@ class TestServer(test.MockTestCase):
         self.master_mock.assert_has_calls(master_mock_calls)
         self.assertEqual(len(s._endpoints), len(self.endpoints))
 
+    def test_process_notify(self):
+        self.proxy_inst_mock.serializers = ('msgpack', 'json')
+        self.message_mock.headers = {
+            pr.NOTIFY_FIELDS_HEADER: list(pr.NOTIFY_FIELDS),
+        }
+        s = self.server(reset_master_mock=True)
+        s._process_notify({}, self.message_mock)
+
+        master_mock_calls = [
+            mock.call.proxy.publish(msg=mock.ANY, routing_key=self.reply_to)
+        ]
+        self.assertEqual(master_mock_calls, self.master_mock.mock_calls)
+        notify = self.proxy_inst_mock.publish.call_args[1]['msg'].to_dict()
+        self.assertEqual(self.server_topic, notify['topic'])
+        self.assertEqual(sorted(ep.name for ep in self.endpoints),
+                         sorted(notify['tasks']))
+        self.assertEqual(['msgpack', 'json'], notify['serializers'])
+        self.assertEqual(0, notify['in_flight'])
+        self.assertNotIn('capacity', notify)
+
+    def test_process_notify_load(self):
+        self.proxy_inst_mock.serializers = ('json',)
+        self.message_mock.headers = {
+            pr.NOTIFY_FIELDS_HEADER: list(pr.NOTIFY_FIELDS),
+        }
+        s = self.server(reset_master_mock=True, capacity=4)
+        s._submit_request({}, self.message_mock)
+        s._process_notify({}, self.message_mock)
+
+        notify = self.proxy_inst_mock.publish.call_args[1]['msg'].to_dict()
+        self.assertEqual(1, notify['in_flight'])
+        self.assertEqual(4, notify['capacity'])
+
+    def test_process_notify_older_executor(self):
+        # The notify response schema of executors that do not send the notify
+        # fields header (which reject responses with unknown fields).
+        schema = {
+            "type": "object",
+            'properties': {
+                'topic': {
+                    "type": "string",
+                },
+                'tasks': {
+                    "type": "array",
+                    "items": {
+                        "type": "string",
+                    },
+                }
+            },
+            "required": ["topic", 'tasks'],
+            "additionalProperties": False,
+        }
+        self.proxy_inst_mock.serializers = ('msgpack', 'json')
+        s = self.server(reset_master_mock=True, capacity=4)
+        s._process_notify({}, self.message_mock)
+
+        notify = self.proxy_inst_mock.publish.call_args[1]['msg'].to_dict()
+        jsonschema.validate(notify, schema)
+
+    def test_submit_request(self):
+        s = self.server(reset_master_mock=True)
+        fut = s._submit_request({}, self.message_mock)
+
+        self.assertIs(self.executor_mock.submit.return_value, fut)
+        self.assertEqual(1, s.in_flight)
+        on_processed = fut.add_done_callback.call_args[0][0]
+        on_processed(fut)
+        self.assertEqual(0, s.in_flight)
+
+    def test_process_request_replies_with_request_serializer(self):
+        self.message_mock.content_type = 'application/x-msgpack'
+        s = self.server(reset_master_mock=True)
+        s._process_request(self.make_request(), self.message_mock)
+
+        master_mock_calls = [
+            mock.call.Response(pr.RUNNING),
+            mock.call.proxy.publish(self.response_inst_mock, self.reply_to,
+                                    correlation_id=self.task_uuid,
+                                    serializer='msgpack'),
+            mock.call.Response(pr.SUCCESS, result=1),
+            mock.call.proxy.publish(self.response_inst_mock, self.reply_to,
+                                    correlation_id=self.task_uuid,
+                                    serializer='msgpack')
+        ]
+        self.assertEqual(master_mock_calls, self.master_mock.mock_calls)
+
     def test_parse_request(self):
         request = self.make_request()
         task_cls, action, task_args = server.Server._parse_request(**request)
@@ -210,6 +303,79 @@ class TestServer(test.MockTestCase):
         self.assertEqual(self.master_mock.mock_calls, [])
         self.assertTrue(mocked_exception.called)
 
+    def _make_blob_store(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        return blobs.DirectoryBlobStore(path)
+
+    def test_process_request_blobs(self):
+        store = self._make_blob_store()
+        request = self.make_request(arguments={'x': None})
+        request['blobs'] = {
+            'arguments': {'x': blobs.offload(store, 1, threshold=0)},
+        }
+
+        # create server and process request
+        s = self.server(reset_master_mock=True, blob_store=store,
+                        blob_threshold=0)
+        s._process_request(request, self.message_mock)
+
+        # check calls (the result is put into the blob store)
+        key = blobs.BlobStore.make_key(b'1')
+        master_mock_calls = [
+            mock.call.Response(pr.RUNNING),
+            mock.call.proxy.publish(self.response_inst_mock, self.reply_to,
+                                    correlation_id=self.task_uuid),
+            mock.call.Response(pr.SUCCESS, result=None, result_blob=key),
+            mock.call.proxy.publish(self.response_inst_mock, self.reply_to,
+                                    correlation_id=self.task_uuid)
+        ]
+        self.assertEqual(master_mock_calls, self.master_mock.mock_calls)
+        self.assertEqual(1, blobs.load(store, key))
+
+    def test_process_request_blobs_missing(self):
+        store = self._make_blob_store()
+        request = self.make_request(arguments={'x': None})
+        request['blobs'] = {
+            'arguments': {'x': blobs.BlobStore.make_key(b'missing')},
+        }
+
+        # create server and process request
+        s = self.server(reset_master_mock=True, blob_store=store)
+        s._process_request(request, self.message_mock)
+
+        # check calls
+        master_mock_calls = [
+            mock.call.Response(pr.RUNNING),
+            mock.call.proxy.publish(self.response_inst_mock, self.reply_to,
+                                    correlation_id=self.task_uuid),
+            mock.call.Response(pr.FAILURE, result=mock.ANY),
+            mock.call.proxy.publish(self.response_inst_mock, self.reply_to,
+                                    correlation_id=self.task_uuid)
+        ]
+        self.assertEqual(master_mock_calls, self.master_mock.mock_calls)
+
+    def test_process_request_blobs_unknown_task(self):
+        store = mock.MagicMock(spec=blobs.BlobStore)
+        request = self.make_request(arguments={'x': None})
+        request['task_cls'] = 'unknown'
+        request['blobs'] = {
+            'arguments': {'x': blobs.BlobStore.make_key(b'1')},
+        }
+
+        # create server and process request
+        s = self.server(reset_master_mock=True, blob_store=store)
+        s._process_request(request, self.message_mock)
+
+        # blobs of requests that can not be performed are never loaded
+        self.assertFalse(store.get.called)
+        master_mock_calls = [
+            mock.call.Response(pr.FAILURE, result=mock.ANY),
+            mock.call.proxy.publish(self.response_inst_mock, self.reply_to,
+                                    correlation_id=self.task_uuid)
+        ]
+        self.assertEqual(master_mock_calls, self.master_mock.mock_calls)
+
     @mock.patch.object(misc.Failure, 'from_dict')
     @mock.patch.object(misc.Failure, 'to_dict')
     def test_process_request_parse_request_failure(self, to_mock, from_mock):
@@ -32,7 +32,7 @@ class TestWorker(test.MockTestCase):
         self.exchange = 'test-exchange'
         self.topic = 'test-topic'
         self.threads_count = 5
-        self.endpoint_count = 21
+        self.endpoint_count = 23
 
         # patch classes
         self.executor_mock, self.executor_inst_mock = self.patchClass(
@@ -62,7 +62,8 @@ class TestWorker(test.MockTestCase):
         master_mock_calls = [
             mock.call.executor_class(self.threads_count),
             mock.call.Server(self.topic, self.exchange,
-                             self.executor_inst_mock, [], url=self.broker_url)
+                             self.executor_inst_mock, [], url=self.broker_url,
+                             capacity=self.threads_count)
         ]
         self.assertEqual(self.master_mock.mock_calls, master_mock_calls)
 
@@ -72,7 +73,8 @@ class TestWorker(test.MockTestCase):
         master_mock_calls = [
             mock.call.executor_class(10),
             mock.call.Server(self.topic, self.exchange,
-                             self.executor_inst_mock, [], url=self.broker_url)
+                             self.executor_inst_mock, [], url=self.broker_url,
+                             capacity=10)
         ]
         self.assertEqual(self.master_mock.mock_calls, master_mock_calls)
 
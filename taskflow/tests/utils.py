@@ -147,6 +147,24 @@ class FailingTask(SaveOrderTask):
         raise RuntimeError('Woot!')
 
 
+class BatchingTask(SaveOrderTask):
+    def execute(self, x):
+        self.values.append(self.name)
+        return x * 2
+
+    def execute_batch(self, batch):
+        self.values.append('batch of %s' % len(batch))
+        return [kwargs['x'] * 2 for kwargs in batch]
+
+
+class FailingBatchingTask(BatchingTask):
+    def execute(self, x):
+        raise RuntimeError('Woot!')
+
+    def execute_batch(self, batch):
+        raise RuntimeError('Woot!')
+
+
 class TaskWithFailure(task.Task):
 
     def execute(self, **kwargs):
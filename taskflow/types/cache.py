@@ -14,9 +14,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import heapq
+import itertools
+import threading
+
 import six
 
 from taskflow.utils import lock_utils as lu
+from taskflow.utils import misc
 from taskflow.utils import reflection
 
 
@@ -26,16 +32,59 @@ class ExpiringCache(object):
     NOTE(harlowja): the values in this cache must have a expired attribute that
     can be used to determine if the key and associated value has expired or if
     it has not.
+
+    Values may also have a ``expires_in`` attribute that is the number of
+    seconds until they can expire (or none if they can never expire); those
+    values are kept in a heap (ordered by when they can expire) so that
+    cleaning up only has to look at the values that could have expired
+    (values without this attribute are looked at on every cleanup).
     """
 
     def __init__(self):
         self._data = {}
         self._lock = lu.ReaderWriterLock()
+        # Heap of (deadline, counter, key, value) tuples; entries whose key no
+        # longer maps to the same value are stale and are skipped (and
+        # eventually dropped) when encountered.
+        self._deadlines = []
+        self._counter = itertools.count()
+        # Keys of the values that do not say when they can expire.
+        self._unscheduled = set()
+
+    def _schedule(self, key, value, now):
+        try:
+            expires_in = value.expires_in
+        except AttributeError:
+            self._unscheduled.add(key)
+        else:
+            self._unscheduled.discard(key)
+            if expires_in is not None:
+                entry = (now + expires_in, six.next(self._counter), key, value)
+                heapq.heappush(self._deadlines, entry)
+
+    def _is_current(self, key, value):
+        return key in self._data and self._data[key] is value
+
+    def _on_added(self, key, value):
+        """Called (with the write lock held) when a key & value is added."""
+
+    def _on_removed(self, key, value):
+        """Called (with the write lock held) when a key & value is removed."""
+
+    def _remove(self, key):
+        value = self._data.pop(key)
+        self._unscheduled.discard(key)
+        self._on_removed(key, value)
+        return value
 
     def __setitem__(self, key, value):
         """Set a value in the cache."""
         with self._lock.write_lock():
+            if key in self._data:
+                self._remove(key)
             self._data[key] = value
+            self._schedule(key, value, misc.wallclock())
+            self._on_added(key, value)
 
     def __len__(self):
         """Returns how many items are in this cache."""
@@ -55,19 +104,100 @@ class ExpiringCache(object):
     def __delitem__(self, key):
         """Delete a key & value from the cache."""
         with self._lock.write_lock():
-            del self._data[key]
+            self._remove(key)
 
     def cleanup(self, on_expired_callback=None):
         """Delete out-dated keys & values from the cache."""
+        now = misc.wallclock()
+        expired_values = collections.OrderedDict()
         with self._lock.write_lock():
-            expired_values = [(k, v) for k, v in six.iteritems(self._data)
-                              if v.expired]
-            for (k, _v) in expired_values:
-                del self._data[k]
+            not_expired = {}
+            while self._deadlines and self._deadlines[0][0] <= now:
+                (_deadline, _c, k, v) = heapq.heappop(self._deadlines)
+                if not self._is_current(k, v) or k in expired_values:
+                    continue
+                if v.expired:
+                    expired_values[k] = v
+                else:
+                    not_expired[k] = v
+            for k in self._unscheduled:
+                v = self._data[k]
+                if v.expired:
+                    expired_values[k] = v
+            for k in six.iterkeys(expired_values):
+                self._remove(k)
+            # Pushed back after examining the heap, so values that will expire
+            # very soon are not looked at repeatedly.
+            for (k, v) in six.iteritems(not_expired):
+                if k not in expired_values:
+                    self._schedule(k, v, now)
+            # Drop the stale entries (of values that were removed or replaced)
+            # once there are (many) more of them than values.
+            if len(self._deadlines) > 2 * len(self._data) + 64:
+                self._deadlines = [entry for entry in self._deadlines
+                                   if self._is_current(entry[2], entry[3])]
+                heapq.heapify(self._deadlines)
         if on_expired_callback:
             arg_c = len(reflection.get_callable_args(on_expired_callback))
-            for (k, v) in expired_values:
+            for (k, v) in six.iteritems(expired_values):
                 if arg_c == 2:
                     on_expired_callback(k, v)
                 else:
                     on_expired_callback(v)
+
+
+class LRUCache(object):
+    """Represents a thread-safe size bounded least recently used cache.
+
+    When the cache is full the least recently used (retrieved or set) key and
+    associated value is evicted to make room for the new key and value. The
+    number of lookups that found (and did not find) a value is tracked in
+    the ``hits`` (and ``misses``) attributes.
+    """
+
+    def __init__(self, max_size):
+        if max_size <= 0:
+            raise ValueError("Maximum size must be greater than zero")
+        self._max_size = int(max_size)
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self):
+        """The maximum number of keys & values this cache will retain."""
+        return self._max_size
+
+    def __setitem__(self, key, value):
+        """Set a value in the cache (evicting the oldest value if full)."""
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self._max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        """Returns how many items are in this cache."""
+        with self._lock:
+            return len(self._data)
+
+    def get(self, key, default=None):
+        """Retrieve a value from the cache (returns default if not found)."""
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            else:
+                self._data[key] = value
+                self.hits += 1
+                return value
+
+    def clear(self):
+        """Removes all keys & values from the cache (and resets counters)."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
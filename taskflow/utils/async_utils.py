@@ -15,6 +15,7 @@
 #    under the License.
 
 from concurrent import futures
+from six.moves import queue as compat_queue
 
 from taskflow.utils import eventlet_utils as eu
 
@@ -29,6 +30,9 @@ def wait_for_any(fs, timeout=None):
 
     Returns pair (done futures, not done futures).
     """
+    completed = set(f for f in fs if isinstance(f, CompletedFuture))
+    if completed:
+        return (completed, set(fs) - completed)
     green_fs = sum(1 for f in fs if isinstance(f, eu.GreenFuture))
     if not green_fs:
         return tuple(futures.wait(fs, timeout=timeout,
@@ -43,8 +47,94 @@ def wait_for_any(fs, timeout=None):
             return eu.wait_for_any(fs, timeout=timeout)
 
 
+def is_green_future(fut):
+    """Returns true if the given future is a green (eventlet) future."""
+    return eu.EVENTLET_AVAILABLE and isinstance(fut, eu.GreenFuture)
+
+
+class CompletionQueue(object):
+    """Collects watched futures (in the order they complete) as they complete.
+
+    Instead of waiting on a (possibly large) set of futures, each future is
+    watched once (using a done callback) and pushed onto a queue when it
+    completes, so that finding which futures have completed does not depend
+    on how many futures are still not done.
+
+    This uses a non-green queue, so green futures should be
+    waited on (using :py:func:`.wait_for_any`) before calling
+    :py:meth:`.get` in situations where eventlet has not monkey patched the
+    threading module (otherwise blocking on the queue will block the green
+    threads that would complete those futures).
+    """
+
+    def __init__(self):
+        self._queue = compat_queue.Queue()
+
+    def watch(self, fut):
+        """Pushes the given future onto this queue when it completes."""
+        fut.add_done_callback(self._queue.put)
+
+    def get(self, block=True, timeout=None):
+        """Gets all the completed futures not already gotten.
+
+        If no watched futures have completed (and blocking is requested)
+        this will wait for one to complete (or for the timeout to elapse).
+        """
+        done = []
+        try:
+            done.append(self._queue.get(block=block, timeout=timeout))
+        except compat_queue.Empty:
+            return done
+        while True:
+            try:
+                done.append(self._queue.get_nowait())
+            except compat_queue.Empty:
+                return done
+
+
 def make_completed_future(result):
     """Make with completed with given result."""
     future = futures.Future()
     future.set_result(result)
     return future
+
+
+class CompletedFuture(object):
+    """A lightweight future (like object) for an already known result.
+
+    Unlike a :py:class:`concurrent.futures.Future` this does not create a
+    condition (or any waiter lists) since it is done from the moment it is
+    created; it is meant for results that are produced on the thread that
+    requested them (for example by a serial executor) which the action
+    engine runner will process without waiting on them.
+
+    Since it is not a real future it can not be passed to
+    :py:func:`concurrent.futures.wait` (the :py:func:`.wait_for_any` function
+    of this module does accept it).
+    """
+
+    __slots__ = ('_result',)
+
+    def __init__(self, result):
+        self._result = result
+
+    def result(self, timeout=None):
+        return self._result
+
+    def exception(self, timeout=None):
+        return None
+
+    def done(self):
+        return True
+
+    def running(self):
+        return False
+
+    def cancelled(self):
+        return False
+
+    def cancel(self):
+        return False
+
+    def add_done_callback(self, fn):
+        fn(self)
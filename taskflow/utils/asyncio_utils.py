@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright (C) 2014 Yahoo! Inc. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+try:
+    import asyncio
+    ASYNCIO_AVAILABLE = True
+except ImportError:
+    ASYNCIO_AVAILABLE = False
+
+from taskflow.utils import threading_utils
+
+
+def is_coroutine_function(func):
+    """Checks if the given callable is a coroutine function."""
+    if not ASYNCIO_AVAILABLE:
+        return False
+    return asyncio.iscoroutinefunction(func)
+
+
+class LoopThread(object):
+    """Runs an event loop in a dedicated (daemon) thread."""
+
+    def __init__(self, loop=None):
+        if not ASYNCIO_AVAILABLE:
+            raise RuntimeError('asyncio is needed to run an event loop')
+        if loop is None:
+            loop = asyncio.new_event_loop()
+        self.loop = loop
+        self._thread = None
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            asyncio.set_event_loop(None)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading_utils.daemon_thread(self._run)
+        self._thread.start()
+
+    def stop(self, close=True):
+        if self._thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self._thread = None
+        if close:
+            self.loop.close()
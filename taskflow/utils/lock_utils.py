@@ -149,8 +149,13 @@ class ReaderWriterLock(_ReaderWriterLockBase):
     def __init__(self):
         self._writer = None
         self._pending_writers = collections.deque()
-        self._readers = collections.deque()
-        self._cond = threading.Condition()
+        # Reader thread ident -> how many times it has (reentrantly) acquired
+        # the read lock.
+        self._readers = {}
+        # The condition is never acquired reentrantly, so it
+        # uses a plain (cheaper to acquire) lock instead of the default
+        # reentrant lock.
+        self._cond = threading.Condition(threading.Lock())
 
     @property
     def has_pending_writers(self):
@@ -160,16 +165,21 @@ class ReaderWriterLock(_ReaderWriterLockBase):
         finally:
             self._cond.release()
 
+    def _is_writer(self, me, check_pending=True):
+        # The condition must already be acquired by the caller
+        # before this is called.
+        if self._writer is not None and self._writer == me:
+            return True
+        if check_pending:
+            return me in self._pending_writers
+        else:
+            return False
+
     def is_writer(self, check_pending=True):
         self._cond.acquire()
         try:
-            me = tu.get_ident()
-            if self._writer is not None and self._writer == me:
-                return True
-            if check_pending:
-                return me in self._pending_writers
-            else:
-                return False
+            return self._is_writer(tu.get_ident(),
+                                   check_pending=check_pending)
         finally:
             self._cond.release()
 
@@ -195,16 +205,16 @@ class ReaderWriterLock(_ReaderWriterLockBase):
     @contextlib.contextmanager
     def read_lock(self):
         me = tu.get_ident()
-        if self.is_writer():
-            raise RuntimeError("Writer %s can not acquire a read lock"
-                               " while holding/waiting for the write lock"
-                               % me)
         self._cond.acquire()
         try:
+            if self._is_writer(me):
+                raise RuntimeError("Writer %s can not acquire a read lock"
+                                   " while holding/waiting for the write lock"
+                                   % me)
             while True:
                 # No active writer; we are good to become a reader.
                 if self._writer is None:
-                    self._readers.append(me)
+                    self._readers[me] = self._readers.get(me, 0) + 1
                     break
                 # An active writer; guess we have to wait.
                 self._cond.wait()
@@ -213,24 +223,36 @@ class ReaderWriterLock(_ReaderWriterLockBase):
         try:
             yield self
         finally:
-            # I am no longer a reader, remove *one* occurrence of myself.
-            # If the current thread acquired two read locks, then it will
-            # still have to remove that other read lock; this allows for
-            # basic reentrancy to be possible.
+            # I am no longer a reader, remove *one* of my acquisitions. If the
+            # current thread acquired two read locks, then it will still have
+            # to release that other read lock; this allows for basic
+            # reentrancy to be possible.
             self._cond.acquire()
             try:
-                self._readers.remove(me)
-                self._cond.notify_all()
+                remaining = self._readers[me] - 1
+                if remaining:
+                    self._readers[me] = remaining
+                else:
+                    del self._readers[me]
+                    # Only writers wait on readers (and they only care about
+                    # there being no readers) so only wake them up then.
+                    if not self._readers:
+                        self._cond.notify_all()
             finally:
                 self._cond.release()
 
     @contextlib.contextmanager
     def write_lock(self):
         me = tu.get_ident()
-        if self.is_reader():
-            raise RuntimeError("Reader %s to writer privilege"
-                               " escalation not allowed" % me)
-        if self.is_writer(check_pending=False):
+        self._cond.acquire()
+        try:
+            if me in self._readers:
+                raise RuntimeError("Reader %s to writer privilege"
+                                   " escalation not allowed" % me)
+            is_writer = self._is_writer(me, check_pending=False)
+        finally:
+            self._cond.release()
+        if is_writer:
             # Already the writer; this allows for basic reentrancy.
             yield self
         else:
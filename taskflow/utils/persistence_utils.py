@@ -84,7 +84,9 @@ def create_flow_detail(flow, book=None, backend=None, meta=None):
 
     if backend is not None and book is None:
         LOG.warn("No logbook provided for flow %s, creating one.", flow)
-        book = temporary_log_book(backend)
+        # This is saved (along with the flow detail) below,
+        # so there is no need to save it (using another connection) now.
+        book = temporary_log_book()
 
     if book is not None:
         book.add(flow_detail)
@@ -14,11 +14,38 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import multiprocessing
 import threading
+import time
 
+from concurrent import futures
 from six.moves import _thread
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _rusage_thread_time():
+    usage = resource.getrusage(resource.RUSAGE_THREAD)
+    return usage.ru_utime + usage.ru_stime
+
+
+# Used to observe how much cpu time the work ran in a thread is consuming;
+# time.thread_time is only available on python 3.7+ so on older pythons the
+# per-thread resource usage is used instead (which is only available on some
+# platforms, for example linux with python 3.2+). When neither is available
+# this is none and the cpu usage of work is not observed (so the adaptive
+# executor below will never consider work to be cpu-bound).
+if hasattr(time, 'thread_time'):
+    _thread_time = time.thread_time
+elif resource is not None and hasattr(resource, 'RUSAGE_THREAD'):
+    _thread_time = _rusage_thread_time
+else:
+    _thread_time = None
+
 
 def get_ident():
     """Return the 'thread identifier' of the current thread."""
@@ -44,3 +71,420 @@ def daemon_thread(target, *args, **kwargs):
     # unless the daemon property is set to True.
     thread.daemon = True
     return thread
+
+
+class _WorkItem(object):
+    def __init__(self, future, fn, args, kwargs, owner=None):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.owner = owner
+
+    def run(self):
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except BaseException as e:
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(result)
+
+
+class AdaptiveThreadPoolExecutor(futures.Executor):
+    """A thread pool executor that grows and shrinks its amount of workers.
+
+    A worker is added (up to ``max_workers``) when work is submitted and there
+    are not enough idle workers to run it; workers that have been idle for
+    ``idle_timeout`` seconds exit (leaving at least ``min_workers`` alive).
+
+    The time taken to run each submitted callable (and the cpu time it
+    consumed, when that can be measured) is observed; when the work is
+    mostly using the cpu (and not waiting on I/O) the pool will not grow
+    beyond the optimal thread count (since more threads will only contend for
+    the interpreter lock). When the cpu time of threads can not be measured
+    (see ``_thread_time``) the pool is only limited by ``max_workers``.
+
+    Only that ratio of cpu time to run time affects how large the pool may
+    grow; the average run time (latency) itself is only reported (see
+    :py:attr:`.statistics`) and is not used to size the pool.
+    """
+
+    #: Weight given to each newly observed task latency (and cpu usage).
+    SMOOTHING = 0.2
+
+    #: When the observed ratio of cpu time to run time is greater than this
+    #: the submitted work is considered to be cpu-bound.
+    CPU_BOUND_RATIO = 0.5
+
+    def __init__(self, min_workers=1, max_workers=None, idle_timeout=5.0):
+        if max_workers is None:
+            max_workers = get_optimal_thread_count() * 5
+        self._min_workers = int(min_workers)
+        self._max_workers = int(max_workers)
+        if self._min_workers < 0:
+            raise ValueError('Min workers must be greater than or equal'
+                             ' to zero')
+        if self._max_workers <= 0:
+            raise ValueError('Max workers must be greater than zero')
+        if self._min_workers > self._max_workers:
+            raise ValueError('Min workers must be less than or equal to max'
+                             ' workers')
+        self._idle_timeout = float(idle_timeout)
+        self._work = self._make_work_queue()
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._workers = set()
+        self._active = 0
+        self._shutdown = False
+        self._latency = None
+        self._cpu_ratio = None
+
+    @property
+    def alive(self):
+        return not self._shutdown
+
+    @property
+    def statistics(self):
+        """Dictionary of statistics about the workers and work queue."""
+        with self._cond:
+            return {
+                'workers': len(self._workers),
+                'active_workers': self._active,
+                'idle_workers': len(self._workers) - self._active,
+                'queue_length': len(self._work),
+                'max_workers': self._fetch_max_workers(),
+                'average_latency': self._latency,
+                'cpu_bound': self._is_cpu_bound(),
+            }
+
+    def _is_cpu_bound(self):
+        return (self._cpu_ratio is not None and
+                self._cpu_ratio > self.CPU_BOUND_RATIO)
+
+    def _fetch_max_workers(self):
+        if self._is_cpu_bound():
+            return max(self._min_workers,
+                       min(self._max_workers, get_optimal_thread_count()))
+        return self._max_workers
+
+    def _smooth(self, average, value):
+        if average is None:
+            return value
+        return (self.SMOOTHING * value) + ((1 - self.SMOOTHING) * average)
+
+    def _observe(self, latency, cpu_time):
+        self._latency = self._smooth(self._latency, latency)
+        if cpu_time is not None and latency > 0:
+            self._cpu_ratio = self._smooth(self._cpu_ratio,
+                                           min(1.0, cpu_time / latency))
+
+    def _make_work_queue(self):
+        return collections.deque()
+
+    def _drain_work(self):
+        work = list(self._work)
+        self._work.clear()
+        return work
+
+    def _cancel_queued_work(self):
+        # Called with the condition held once shutdown and no workers are
+        # left; what is still queued would never be ran.
+        for work in self._drain_work():
+            work.future.cancel()
+
+    def _on_work_done(self, work):
+        # Called with the condition held after each piece of
+        # work has been ran (subclasses can use this to adjust what work
+        # can be ran next).
+        pass
+
+    def _spawn_worker(self):
+        worker = daemon_thread(self._run_worker)
+        self._workers.add(worker)
+        worker.start()
+
+    def _run_worker(self):
+        me = threading.current_thread()
+        while True:
+            with self._cond:
+                work = self._wait_for_work(me)
+                if work is None:
+                    return
+                self._active += 1
+            started = time.time()
+            if _thread_time is not None:
+                cpu_started = _thread_time()
+            try:
+                work.run()
+            finally:
+                latency = time.time() - started
+                if _thread_time is not None:
+                    cpu_time = _thread_time() - cpu_started
+                else:
+                    cpu_time = None
+                with self._cond:
+                    self._active -= 1
+                    self._observe(latency, cpu_time)
+                    self._on_work_done(work)
+
+    def _wait_for_work(self, me):
+        # Called with the condition held, returns none when the worker
+        # should exit.
+        idle_since = time.time()
+        while not self._work:
+            if self._shutdown:
+                self._workers.discard(me)
+                if not self._workers:
+                    self._cancel_queued_work()
+                return None
+            idle_for = time.time() - idle_since
+            if idle_for >= self._idle_timeout:
+                if len(self._workers) > self._min_workers:
+                    self._workers.discard(me)
+                    return None
+                idle_since = time.time()
+                idle_for = 0
+            self._cond.wait(self._idle_timeout - idle_for)
+        return self._work.popleft()
+
+    def _submit_work(self, work):
+        # This must be called with the condition held.
+        if self._shutdown:
+            raise RuntimeError('cannot schedule new futures after shutdown')
+        self._work.append(work)
+        idle = len(self._workers) - self._active
+        if (len(self._work) > idle and
+                len(self._workers) < self._fetch_max_workers()):
+            self._spawn_worker()
+        self._cond.notify()
+        return work.future
+
+    def submit(self, fn, *args, **kwargs):
+        with self._cond:
+            return self._submit_work(_WorkItem(futures.Future(),
+                                               fn, args, kwargs))
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            self._shutdown = True
+            workers = list(self._workers)
+            if not workers:
+                self._cancel_queued_work()
+            self._cond.notify_all()
+        if wait:
+            for worker in workers:
+                worker.join()
+
+
+class _FairWorkQueue(object):
+    """Work queue that takes turns handing out the work of its owners.
+
+    The work of an owner that already has as much work being ran as it is
+    allowed to (its admission limit) is held back until some of that work
+    has finished. The length of this queue is the amount of work that can be
+    handed out right now.
+    """
+
+    def __init__(self):
+        self._ready = collections.deque()
+
+    @staticmethod
+    def _admittable(owner):
+        if owner.max_workers is None:
+            return len(owner.queued)
+        return max(0, min(len(owner.queued),
+                          owner.max_workers - owner.in_flight))
+
+    def __len__(self):
+        return sum(self._admittable(owner) for owner in self._ready)
+
+    def __bool__(self):
+        return any(self._admittable(owner) for owner in self._ready)
+
+    __nonzero__ = __bool__
+
+    @property
+    def queued(self):
+        return sum(len(owner.queued) for owner in self._ready)
+
+    def append(self, work):
+        owner = work.owner
+        if not owner.queued:
+            self._ready.append(owner)
+        owner.queued.append(work)
+
+    def popleft(self):
+        for _i in range(0, len(self._ready)):
+            owner = self._ready[0]
+            self._ready.rotate(-1)
+            if self._admittable(owner):
+                work = owner.queued.popleft()
+                owner.in_flight += 1
+                if not owner.queued:
+                    self._ready.remove(owner)
+                return work
+        raise IndexError("pop from a queue with no admittable work")
+
+    def done(self, work):
+        work.owner.in_flight -= 1
+
+    def drain(self):
+        work = []
+        while self._ready:
+            owner = self._ready.popleft()
+            work.extend(owner.queued)
+            owner.queued.clear()
+        return work
+
+
+class _SharedExecutorClient(futures.Executor):
+    """A view of a shared executor that one user (e.g. an engine) uses."""
+
+    def __init__(self, executor, max_workers=None):
+        if max_workers is not None and max_workers <= 0:
+            raise ValueError('Max workers must be greater than zero')
+        self.max_workers = max_workers
+        self.queued = collections.deque()
+        self.in_flight = 0
+        self._executor = executor
+        self._shutdown = False
+
+    @property
+    def alive(self):
+        return not self._shutdown and self._executor.alive
+
+    @property
+    def statistics(self):
+        """Dictionary of statistics about this client (and its executor)."""
+        return self._executor._fetch_statistics(self)
+
+    def submit(self, fn, *args, **kwargs):
+        return self._executor._submit_for(self, fn, args, kwargs)
+
+    def shutdown(self, wait=True):
+        """Detaches from the shared executor (which is **not** shutdown)."""
+        self._executor._detach(self, wait=wait)
+
+
+class SharedThreadPoolExecutor(AdaptiveThreadPoolExecutor):
+    """An adaptive thread pool executor meant to be shared by many users.
+
+    Users :meth:`.attach` to get an executor of their own that submits work
+    to this shared one; the work of different users is ran in a round-robin
+    manner (so that one user that submits lots of work can not starve the
+    others) and each user can be limited in how much of its work is ran
+    at the same time. Shutting down an attached executor detaches it (and
+    leaves this shared executor and its threads alive).
+    """
+
+    def __init__(self, min_workers=None, max_workers=None, idle_timeout=60.0):
+        if min_workers is None:
+            min_workers = get_optimal_thread_count()
+        if max_workers is None:
+            max_workers = max(min_workers, get_optimal_thread_count() * 5)
+        super(SharedThreadPoolExecutor, self).__init__(
+            min_workers=min_workers, max_workers=max_workers,
+            idle_timeout=idle_timeout)
+        self._clients = set()
+        # Users that are detaching wait on this (and not on the condition
+        # that workers wait on) so that finishing work only has to wake up
+        # one idle worker.
+        self._detached = threading.Condition(self._lock)
+
+    def _make_work_queue(self):
+        return _FairWorkQueue()
+
+    def _drain_work(self):
+        work = self._work.drain()
+        # Users that are detaching are no longer waiting on that work...
+        self._detached.notify_all()
+        return work
+
+    def _on_work_done(self, work):
+        client = work.owner
+        if client is not None:
+            self._work.done(work)
+            # Work that was held back may now be ran (by an idle worker)...
+            if client.queued:
+                self._cond.notify()
+            elif client._shutdown and not client.in_flight:
+                self._detached.notify_all()
+
+    def _fetch_statistics(self, client):
+        statistics = self.statistics
+        with self._cond:
+            statistics['client_queue_length'] = len(client.queued)
+            statistics['client_active_workers'] = client.in_flight
+        return statistics
+
+    @property
+    def statistics(self):
+        statistics = super(SharedThreadPoolExecutor, self).statistics
+        with self._cond:
+            statistics['clients'] = len(self._clients)
+            statistics['held_back'] = (self._work.queued -
+                                       statistics['queue_length'])
+        return statistics
+
+    def attach(self, max_workers=None):
+        """Returns an executor that submits (fairly) to this one.
+
+        :param max_workers: the maximum amount of the attached executors
+                            work that will be ran at the same time (or none
+                            for no limit)
+        """
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError('cannot attach after shutdown')
+            client = _SharedExecutorClient(self, max_workers=max_workers)
+            self._clients.add(client)
+            return client
+
+    def _submit_for(self, client, fn, args, kwargs):
+        with self._cond:
+            if client._shutdown:
+                raise RuntimeError('cannot schedule new futures after'
+                                   ' shutdown')
+            return self._submit_work(_WorkItem(futures.Future(), fn, args,
+                                               kwargs, owner=client))
+
+    def _detach(self, client, wait=True):
+        with self._cond:
+            client._shutdown = True
+            if wait:
+                while client.queued or client.in_flight:
+                    self._detached.wait()
+            self._clients.discard(client)
+
+    def submit(self, fn, *args, **kwargs):
+        raise RuntimeError('work must be submitted to a shared executor'
+                           ' using an attached executor')
+
+
+_SHARED_EXECUTORS = {}
+_SHARED_EXECUTORS_LOCK = threading.Lock()
+
+
+def fetch_shared_executor(name, **kwargs):
+    """Fetches the process wide shared executor with the given name.
+
+    If no shared executor exists with the given name (or it has been shutdown)
+    a :py:class:`.SharedThreadPoolExecutor` is created (using the provided
+    keyword arguments) and stored under that name.
+    """
+    with _SHARED_EXECUTORS_LOCK:
+        executor = _SHARED_EXECUTORS.get(name)
+        if executor is None or not executor.alive:
+            executor = SharedThreadPoolExecutor(**kwargs)
+            _SHARED_EXECUTORS[name] = executor
+        return executor
+
+
+def shutdown_shared_executor(name, wait=True):
+    """Shuts down (and forgets) the shared executor with the given name."""
+    with _SHARED_EXECUTORS_LOCK:
+        executor = _SHARED_EXECUTORS.pop(name, None)
+    if executor is not None:
+        executor.shutdown(wait=wait)
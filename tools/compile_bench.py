@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+#    Copyright (C) 2014 Yahoo! Inc. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import optparse
+import os
+import sys
+import time
+
+top_dir = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                       os.pardir))
+sys.path.insert(0, top_dir)
+
+# Reports the (best) time taken to compile large linear, unordered and nested
+# graph flows; run it (for example 'python tools/compile_bench.py') on
+# checkouts from before and after a compiler change to compare them.
+
+from taskflow.engines.action_engine import compiler
+from taskflow.patterns import graph_flow as gf
+from taskflow.patterns import linear_flow as lf
+from taskflow.patterns import unordered_flow as uf
+from taskflow import task
+
+
+class DummyTask(task.Task):
+    def execute(self, *args, **kwargs):
+        pass
+
+
+def make_linear(atoms):
+    flow = lf.Flow("linear")
+    for i in range(0, atoms):
+        flow.add(DummyTask(name="task-%s" % i))
+    return flow
+
+
+def make_unordered(atoms):
+    flow = uf.Flow("unordered")
+    for i in range(0, atoms):
+        flow.add(DummyTask(name="task-%s" % i))
+    return flow
+
+
+def make_nested_graph(atoms, width):
+    # Makes a graph flow of graph subflows (each subflow containing a chain
+    # of tasks linked by what they provide & require), where the first task
+    # of each subflow requires what the last task of the prior subflow
+    # provides.
+    flow = gf.Flow("nested-graph")
+    for i in range(0, max(1, atoms // width)):
+        subflow = gf.Flow("subflow-%s" % i)
+        for j in range(0, width):
+            name = "task-%s-%s" % (i, j)
+            if j == 0 and i > 0:
+                requires = ["task-%s-%s" % (i - 1, width - 1)]
+            elif j > 0:
+                requires = ["task-%s-%s" % (i, j - 1)]
+            else:
+                requires = []
+            subflow.add(DummyTask(name=name, provides=name,
+                                  requires=requires))
+        flow.add(subflow)
+    return flow
+
+
+def time_compile(flow, repeat):
+    best = None
+    for _i in range(0, repeat):
+        start = time.time()
+        compiler.PatternCompiler().compile(flow)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-a", "--atoms", dest="atoms", type="int",
+                      help="number of atoms in each flow (default: 10000)",
+                      default=10000)
+    parser.add_option("-w", "--width", dest="width", type="int",
+                      help="number of atoms in each nested graph subflow"
+                           " (default: 100)",
+                      default=100)
+    parser.add_option("-r", "--repeat", dest="repeat", type="int",
+                      help="number of compiles to take the best time of"
+                           " (default: 3)",
+                      default=3)
+    (options, args) = parser.parse_args()
+
+    flows = [
+        ('linear', make_linear(options.atoms)),
+        ('unordered', make_unordered(options.atoms)),
+        ('nested graph', make_nested_graph(options.atoms, options.width)),
+    ]
+    for (kind, flow) in flows:
+        elapsed = time_compile(flow, options.repeat)
+        print("Compiled %s flow with %s atoms in %0.3f seconds"
+              % (kind, options.atoms, elapsed))
+
+
+if __name__ == '__main__':
+    main()
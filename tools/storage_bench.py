@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+#    Copyright (C) 2014 Yahoo! Inc. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import optparse
+import os
+import sys
+import threading
+import time
+
+top_dir = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                       os.pardir))
+sys.path.insert(0, top_dir)
+
+from taskflow.persistence import logbook
+from taskflow import states
+from taskflow import storage
+
+
+def make_storage(tasks):
+    flow_detail = logbook.FlowDetail(name='bench', uuid='bench')
+    store = storage.MultiThreadedStorage(flow_detail)
+    for i in range(0, tasks):
+        name = "task-%s" % i
+        store.ensure_task(name, result_mapping={name: None})
+        store.save(name, i)
+    return store
+
+
+def run_task(store, name, requires, reads, write_every):
+    # Acts like a scheduled task would; repeatedly looking up its own state
+    # and its arguments (with the occasional state change).
+    args_mapping = dict((r, r) for r in requires)
+    for i in range(0, reads):
+        store.get_atom_state(name)
+        store.get_atoms_states([name])
+        store.fetch_mapped_args(args_mapping, atom_name=name)
+        if write_every and i % write_every == 0:
+            store.set_atom_intention(name, states.EXECUTE)
+            store.set_atom_state(name, states.SUCCESS)
+
+
+def time_contention(store, tasks, reads, write_every):
+    names = ["task-%s" % i for i in range(0, tasks)]
+    threads = []
+    for (i, name) in enumerate(names):
+        requires = [names[(i + 1) % tasks], names[(i + 2) % tasks]]
+        threads.append(threading.Thread(target=run_task,
+                                        args=(store, name, requires,
+                                              reads, write_every)))
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.time() - start
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-t", "--tasks", dest="tasks", type="int",
+                      help="number of parallel tasks (default: 64)",
+                      default=64)
+    parser.add_option("-n", "--reads", dest="reads", type="int",
+                      help="number of lookups each task does"
+                           " (default: 2000)",
+                      default=2000)
+    parser.add_option("-w", "--write-every", dest="write_every", type="int",
+                      help="how many lookups each task does between state"
+                           " changes, zero for never (default: 100)",
+                      default=100)
+    (options, args) = parser.parse_args()
+
+    store = make_storage(options.tasks)
+    elapsed = time_contention(store, options.tasks, options.reads,
+                              options.write_every)
+    lookups = options.tasks * options.reads * 3
+    print("Did %s storage lookups from %s parallel tasks in %0.3f seconds"
+          " (%0.1f lookups/second)" % (lookups, options.tasks, elapsed,
+                                       lookups / elapsed))
+
+
+if __name__ == '__main__':
+    main()